@@ -1,9 +1,23 @@
+import atexit
+import os
 import sys
-from PyQt5 import QtGui
-from schmereo.application import SchmereoApplication
+
+from schmereo.startup_profile import profile
+from schmereo.trace import tracer
 
 
 def main():
+    if sys.argv[1:2] == ["ingest"]:  # headless; no Qt
+        from schmereo.ingest import main as ingest
+
+        sys.exit(ingest(sys.argv[2:]))
+    sys.argv = profile.configure(sys.argv)
+    tracer.configure(os.environ)
+    atexit.register(tracer.stop)  # writes SCHMEREO_TRACE; the window saves traces from the menu
+    with profile.span("import PyQt5"):
+        from PyQt5 import QtCore, QtGui
+    with profile.span("import schmereo.application"):
+        from schmereo.application import SchmereoApplication
     import schmereo.excepthook
     gl_format = QtGui.QSurfaceFormat()
     gl_format.setMajorVersion(4)
@@ -11,6 +25,8 @@ def main():
     gl_format.setProfile(QtGui.QSurfaceFormat.CoreProfile)
     gl_format.setSamples(8)
     QtGui.QSurfaceFormat.setDefaultFormat(gl_format)
+    # Both eye views use the same shader programs and textures
+    QtCore.QCoreApplication.setAttribute(QtCore.Qt.AA_ShareOpenGLContexts)
     SchmereoApplication()
     sys.exit(0)
 
@@ -0,0 +1,102 @@
+"""
+Alignment quality of the current markers and transforms, in a panel and in
+the status bar.
+
+AlignmentMonitor is registered with the RenderScheduler as an observer, so
+it recomputes the metrics whenever the eye views repaint after a marker, a
+transform or an image changed, and not otherwise.
+"""
+
+from PyQt5 import QtCore, QtWidgets
+
+from schmereo.core.metrics import alignment_metrics, converged, summary
+
+
+class AlignmentMonitor(QtCore.QObject):
+    def __init__(self, eyes, parent=None):
+        """eyes are the left and right EyeModel"""
+        super().__init__(parent=parent)
+        self.eyes = eyes
+        self.metrics = alignment_metrics(*eyes)
+        self.painted_state = None
+
+    changed = QtCore.pyqtSignal(object)  # metrics dict
+
+    def render_state(self) -> tuple:
+        """Everything the metrics depend on; see RenderScheduler"""
+        state = []
+        for eye in self.eyes:
+            transform = eye.image.transform
+            state.extend(
+                (
+                    eye.markers.version,
+                    eye.image_size(),
+                    transform.center.x,
+                    transform.center.y,
+                    transform.rotation,
+                )
+            )
+        return tuple(state)
+
+    def update(self) -> None:
+        self.painted_state = self.render_state()
+        self.metrics = alignment_metrics(*self.eyes)
+        self.changed.emit(self.metrics)
+
+
+def _pixels(value) -> str:
+    return "-" if value is None else f"{value:.2f} px"
+
+
+class AlignmentDock(QtWidgets.QDockWidget):
+    def __init__(self, parent=None):
+        super().__init__("Alignment", parent)
+        self.setObjectName("alignmentDock")
+        self.labels = {}
+        contents = QtWidgets.QWidget()
+        layout = QtWidgets.QFormLayout(contents)
+        for key, text in (
+            ("pairs", "Marker pairs"),
+            ("rms_vertical_pixels", "Vertical disparity, RMS"),
+            ("max_vertical_pixels", "Vertical disparity, max"),
+            ("horizontal_range_pixels", "Horizontal disparity"),
+            ("rotation_degrees", "Rotation"),
+            ("offset_pixels", "Offset"),
+            ("residual_rotation_degrees", "Residual rotation"),
+        ):
+            label = QtWidgets.QLabel()
+            label.setTextInteractionFlags(QtCore.Qt.TextSelectableByMouse)
+            layout.addRow(text, label)
+            self.labels[key] = label
+        self.setWidget(contents)
+
+    @QtCore.pyqtSlot(object)
+    def show_metrics(self, metrics: dict) -> None:
+        horizontal = metrics["horizontal_range_pixels"]
+        residual = metrics["residual_rotation_degrees"]
+        degree = "\N{DEGREE SIGN}"
+        texts = {
+            "pairs": str(metrics["pairs"]),
+            "rms_vertical_pixels": _pixels(metrics["rms_vertical_pixels"]),
+            "max_vertical_pixels": _pixels(metrics["max_vertical_pixels"]),
+            "horizontal_range_pixels": "-"
+            if horizontal is None
+            else f"{horizontal[0]:.1f} to {horizontal[1]:.1f} px",
+            "rotation_degrees": f"{metrics['rotation_degrees']:.3f}{degree}",
+            "offset_pixels": "{:.1f}, {:.1f} px".format(*metrics["offset_pixels"]),
+            "residual_rotation_degrees": "-" if residual is None else f"{residual:.3f}{degree}",
+        }
+        for key, text in texts.items():
+            self.labels[key].setText(text)
+        # Red when aligning again would still rotate the eyes
+        self.labels["residual_rotation_degrees"].setStyleSheet(
+            "" if converged(metrics) else "color: red"
+        )
+
+
+class AlignmentStatus(QtWidgets.QLabel):
+    """Permanent status bar summary, so it does not hide other messages"""
+
+    @QtCore.pyqtSlot(object)
+    def show_metrics(self, metrics: dict) -> None:
+        self.setText(summary(metrics))
@@ -1,8 +1,11 @@
 import sys
 
-from PyQt5 import QtWidgets
+from PyQt5 import QtCore, QtWidgets
 
-from .main_window import SchmereoMainWindow
+from .startup_profile import profile
+
+with profile.span("import schmereo.main_window"):
+    from .main_window import SchmereoMainWindow
 
 
 # https://github.com/winpython/winpython/issues/613
@@ -16,11 +19,16 @@ def hack_around_opengl_bug():
 
 class SchmereoApplication(QtWidgets.QApplication):
     def __init__(self):
-        super().__init__(sys.argv)
+        with profile.span("create QApplication"):
+            super().__init__(sys.argv)
         hack_around_opengl_bug()
         self.setOrganizationName("rotatingpenguin.com")
         self.setApplicationName("schmereo")
         self.setApplicationDisplayName("Schmereo")
-        main_win = SchmereoMainWindow()
-        main_win.show()
+        with profile.span("create main window"):
+            main_win = SchmereoMainWindow()
+        with profile.span("show main window"):
+            main_win.show()
+        QtCore.QTimer.singleShot(0, main_win.recover_untitled)
+        QtCore.QTimer.singleShot(0, profile.finish)
         sys.exit(self.exec_())
@@ -1,25 +1,11 @@
 from PyQt5 import QtCore
 
-from schmereo.coord_sys import CanvasPos
+from schmereo.core.camera import CameraModel
 
 
-class Camera(QtCore.QObject):
+class Camera(QtCore.QObject, CameraModel):
     def __init__(self):
         super().__init__()
-        self._zoom = 1.0
-        self._center = CanvasPos(0, 0)
-        self._dirty = True
-
-    @property
-    def center(self):
-        return self._center
-
-    @center.setter
-    def center(self, value: CanvasPos):
-        if self._center == value:
-            return
-        self._center = value
-        self._dirty = True
 
     changed = QtCore.pyqtSignal()
 
@@ -27,21 +13,3 @@ class Camera(QtCore.QObject):
         if self._dirty:
             self.changed.emit()
         self._dirty = False
-
-    def reset(self):
-        self._zoom = 1.0
-        self._center = CanvasPos(0, 0)
-        self._dirty = True
-
-    @property
-    def zoom(self):
-        return self._zoom
-
-    @zoom.setter
-    def zoom(self, value: float):
-        if value < 0.25:
-            value = 0.25
-        if self._zoom == value:
-            return
-        self._zoom = value
-        self._dirty = True
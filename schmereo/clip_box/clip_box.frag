@@ -0,0 +1,41 @@
+#version 460
+
+// Clip box overlay: darkens the canvas outside the box, and draws a dashed
+// edge, like ClipBox.paint_gl() does with QPainter.
+
+// box edges in canvas coordinates: left, top, right, bottom
+layout(location = 3) uniform vec4 box = vec4(-1, -1, 1, 1);
+layout(location = 4) uniform float pixel_size = 0.01;  // canvas units per window pixel
+layout(location = 5) uniform bool hover = false;
+
+in noperspective vec2 canvasCoord;
+out vec4 frag_color;
+
+const vec4 SHADE_COLOR = vec4(0x20, 0x40, 0x80, 0x90) / 255.0;
+const vec4 SHADE_HOVER_COLOR = vec4(0x20, 0x40, 0x80, 0x50) / 255.0;
+const vec4 EDGE_COLOR = vec4(0x40, 0x90, 0xFF, 0x70) / 255.0;
+const vec4 EDGE_HOVER_COLOR = vec4(0x40, 0xA0, 0xFF, 0x90) / 255.0;
+
+void main()
+{
+    vec2 p = canvasCoord;
+    // signed distance to the box edge, in window pixels; negative inside
+    vec2 d2 = max(box.xy - p, p - box.zw);
+    float d = (length(max(d2, 0)) + min(max(d2.x, d2.y), 0)) / pixel_size;
+
+    float width = hover ? 3.0 : 2.5;  // pixels
+    if (abs(d) < 0.5 * width) {
+        // Qt.DashLine: 4 widths on, 2 off, measured along the edge from its corner
+        bool vertical = abs(d2.x) < abs(d2.y);
+        float along = vertical ? p.y - box.y : p.x - box.x;
+        along = along / pixel_size + 0.5 * width;
+        if (mod(along, 6.0 * width) < 4.0 * width) {
+            frag_color = hover ? EDGE_HOVER_COLOR : EDGE_COLOR;
+            return;
+        }
+    }
+    if (d > 0)
+        frag_color = hover ? SHADE_HOVER_COLOR : SHADE_COLOR;
+    else
+        discard;
+}
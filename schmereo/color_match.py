@@ -0,0 +1,131 @@
+from PyQt5 import QtCore, QtWidgets
+from PyQt5.QtCore import pyqtSignal, pyqtSlot, QObject
+
+from schmereo.command import SetColorMatchCommand
+from schmereo.core.color_match import ColorMatch, shown_region
+
+
+class ColorMatchDialog(QtWidgets.QDialog):
+    """Non-modal controls for brightness and contrast matching"""
+
+    CHOICES = (
+        ("Off", None),
+        ("Adjust right eye to match left", "right"),
+        ("Adjust left eye to match right", "left"),
+    )
+
+    def __init__(self, parent=None):
+        super().__init__(parent=parent)
+        self.setWindowTitle("Match Colors")
+        self.eye_box = QtWidgets.QComboBox()
+        for text, eye in self.CHOICES:
+            self.eye_box.addItem(text, eye)
+        self.strength_slider = QtWidgets.QSlider(QtCore.Qt.Horizontal)
+        self.strength_slider.setRange(0, 100)
+        layout = QtWidgets.QFormLayout(self)
+        layout.addRow("Matching:", self.eye_box)
+        layout.addRow("Strength:", self.strength_slider)
+        self._drag = 0  # counts slider drags
+        self.eye_box.currentIndexChanged.connect(self._emit_changed)
+        self.strength_slider.valueChanged.connect(self._emit_changed)
+        self.strength_slider.sliderPressed.connect(self._start_drag)
+
+    # (eye, strength), as in ColorMatch.state; and a token of the current slider drag, or None
+    changed = pyqtSignal(object, object)
+
+    def _start_drag(self) -> None:
+        self._drag += 1
+
+    def _emit_changed(self, *_) -> None:
+        drag = self._drag if self.strength_slider.isSliderDown() else None
+        self.changed.emit(self.state, drag)
+
+    @property
+    def state(self):
+        return self.eye_box.currentData(), self.strength_slider.value() / 100.0
+
+    @state.setter
+    def state(self, value):
+        eye, strength = value
+        self.eye_box.blockSignals(True)
+        self.strength_slider.blockSignals(True)
+        self.eye_box.setCurrentIndex([c[1] for c in self.CHOICES].index(eye))
+        self.strength_slider.setValue(round(strength * 100))
+        self.eye_box.blockSignals(False)
+        self.strength_slider.blockSignals(False)
+        self.strength_slider.setEnabled(eye is not None)
+
+
+class ColorMatchManager(QObject):
+    """
+    Keeps the color lookup tables of the eye views in sync with the
+    project's ColorMatch, and with what each eye shows in the clip box:
+    it is a RenderScheduler observer. Histograms are cached per region, so
+    dragging the strength slider is cheap, however big the images are.
+    """
+
+    def __init__(self, main_window):
+        super().__init__(parent=main_window)
+        self.main_window = main_window
+        self.color_match = ColorMatch()
+        self.dialog = None
+        self.painted_state = None
+        main_window.ui.actionMatch_Colors.triggered.connect(
+            self.on_actionMatch_Colors_triggered
+        )
+
+    @pyqtSlot()
+    def on_actionMatch_Colors_triggered(self):
+        if self.dialog is None:
+            self.dialog = ColorMatchDialog(parent=self.main_window)
+            self.dialog.changed.connect(self.on_dialog_changed)
+        self.dialog.state = self.color_match.state
+        self.dialog.show()
+        self.dialog.raise_()
+
+    @pyqtSlot(object, object)
+    def on_dialog_changed(self, state, drag):
+        if state == self.color_match.state:
+            return
+        self.main_window.undo_stack.push(
+            SetColorMatchCommand(self, self.color_match.state, state, drag)
+        )
+
+    def reset(self) -> None:
+        self.set_state(ColorMatch().state)
+
+    def set_state(self, state) -> None:
+        self.color_match.state = state
+        if self.dialog is not None:
+            self.dialog.state = state
+        self.update_luts()
+
+    def render_state(self) -> tuple:
+        """The regions the histograms are taken from; see RenderScheduler"""
+        return tuple(self._regions())
+
+    def update(self) -> None:
+        self.painted_state = self.render_state()
+        if self.color_match.eye is not None:
+            self.update_luts()
+
+    def _regions(self):
+        cb = self.main_window.clip_box
+        box = (cb.left, cb.top, cb.right, cb.bottom)
+        for w in self.main_window.eye_widgets():
+            if w.image.pixels is None:
+                yield None
+            else:
+                yield shown_region(w.eye.image_size(), w.image.transform, box)
+
+    def update_luts(self) -> None:
+        widgets = list(self.main_window.eye_widgets())
+        luts = [None, None]
+        if self.color_match.eye is not None:
+            histograms = [w.image.histogram(r) for w, r in zip(widgets, self._regions())]
+            luts = self.color_match.luts(histograms)
+        for widget, lut in zip(widgets, luts):
+            if lut is None and widget.image.lut is None:
+                continue
+            widget.image.set_lut(lut)
+            widget.request_repaint("color match")
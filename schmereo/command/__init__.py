@@ -4,6 +4,8 @@ from schmereo.clip_box import ClipBox
 from schmereo.coord_sys import ImagePixelCoordinate, FractionalImagePos
 from schmereo.image.aligner import Aligner
 
+SET_COLOR_MATCH_ID = 1  # QUndoCommand.id() of SetColorMatchCommand, for merging
+
 
 class AddMarkerCommand(QUndoCommand):
     def __init__(self, widget: 'ImageWidget', marker_pos: ImagePixelCoordinate, parent=None):
@@ -17,7 +19,24 @@ class AddMarkerCommand(QUndoCommand):
 
     def undo(self):
         del self.widget.markers[-1]
-        self.widget.update()
+        self.widget.request_repaint("markers")
+
+
+class AddMarkerPairCommand(QUndoCommand):
+    """A marker in each eye, as one undo step"""
+
+    def __init__(
+        self,
+        left_widget: 'ImageWidget',
+        right_widget: 'ImageWidget',
+        left_pos: ImagePixelCoordinate,
+        right_pos: ImagePixelCoordinate,
+        parent=None,
+    ):
+        super().__init__(parent)
+        self.setText("add marker pair")
+        AddMarkerCommand(left_widget, left_pos, parent=self)
+        AddMarkerCommand(right_widget, right_pos, parent=self)
 
 
 class AdjustClipBoxCommand(QUndoCommand):
@@ -42,25 +61,53 @@ class AdjustClipBoxCommand(QUndoCommand):
 
 
 class AlignNowCommand(QUndoCommand):
-    def __init__(self, main_window, parent=None):
+    def __init__(self, main_window, solution=None, parent=None):
+        """solution, e.g. from the live alignment preview, is applied instead of solving"""
         super().__init__(parent)
         self.setText("align images")
         self.aligner = Aligner(main_window)
         self.main_window = main_window
+        self.solution = solution
         self.old_centers = [w.image.transform.center[:] for w in main_window.eye_widgets()]
         self.old_rotations = [w.image.transform.rotation for w in main_window.eye_widgets()]
 
     def redo(self):
-        self.aligner.align()
+        self.aligner.align(self.solution)
         for w in self.main_window.eye_widgets():
-            w.update()
+            w.request_repaint("transform")
 
     def undo(self):
         for index, w in enumerate(self.main_window.eye_widgets()):
             w.image.transform.center = FractionalImagePos(*self.old_centers[index])
             w.image.transform.rotation = self.old_rotations[index]
         for w in self.main_window.eye_widgets():
-            w.update()
+            w.request_repaint("transform")
+
+
+class SetColorMatchCommand(QUndoCommand):
+    def __init__(self, manager, old_state, new_state, drag=None, parent=None):
+        super().__init__(parent)
+        self.setText("match colors")
+        self.manager = manager
+        self.old_state = old_state
+        self.new_state = new_state
+        self.drag = drag  # changes from one slider drag share a token, and merge
+
+    def id(self) -> int:
+        return SET_COLOR_MATCH_ID
+
+    def mergeWith(self, other) -> bool:
+        # One undo step for a whole slider drag, but not for separate drags
+        if other.id() != self.id() or self.drag is None or other.drag != self.drag:
+            return False
+        self.new_state = other.new_state
+        return True
+
+    def redo(self):
+        self.manager.set_state(self.new_state)
+
+    def undo(self):
+        self.manager.set_state(self.old_state)
 
 
 class ClearMarkersCommand(QUndoCommand):
@@ -75,13 +122,13 @@ class ClearMarkersCommand(QUndoCommand):
     def redo(self):
         self.left_widget.markers.clear()
         self.right_widget.markers.clear()
-        self.left_widget.update()
-        self.right_widget.update()
+        self.left_widget.request_repaint("markers")
+        self.right_widget.request_repaint("markers")
 
     def undo(self):
         self.left_widget.markers.clear()
         self.right_widget.markers.clear()
         self.left_widget.markers.add_markers(self.old_left)
         self.right_widget.markers.add_markers(self.old_right)
-        self.left_widget.update()
-        self.right_widget.update()
+        self.left_widget.request_repaint("markers")
+        self.right_widget.request_repaint("markers")
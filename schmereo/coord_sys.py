@@ -5,11 +5,8 @@ Use thin wrapper classes to keep different coordinate frames semantically distin
 import math
 from typing import TypeVar
 
-from PyQt5 import QtCore
 import numpy
 
-import schmereo
-
 T = TypeVar("T")
 
 
@@ -76,11 +73,11 @@ class WindowPos(PosBase):
     """
 
     @classmethod
-    def from_QPoint(cls, qpoint: QtCore.QPoint) -> "WindowPos":
+    def from_QPoint(cls, qpoint: "QtCore.QPoint") -> "WindowPos":
         return WindowPos(x=qpoint.x(), y=qpoint.y())
 
     @classmethod
-    def from_CanvasPos(self, pos: "CanvasPos", camera: "schmereo.Camera", size: QtCore.QSize) -> "WindowPos":
+    def from_CanvasPos(self, pos: "CanvasPos", camera: "Camera", size: "QtCore.QSize") -> "WindowPos":
         return pos.to_WindowPos()
 
 
@@ -107,7 +104,7 @@ class CanvasPos(PosBase):
 
     @classmethod
     def from_WindowPos(
-        cls, pos: WindowPos, camera: "schmereo.Camera", size: QtCore.QSize
+        cls, pos: WindowPos, camera: "Camera", size: "QtCore.QSize"
     ) -> "CanvasPos":
         scale = 2.0 / camera.zoom / size.width()  # yes, width
         x = pos.x - size.width() / 2.0
@@ -118,7 +115,7 @@ class CanvasPos(PosBase):
         y += camera.center.y
         return CanvasPos(x=x, y=y)
 
-    def to_WindowPos(self, camera: "schmereo.Camera", size: QtCore.QSize) -> WindowPos:
+    def to_WindowPos(self, camera: "Camera", size: "QtCore.QSize") -> WindowPos:
         x = self.x - camera.center.x
         y = self.y - camera.center.y
         #
@@ -0,0 +1,19 @@
+"""
+Qt-free model of a schmereo project: images, transforms, markers, clip box
+and the alignment solver. Importing this package does not load Qt, OpenGL
+or PIL, so it is cheap to use from scripts and worker processes.
+"""
+
+from schmereo.core.aligner import AlignmentSolution, solve_alignment
+from schmereo.core.atomic_file import atomic_write
+from schmereo.core.auto_crop import auto_crop
+from schmereo.core.camera import CameraModel
+from schmereo.core.clip_box import ClipBoxModel, Edge
+from schmereo.core.color_match import ColorMatch
+from schmereo.core.composite import CompositeMode, composite
+from schmereo.core.eye import EyeModel
+from schmereo.core.image import ImageModel
+from schmereo.core.marker import MarkerArray
+from schmereo.core.metrics import alignment_metrics
+from schmereo.core.project import Project
+from schmereo.core.resample import FilterMode
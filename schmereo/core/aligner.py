@@ -0,0 +1,110 @@
+"""
+Alignment solver: computes the eye image transforms that bring homologous
+markers onto the same canvas rows.
+"""
+
+import copy
+import math
+
+import numpy
+
+from schmereo.coord_sys import FractionalImagePos, ImageTransform
+from schmereo.core import transform
+from schmereo.core.eye import EyeModel
+
+
+class AlignmentSolution(object):
+    def __init__(
+        self,
+        left_transform: ImageTransform,
+        right_transform: ImageTransform,
+        residual_rotation: float = 0.0,
+    ):
+        self.left_transform = left_transform
+        self.right_transform = right_transform
+        self.residual_rotation = residual_rotation  # radians, after solving
+
+
+def _rotation_from_dv(points: numpy.ndarray, dv: numpy.ndarray):
+    """
+    Per-point rotation that would shift each point vertically by dv,
+    and the weight of that estimate. Points where no such rotation
+    exists get zero weight.
+    """
+    x, y = points[:, 0], points[:, 1]
+    theta = numpy.arctan2(y, x)
+    r = numpy.hypot(x, y)
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        sin_theta2 = (y + dv) / r
+    valid = (r > 0) & (numpy.abs(sin_theta2) <= 1.0)
+    theta2 = numpy.arcsin(numpy.where(valid, sin_theta2, 0.0))  # range -pi/2 -> +pi/2
+    theta2 = numpy.where(numpy.abs(theta) > math.pi / 2, math.pi - theta2, theta2)
+    dtheta = numpy.mod(theta2 - theta + math.pi, 2 * math.pi) - math.pi
+    weight = numpy.where(valid, r * (numpy.cos(theta / 2.0) + 1), 0.0)
+    return dtheta, weight
+
+
+def compute_rotation(points1, points2) -> float:
+    """Relative rotation of two matched (N, 2) canvas point sets"""
+    points1 = numpy.asarray(points1, dtype=numpy.float64).reshape(-1, 2)
+    points2 = numpy.asarray(points2, dtype=numpy.float64).reshape(-1, 2)
+    if len(points1) < 2:
+        return 0.0
+    # Move to local coordinate system
+    points1 = points1 - points1.mean(axis=0)
+    points2 = points2 - points2.mean(axis=0)
+    # vertical offset per point -- right minus left
+    dv = points2[:, 1] - points1[:, 1]
+    dtheta1, weight1 = _rotation_from_dv(points1, dv)
+    dtheta2, weight2 = _rotation_from_dv(points2, -dv)
+    total_weight = weight1.sum() + weight2.sum()
+    if total_weight <= 0:
+        return 0.0
+    angle_sum = (dtheta1 * weight1).sum() - (dtheta2 * weight2).sum()
+    return float(angle_sum / total_weight)
+
+
+def translate_eyes(lt: ImageTransform, rt: ImageTransform, dh: float, dv: float) -> None:
+    """
+    Move the eyes towards each other, half way each, so that a point that is
+    (dh, dv) canvas units further in the right eye than in the left lands on
+    the same canvas position in both.
+    """
+    new_center_c = (0.5 * dh, 0.5 * dv)  # for left image (?)
+    old_center_c = (0.0, 0.0)
+    ldiff = transform.fract_from_canvas((new_center_c, old_center_c), lt)
+    lt.center += FractionalImagePos(*(ldiff[1] - ldiff[0]))
+    rdiff = transform.fract_from_canvas((old_center_c, new_center_c), rt)
+    rt.center += FractionalImagePos(*(rdiff[1] - rdiff[0]))
+
+
+def solve_alignment(left: EyeModel, right: EyeModel) -> AlignmentSolution:
+    """
+    Compute new transforms for both eyes, without modifying either eye.
+    """
+    lt = copy.deepcopy(left.image.transform)
+    rt = copy.deepcopy(right.image.transform)
+    cm = min(len(left.markers), len(right.markers))
+    if cm < 1:
+        return AlignmentSolution(lt, rt)
+    lm = left.markers.points[:cm]
+    rm = right.markers.points[:cm]
+    l_size = left.image_size()
+    r_size = right.image_size()
+    # Compute rotation, in current canvas coordinates
+    lc = transform.canvas_from_image(lm, lt, l_size)
+    rc = transform.canvas_from_image(rm, rt, r_size)
+    d_angle = compute_rotation(lc, rc)
+    lt.rotation += d_angle / 2.0
+    rt.rotation -= d_angle / 2.0
+    # Recompute positions using updated rotation
+    lc = transform.canvas_from_image(lm, lt, l_size)
+    rc = transform.canvas_from_image(rm, rt, r_size)
+    residual = compute_rotation(lc, rc)
+    # Translation
+    # a) horizontal - use minimum separation
+    min_dh = float(numpy.min(rc[:, 0] - lc[:, 0]))
+    # b) vertical - use average separation
+    avg_dv = float(numpy.mean(rc[:, 1] - lc[:, 1]))
+    translate_eyes(lt, rt, min_dh, avg_dv)
+    return AlignmentSolution(lt, rt, residual)
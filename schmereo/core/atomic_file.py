@@ -0,0 +1,47 @@
+"""
+Atomic file writes: data goes to a temporary file in the destination
+folder, is flushed to disk, and is then renamed over the target, so a crash
+never leaves a truncated file. If writing fails, the temporary file is
+removed and the target is untouched.
+"""
+
+import os
+import tempfile
+
+
+def atomic_write(file_name: str, write_fn, mode="w") -> None:
+    """
+    Write a file through write_fn(file object), opened with mode, so that
+    the file is either replaced whole or left as it was
+    """
+    folder = os.path.dirname(os.path.abspath(file_name))
+    fd, temp_name = tempfile.mkstemp(
+        prefix=f".{os.path.basename(file_name)}.", suffix=".tmp", dir=folder
+    )
+    try:
+        # mkstemp() creates private files; keep the permissions of the target
+        if os.path.exists(file_name):
+            os.chmod(temp_name, os.stat(file_name).st_mode & 0o777)
+        else:
+            os.chmod(temp_name, 0o644)
+        with os.fdopen(fd, mode) as fh:
+            write_fn(fh)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(temp_name, file_name)
+    except BaseException:
+        if os.path.exists(temp_name):
+            os.remove(temp_name)
+        raise
+    _fsync_folder(folder)
+
+
+def _fsync_folder(folder: str) -> None:
+    """Make the rename durable too, where the platform allows it"""
+    if not hasattr(os, "O_DIRECTORY"):
+        return  # e.g. Windows
+    fd = os.open(folder, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
@@ -0,0 +1,40 @@
+from schmereo.coord_sys import CanvasPos
+
+
+class CameraModel(object):
+    """View center and zoom, shared by both eye views"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._zoom = 1.0
+        self._center = CanvasPos(0, 0)
+        self._dirty = True
+
+    @property
+    def center(self):
+        return self._center
+
+    @center.setter
+    def center(self, value: CanvasPos):
+        if self._center == value:
+            return
+        self._center = value
+        self._dirty = True
+
+    def reset(self):
+        self._zoom = 1.0
+        self._center = CanvasPos(0, 0)
+        self._dirty = True
+
+    @property
+    def zoom(self):
+        return self._zoom
+
+    @zoom.setter
+    def zoom(self, value: float):
+        if value < 0.25:
+            value = 0.25
+        if self._zoom == value:
+            return
+        self._zoom = value
+        self._dirty = True
@@ -0,0 +1,130 @@
+"""
+Brightness and contrast matching between the eyes, by histogram matching.
+
+Histograms come from a subsample of the part of each image inside the
+clip box, so that each eye of a scanned card is measured on its own half,
+and they are cheap to compute. Everything after that works on 256-entry
+lookup tables per channel, so changing the settings never touches the
+full resolution pixels. The tables are applied by image.frag on screen, and by
+apply_lut(), from resample_eye(), on export.
+"""
+
+import math
+from typing import Optional, Tuple
+
+import numpy
+
+from schmereo.coord_sys import ImageTransform
+from schmereo.core import transform as xf
+
+EYES = ("left", "right")
+
+
+def shown_region(
+    image_size, transform: ImageTransform, box
+) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Bounding (x0, y0, x1, y1) image pixels of the canvas box (left, top,
+    right, bottom), within the image; None if the box misses the image
+    """
+    left, top, right, bottom = box
+    corners = xf.image_from_canvas(
+        [(left, top), (right, top), (right, bottom), (left, bottom)], transform, image_size
+    )
+    width, height = image_size
+    x0, y0 = (max(0, math.floor(v)) for v in corners.min(axis=0))
+    x1 = min(width, math.ceil(corners[:, 0].max()))
+    y1 = min(height, math.ceil(corners[:, 1].max()))
+    if x1 <= x0 or y1 <= y0:
+        return None
+    return x0, y0, x1, y1
+
+
+def histogram(
+    pixels: numpy.ndarray, max_samples: int = 1 << 18, region=None
+) -> numpy.ndarray:
+    """
+    (3, 256) counts of the red, green and blue values of an (H, W, C) uint8
+    image, from a regular subsample of at most about max_samples pixels;
+    only of the (x0, y0, x1, y1) region, e.g. from shown_region(), if given.
+    """
+    if region is not None:
+        x0, y0, x1, y1 = region
+        pixels = pixels[y0:y1, x0:x1]
+    height, width = pixels.shape[:2]
+    step = max(1, int(numpy.ceil(numpy.sqrt(height * width / max_samples))))
+    rgb = pixels[::step, ::step, :3]
+    # one bincount for all channels: offset each channel into its own 256 bins
+    values = rgb.astype(numpy.intp) + numpy.array((0, 256, 512))
+    return numpy.bincount(values.ravel(), minlength=768).reshape(3, 256)
+
+
+def identity_lut() -> numpy.ndarray:
+    return numpy.tile(numpy.arange(256, dtype=numpy.uint8), (3, 1))
+
+
+def match_lut(source_histogram, reference_histogram, strength: float = 1.0) -> numpy.ndarray:
+    """
+    (3, 256) uint8 tables mapping the source values so that their
+    distribution matches the reference. strength blends from the identity
+    (0) to the full match (1).
+    """
+    levels = numpy.arange(256, dtype=numpy.float64)
+    result = numpy.empty((3, 256), dtype=numpy.uint8)
+    for channel in range(3):
+        source_cdf = numpy.cumsum(source_histogram[channel], dtype=numpy.float64)
+        reference_cdf = numpy.cumsum(reference_histogram[channel], dtype=numpy.float64)
+        if source_cdf[-1] == 0 or reference_cdf[-1] == 0:
+            result[channel] = levels
+            continue
+        source_cdf /= source_cdf[-1]
+        reference_cdf /= reference_cdf[-1]
+        matched = numpy.interp(source_cdf, reference_cdf, levels)
+        blended = levels + strength * (matched - levels)
+        result[channel] = numpy.clip(numpy.round(blended), 0, 255)
+    return result
+
+
+def apply_lut(pixels: numpy.ndarray, lut: numpy.ndarray) -> numpy.ndarray:
+    """Copy of (..., C) uint8 pixels with the tables applied to their RGB"""
+    result = pixels.copy()
+    for channel in range(3):
+        result[..., channel] = lut[channel].take(pixels[..., channel])
+    return result
+
+
+class ColorMatch(object):
+    """Which eye is adjusted to look like the other, and how strongly"""
+
+    def __init__(self):
+        self.eye = None  # "left" or "right"; None turns matching off
+        self.strength = 1.0
+
+    @property
+    def state(self):
+        return self.eye, self.strength
+
+    @state.setter
+    def state(self, value):
+        self.eye, self.strength = value
+
+    def luts(self, histograms):
+        """
+        Lookup table for each eye, given the (left, right) histograms. An
+        eye that is not adjusted gets None.
+        """
+        result = [None, None]
+        if self.eye is None or any(h is None for h in histograms):
+            return result
+        index = EYES.index(self.eye)
+        result[index] = match_lut(histograms[index], histograms[1 - index], self.strength)
+        return result
+
+    def to_dict(self):
+        return {"eye": self.eye, "strength": self.strength}
+
+    def from_dict(self, data):
+        self.eye = data.get("eye")
+        if self.eye not in EYES:
+            self.eye = None
+        self.strength = float(data.get("strength", 1.0))
@@ -0,0 +1,78 @@
+"""
+Combined stereo pair viewing modes, on the CPU.
+
+The output preview does the same compositing on the GPU in composite.frag;
+this version is for export and for use without a display. Inputs are the
+two eye renders, e.g. from schmereo.core.resample.resample_eye().
+"""
+
+import enum
+
+import numpy
+
+
+class CompositeMode(enum.Enum):
+    # values are the mode numbers in composite.frag
+    SIDE_BY_SIDE = 0
+    CROSS_EYE = 1
+    ANAGLYPH = 2
+    INTERLACED = 3
+
+    @property
+    def label(self) -> str:
+        return _LABELS[self]
+
+
+_LABELS = {
+    CompositeMode.SIDE_BY_SIDE: "Side by side",
+    CompositeMode.CROSS_EYE: "Cross-eye",
+    CompositeMode.ANAGLYPH: "Red/cyan anaglyph (Dubois)",
+    CompositeMode.INTERLACED: "Row interlaced",
+}
+
+# Dubois least squares red/cyan matrices, for gamma-encoded RGB
+DUBOIS_LEFT = numpy.array(
+    (
+        (0.437, 0.449, 0.164),
+        (-0.062, -0.062, -0.024),
+        (-0.048, -0.050, -0.017),
+    ),
+    dtype=numpy.float32,
+)
+DUBOIS_RIGHT = numpy.array(
+    (
+        (-0.011, -0.032, -0.007),
+        (0.377, 0.761, 0.009),
+        (-0.026, -0.093, 1.234),
+    ),
+    dtype=numpy.float32,
+)
+
+
+def anaglyph(left: numpy.ndarray, right: numpy.ndarray) -> numpy.ndarray:
+    rgb = left[..., :3] @ (DUBOIS_LEFT.T / 255.0) + right[..., :3] @ (DUBOIS_RIGHT.T / 255.0)
+    result = numpy.empty_like(left)
+    result[..., :3] = numpy.clip(rgb * 255.0 + 0.5, 0, 255)
+    if left.shape[-1] == 4:
+        result[..., 3] = 255
+    return result
+
+
+def composite(left: numpy.ndarray, right: numpy.ndarray, mode: CompositeMode) -> numpy.ndarray:
+    """
+    One output image from two (H, W, C) uint8 eye images of the same shape.
+    Side by side and cross-eye outputs are twice as wide.
+    """
+    if left.shape != right.shape:
+        raise ValueError(f"Eye images differ in shape: {left.shape} and {right.shape}")
+    if mode == CompositeMode.SIDE_BY_SIDE:
+        return numpy.concatenate((left, right), axis=1)
+    if mode == CompositeMode.CROSS_EYE:
+        return numpy.concatenate((right, left), axis=1)
+    if mode == CompositeMode.ANAGLYPH:
+        return anaglyph(left, right)
+    if mode == CompositeMode.INTERLACED:
+        result = left.copy()
+        result[1::2] = right[1::2]  # left eye on even rows, from the top
+        return result
+    raise ValueError(f"Unknown composite mode {mode}")
@@ -0,0 +1,358 @@
+"""
+Automatic homologous points between the two eyes, by normalized cross
+correlation (NCC) on image pyramids.
+
+The two views of a stereo card differ mostly by a translation, a small
+rotation and the horizontal parallax of the scene. find_correspondences()
+estimates the overall offset by phase correlation of small copies of the
+images, picks well textured points in the left eye, and tracks each one
+from a coarse pyramid level down to full resolution, searching only a few
+pixels around the prediction at each level. Points are in image pixel
+coordinates, as markers are: the origin is the upper left corner of the
+image, so the first pixel's center is at (0.5, 0.5).
+"""
+
+from typing import List, Optional, Tuple
+
+import numpy
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def grayscale(pixels: numpy.ndarray) -> numpy.ndarray:
+    """(H, W) float32 luma of an (H, W) or (H, W, C) image"""
+    if pixels.ndim == 2:
+        return pixels.astype(numpy.float32)
+    weights = numpy.array((0.299, 0.587, 0.114), dtype=numpy.float32)
+    return pixels[..., :3].astype(numpy.float32) @ weights
+
+
+def luma8(pixels: numpy.ndarray, rows: int = 256) -> numpy.ndarray:
+    """(H, W) uint8 luma, converted a band of rows at a time to bound temporary memory"""
+    if pixels.ndim == 2:
+        return numpy.asarray(pixels, dtype=numpy.uint8)
+    result = numpy.empty(pixels.shape[:2], dtype=numpy.uint8)
+    for row in range(0, pixels.shape[0], rows):
+        gray = grayscale(pixels[row : row + rows])
+        result[row : row + rows] = numpy.clip(gray + 0.5, 0, 255)
+    return result
+
+
+def downsample(gray: numpy.ndarray) -> numpy.ndarray:
+    """Half size, by averaging 2x2 blocks, in the same dtype"""
+    height, width = (gray.shape[0] // 2) * 2, (gray.shape[1] // 2) * 2
+    g = gray[:height, :width]
+    if gray.dtype == numpy.uint8:
+        total = g[0::2, 0::2].astype(numpy.uint16)
+        total += g[1::2, 0::2]
+        total += g[0::2, 1::2]
+        total += g[1::2, 1::2]
+        total += 2  # round to nearest
+        return (total >> 2).astype(numpy.uint8)
+    return 0.25 * (g[0::2, 0::2] + g[1::2, 0::2] + g[0::2, 1::2] + g[1::2, 1::2])
+
+
+def pyramid(gray: numpy.ndarray, min_size: int = 32) -> List[numpy.ndarray]:
+    """Levels of halving resolution; level 0 is gray itself"""
+    levels = [gray]
+    while min(levels[-1].shape) // 2 >= min_size:
+        levels.append(downsample(levels[-1]))
+    return levels
+
+
+class ImagePyramid(object):
+    """
+    uint8 grayscale levels of an image, for repeated searches, e.g. one per
+    placed marker. A 100 megapixel image takes about 133 MB.
+    """
+
+    def __init__(self, pixels: numpy.ndarray, min_size: int = 32):
+        self.levels = pyramid(luma8(pixels), min_size)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(level.nbytes for level in self.levels)
+
+
+def level_for_size(levels: List[numpy.ndarray], max_size: int) -> int:
+    """Finest level whose longest side is at most max_size"""
+    for index, level in enumerate(levels):
+        if max(level.shape) <= max_size:
+            return index
+    return len(levels) - 1
+
+
+def to_level(points, level: int) -> numpy.ndarray:
+    """Image pixel coordinates to (x, y) pixel indices at a pyramid level"""
+    return numpy.asarray(points, dtype=numpy.float64) / (1 << level) - 0.5
+
+
+def from_level(indices, level: int) -> numpy.ndarray:
+    return (numpy.asarray(indices, dtype=numpy.float64) + 0.5) * (1 << level)
+
+
+def phase_correlation(a: numpy.ndarray, b: numpy.ndarray) -> Tuple[float, float]:
+    """
+    (dx, dy) such that the content at (x, y) in a is at (x + dx, y + dy) in
+    b, to the nearest pixel. Images are cropped to their common size.
+    """
+    height, width = min(a.shape[0], b.shape[0]), min(a.shape[1], b.shape[1])
+    window = numpy.outer(numpy.hanning(height), numpy.hanning(width))
+    fa = numpy.fft.rfft2((a[:height, :width] - a.mean()) * window)
+    fb = numpy.fft.rfft2((b[:height, :width] - b.mean()) * window)
+    cross = fb * numpy.conj(fa)
+    cross /= numpy.abs(cross) + 1e-12
+    correlation = numpy.fft.irfft2(cross, s=(height, width))
+    dy, dx = numpy.unravel_index(numpy.argmax(correlation), correlation.shape)
+    if dy > height // 2:
+        dy -= height
+    if dx > width // 2:
+        dx -= width
+    return float(dx), float(dy)
+
+
+def _box_sum(a: numpy.ndarray, radius: int) -> numpy.ndarray:
+    """
+    Sum over the (2 radius + 1) square around each pixel, zero outside, of
+    the first two axes; further axes, e.g. candidate disparities, are kept
+    """
+    size = 2 * radius + 1
+    # one more zero before than after, so that differences of the integral are a's size
+    padded = numpy.pad(a, [(radius + 1, radius)] * 2 + [(0, 0)] * (a.ndim - 2))
+    integral = padded.cumsum(axis=0).cumsum(axis=1)
+    return (
+        integral[size:, size:]
+        - integral[:-size, size:]
+        - integral[size:, :-size]
+        + integral[:-size, :-size]
+    )
+
+
+def corner_strength(gray: numpy.ndarray, radius: int = 2) -> numpy.ndarray:
+    """Smaller eigenvalue of the local structure tensor (Shi-Tomasi)"""
+    gy, gx = numpy.gradient(gray)
+    xx = _box_sum(gx * gx, radius)
+    yy = _box_sum(gy * gy, radius)
+    xy = _box_sum(gx * gy, radius)
+    half_trace = 0.5 * (xx + yy)
+    return half_trace - numpy.sqrt(numpy.maximum(half_trace ** 2 - (xx * yy - xy * xy), 0))
+
+
+def select_points(
+    gray: numpy.ndarray, count: int, border: int, grid: Tuple[int, int] = (16, 12)
+) -> numpy.ndarray:
+    """
+    Up to count well textured (x, y) pixel indices, at most one per cell of
+    a grid over the image, strongest first.
+    """
+    strength = corner_strength(gray)
+    height, width = gray.shape
+    strength[:border] = strength[height - border :] = 0
+    strength[:, :border] = strength[:, width - border :] = 0
+    threshold = 0.01 * strength.max()
+    columns, rows = grid
+    points = []
+    for y0, y1 in zip(*_edges(height, rows)):
+        for x0, x1 in zip(*_edges(width, columns)):
+            cell = strength[y0:y1, x0:x1]
+            if cell.size == 0:
+                continue
+            j, i = numpy.unravel_index(numpy.argmax(cell), cell.shape)
+            if cell[j, i] > threshold:
+                points.append((cell[j, i], x0 + i, y0 + j))
+    points.sort(reverse=True)
+    return numpy.array([(x, y) for _, x, y in points[:count]], dtype=numpy.float64).reshape(-1, 2)
+
+
+def _edges(length: int, cells: int):
+    edges = numpy.linspace(0, length, cells + 1).astype(int)
+    return edges[:-1], edges[1:]
+
+
+def ncc(template: numpy.ndarray, window: numpy.ndarray) -> numpy.ndarray:
+    """
+    Normalized cross correlation of template at every position inside
+    window: an array of (window - template + 1) scores in [-1, 1].
+    """
+    t = template - template.mean()
+    t_norm = numpy.sqrt((t * t).sum())
+    patches = sliding_window_view(window, template.shape)
+    n = template.size
+    sums = patches.sum(axis=(2, 3))
+    squares = numpy.einsum("ijkl,ijkl->ij", patches, patches)
+    numerator = numpy.einsum("ijkl,kl->ij", patches, t)
+    variance = numpy.maximum(squares - sums * sums / n, 0)
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        scores = numerator / (numpy.sqrt(variance) * t_norm)
+    scores = numpy.nan_to_num(scores, nan=-1.0, posinf=-1.0, neginf=-1.0)
+    return numpy.clip(scores, -1.0, 1.0, out=scores)  # rounding can stray just past 1
+
+
+def _peak_offset(scores: numpy.ndarray, j: int, i: int) -> Tuple[float, float]:
+    """Sub-pixel peak position, by fitting a parabola along each axis"""
+
+    def vertex(minus, center, plus):
+        denominator = minus - 2 * center + plus
+        if denominator >= 0:
+            return 0.0
+        return float(numpy.clip(0.5 * (minus - plus) / denominator, -0.5, 0.5))
+
+    dx = dy = 0.0
+    if 0 < i < scores.shape[1] - 1:
+        dx = vertex(scores[j, i - 1], scores[j, i], scores[j, i + 1])
+    if 0 < j < scores.shape[0] - 1:
+        dy = vertex(scores[j - 1, i], scores[j, i], scores[j + 1, i])
+    return dx, dy
+
+
+def search(
+    template_image: numpy.ndarray,
+    point,
+    search_image: numpy.ndarray,
+    guess,
+    half_patch: int,
+    radius,
+) -> Optional[Tuple[numpy.ndarray, float]]:
+    """
+    Best match for the patch around pixel index point of template_image,
+    within radius pixels of guess in search_image; radius is a number, or
+    separate (x, y) radii. Returns the matched pixel index and its NCC
+    score, or None if a patch would leave an image.
+    """
+    rx, ry = (radius, radius) if numpy.isscalar(radius) else radius
+    px, py = int(round(point[0])), int(round(point[1]))
+    gx, gy = int(round(guess[0])), int(round(guess[1]))
+    h = half_patch
+    if not (h <= px < template_image.shape[1] - h and h <= py < template_image.shape[0] - h):
+        return None
+    template = template_image[py - h : py + h + 1, px - h : px + h + 1]
+    # the search window, clipped to the image
+    x0, y0 = max(0, gx - rx - h), max(0, gy - ry - h)
+    x1 = min(search_image.shape[1], gx + rx + h + 1)
+    y1 = min(search_image.shape[0], gy + ry + h + 1)
+    if x1 - x0 < template.shape[1] or y1 - y0 < template.shape[0]:
+        return None
+    window = search_image[y0:y1, x0:x1].astype(numpy.float32)
+    scores = ncc(template.astype(numpy.float32), window)
+    j, i = numpy.unravel_index(numpy.argmax(scores), scores.shape)
+    dx, dy = _peak_offset(scores, j, i)
+    # offset of the template center, not of its corner, and of the rounding of point
+    match = numpy.array((x0 + i + h + dx, y0 + j + h + dy)) + (point[0] - px, point[1] - py)
+    return match, float(scores[j, i])
+
+
+def track_point(
+    left_levels: List[numpy.ndarray],
+    right_levels: List[numpy.ndarray],
+    point,
+    guess,
+    start_level: int,
+    radius=8,
+    half_patch: int = 7,
+) -> Optional[Tuple[numpy.ndarray, float]]:
+    """
+    Right eye position of a left eye point, both in image pixel coordinates,
+    searching radius pixels (or (x, y) radii) around guess at start_level,
+    then refining at each finer level. Returns the position and the full resolution NCC
+    score, or None if the point is too close to an edge.
+    """
+    prediction = numpy.asarray(guess, dtype=numpy.float64)
+    score = -1.0
+    for level in range(start_level, -1, -1):
+        found = search(
+            left_levels[level],
+            to_level(point, level),
+            right_levels[level],
+            to_level(prediction, level),
+            half_patch,
+            radius if level == start_level else 2,
+        )
+        if found is None:
+            return None
+        prediction = from_level(found[0], level)
+        score = found[1]
+    return prediction, score
+
+
+def _consistent(left: numpy.ndarray, right: numpy.ndarray, tolerance: float) -> numpy.ndarray:
+    """
+    Mask of the matches that agree with a plane fit of the vertical
+    disparity: after alignment it should only vary through rotation and
+    scale, unlike the horizontal parallax.
+    """
+    keep = numpy.ones(len(left), dtype=bool)
+    dy = right[:, 1] - left[:, 1]
+    design = numpy.column_stack((numpy.ones(len(left)), left))
+    for _ in range(3):
+        if keep.sum() < 3:
+            break
+        coefficients, *_ = numpy.linalg.lstsq(design[keep], dy[keep], rcond=None)
+        residual = numpy.abs(design @ coefficients - dy)
+        spread = 1.4826 * numpy.median(residual[keep])
+        keep = residual <= max(3 * spread, tolerance)
+    return keep
+
+
+def find_correspondences(
+    left_pixels: numpy.ndarray,
+    right_pixels: numpy.ndarray,
+    max_points: int = 200,
+    min_score: float = 0.8,
+    tolerance: float = 2.0,
+) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+    """
+    Homologous points of two eye images, as (N, 2) left and right image
+    pixel coordinates and the N match scores. tolerance, in pixels, is how
+    far a match may stray from the fitted vertical disparity.
+    """
+    left_levels = pyramid(grayscale(left_pixels))
+    right_levels = pyramid(grayscale(right_pixels))
+    # overall offset, from small copies
+    coarse = min(level_for_size(left_levels, 256), len(right_levels) - 1)
+    dx, dy = phase_correlation(left_levels[coarse], right_levels[coarse])
+    offset = numpy.array((dx, dy)) * (1 << coarse)
+    # candidate points, from a medium size copy
+    medium = level_for_size(left_levels, 1024)
+    indices = select_points(left_levels[medium], max_points, border=16)
+    start = min(level_for_size(left_levels, 512), len(right_levels) - 1)
+    left, right, scores = [], [], []
+    for point in from_level(indices, medium):
+        found = track_point(left_levels, right_levels, point, point + offset, start)
+        if found is None or found[1] < min_score:
+            continue
+        left.append(point)
+        right.append(found[0])
+        scores.append(found[1])
+    left = numpy.array(left, dtype=numpy.float64).reshape(-1, 2)
+    right = numpy.array(right, dtype=numpy.float64).reshape(-1, 2)
+    scores = numpy.array(scores, dtype=numpy.float64)
+    if len(left) >= 3:
+        keep = _consistent(left, right, tolerance)
+        left, right, scores = left[keep], right[keep], scores[keep]
+    return left, right, scores
+
+
+def match_in_band(
+    source: ImagePyramid,
+    target: ImagePyramid,
+    point,
+    predicted,
+    band,
+    max_search: int = 64,
+    half_patch: int = 7,
+) -> Optional[Tuple[numpy.ndarray, float]]:
+    """
+    Position in the target image of one point of the source image, both in
+    image pixel coordinates, searching a band of (x, y) half sizes in full
+    resolution pixels around predicted, and its NCC score. The band is
+    searched at the coarsest level where it is at most max_search pixels,
+    so a wide band costs no more than a narrow one. None if the point is
+    too close to an edge.
+    """
+    levels = min(len(source.levels), len(target.levels))
+    level = 0
+    while level + 1 < levels and max(band) / (1 << level) > max_search:
+        level += 1
+    radius = tuple(max(2, int(numpy.ceil(b / (1 << level)))) for b in band)
+    return track_point(
+        source.levels, target.levels, point, predicted, level, radius, half_patch
+    )
@@ -0,0 +1,275 @@
+"""
+Coarse dense disparity of an aligned pair, for choosing the stereo window.
+
+Both eyes are sampled from a downsampled level of their image pyramids onto
+the same grid over the clip box, at most MAX_SIZE samples across, as they
+would be exported. Each row of the left eye is then matched against the
+same row of the right eye by block matching: for every candidate disparity
+at once, through a sliding window view of the right row, with the block
+sums done by integral images. Rows are split into tiles for a thread pool;
+numpy releases the GIL for the heavy parts.
+
+Disparity is how much further right a point is in the right eye than in
+the left one. Points with negative disparity appear in front of the stereo
+window, so the window is best placed at the nearest content, the smallest
+disparity.
+"""
+
+import concurrent.futures
+import copy
+import math
+import os
+from typing import Optional, Tuple
+
+import numpy
+from numpy.lib.stride_tricks import sliding_window_view
+
+from schmereo.coord_sys import ImageTransform
+from schmereo.core import transform as xf
+from schmereo.core.aligner import translate_eyes
+from schmereo.core.correspondence import ImagePyramid, _box_sum
+from schmereo.core.resample import FilterMode, sample
+from schmereo.trace import tracer
+
+MAX_SIZE = 512  # samples across the longest side of the map
+BLOCK_RADIUS = 3  # matched blocks are (2 BLOCK_RADIUS + 1) samples square
+SEARCH_RANGE = 0.1  # largest disparity searched, as a fraction of the map width
+MIN_TEXTURE = 3.0  # luma standard deviation, below which a block is too flat to match
+MIN_SCORE = 0.7  # approximate NCC of a reliable match
+NEAR_PERCENTILE = 2.0  # of the valid disparities, the nearest content; robust to outliers
+
+
+class DisparityMap(object):
+    """Disparity per sample of a grid over a canvas box, with what could be matched"""
+
+    def __init__(
+        self,
+        disparity: numpy.ndarray,
+        score: numpy.ndarray,
+        valid: numpy.ndarray,
+        left: numpy.ndarray,
+        box: Tuple[float, float, float, float],
+        pixels_per_canvas: float,
+    ):
+        self.disparity = disparity  # (H, W) float32, in samples
+        self.score = score  # (H, W) float32, approximate NCC of the best match
+        self.valid = valid  # (H, W) bool
+        self.left = left  # (H, W) float32 luma of the left eye, NaN outside the image
+        self.box = box  # left, top, right, bottom in canvas units
+        self.pixels_per_canvas = float(pixels_per_canvas)  # left eye image pixels per canvas unit
+
+    @property
+    def canvas_per_sample(self) -> float:
+        return (self.box[2] - self.box[0]) / self.disparity.shape[1]
+
+    @property
+    def valid_fraction(self) -> float:
+        return float(self.valid.mean())
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Percentile of the valid disparities, in canvas units; None if none are valid"""
+        if not self.valid.any():
+            return None
+        return float(numpy.percentile(self.disparity[self.valid], q) * self.canvas_per_sample)
+
+    def near(self) -> Optional[float]:
+        """Disparity of the nearest content, in canvas units"""
+        return self.percentile(NEAR_PERCENTILE)
+
+    def far(self) -> Optional[float]:
+        """Disparity of the farthest content, in canvas units"""
+        return self.percentile(100.0 - NEAR_PERCENTILE)
+
+    def to_dict(self) -> dict:
+        """JSON-able summary; disparities in left eye image pixels"""
+        near, far = self.near(), self.far()
+        return {
+            "width": self.disparity.shape[1],
+            "height": self.disparity.shape[0],
+            "valid_fraction": self.valid_fraction,
+            "near_pixels": None if near is None else near * self.pixels_per_canvas,
+            "far_pixels": None if far is None else far * self.pixels_per_canvas,
+        }
+
+
+def _grid(box, shape) -> numpy.ndarray:
+    """(H * W, 2) canvas positions of sample centers"""
+    left, top, right, bottom = box
+    height, width = shape
+    x = left + (numpy.arange(width) + 0.5) * ((right - left) / width)
+    y = top + (numpy.arange(height) + 0.5) * ((bottom - top) / height)
+    xx, yy = numpy.meshgrid(x, y)
+    return numpy.stack((xx.ravel(), yy.ravel()), axis=1)
+
+
+def rectify(
+    pyramid: ImagePyramid, image_transform: ImageTransform, image_size, box, shape
+) -> numpy.ndarray:
+    """
+    (H, W) float32 luma of an eye on a grid of shape samples over the canvas
+    box, from the pyramid level closest to the grid's resolution; NaN
+    where the grid is outside the image
+    """
+    points = xf.image_from_canvas(_grid(box, shape), image_transform, image_size)
+    # image pixels per sample, along the rotated grid rows
+    step = numpy.hypot(*(points[1] - points[0])) if shape[1] > 1 else 1.0
+    level = int(numpy.clip(math.floor(math.log2(max(step, 1.0))), 0, len(pyramid.levels) - 1))
+    gray = pyramid.levels[level]
+    scale = 1 << level
+    x = (points[:, 0] / scale).reshape(shape)
+    y = (points[:, 1] / scale).reshape(shape)
+    result = sample(gray[..., None], x, y, FilterMode.LINEAR, scale=step / scale)[..., 0]
+    inside = (x >= 0) & (x <= gray.shape[1]) & (y >= 0) & (y <= gray.shape[0])
+    result[~inside] = numpy.nan
+    return result
+
+
+def _normalize(gray: numpy.ndarray, radius: int):
+    """
+    Each sample minus the mean of its block, over the block's standard
+    deviation, so that squared differences of blocks measure 1 - NCC; also
+    that standard deviation, and whether the whole block is inside the image
+    """
+    inside = ~numpy.isnan(gray)
+    g = numpy.where(inside, gray, 0).astype(numpy.float32)
+    count = float((2 * radius + 1) ** 2)
+    mean = _box_sum(g, radius) / count
+    variance = numpy.maximum(_box_sum(g * g, radius) / count - mean * mean, 0)
+    std = numpy.sqrt(variance)
+    normalized = (g - mean) / numpy.maximum(std, 1e-3)
+    complete = _box_sum(inside.astype(numpy.float32), radius) > count - 0.5
+    return numpy.where(inside, normalized, 0).astype(numpy.float32), std, complete
+
+
+def _match_rows(left, right, row0, row1, max_disparity, radius):
+    """Best disparity, its score and whether it is in range, for rows row0 to row1"""
+    r0, r1 = max(0, row0 - radius), min(left.shape[0], row1 + radius)
+    count = float((2 * radius + 1) ** 2)
+    # candidates[y, x, k] is right[y, x + k - max_disparity]; zero outside
+    padded = numpy.pad(right[r0:r1], ((0, 0), (max_disparity, max_disparity)))
+    candidates = sliding_window_view(padded, 2 * max_disparity + 1, axis=1)
+    cost = left[r0:r1, :, None] - candidates
+    cost *= cost
+    cost = _box_sum(cost, radius)[row0 - r0 : row1 - r0]
+    best = numpy.argmin(cost, axis=2)
+    k = numpy.clip(best, 1, cost.shape[2] - 2)
+    c0, c1, c2 = (
+        numpy.take_along_axis(cost, (k + o)[..., None], axis=2)[..., 0] for o in (-1, 0, 1)
+    )
+    # parabola through the costs around the minimum
+    curvature = c0 - 2 * c1 + c2
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        offset = numpy.where(curvature > 0, 0.5 * (c0 - c2) / curvature, 0.0)
+    interior = best == k
+    disparity = numpy.where(interior, k + numpy.clip(offset, -0.5, 0.5), best) - max_disparity
+    best_cost = numpy.take_along_axis(cost, best[..., None], axis=2)[..., 0]
+    score = 1.0 - best_cost / (2.0 * count)
+    # the matched block lies within the right eye's row
+    x = numpy.arange(left.shape[1])
+    in_row = (x + disparity >= radius) & (x + disparity < left.shape[1] - radius)
+    return disparity.astype(numpy.float32), score.astype(numpy.float32), interior & in_row
+
+
+def disparity_map(
+    left: ImagePyramid,
+    right: ImagePyramid,
+    left_transform: ImageTransform,
+    right_transform: ImageTransform,
+    image_sizes,
+    box,
+    max_size: int = MAX_SIZE,
+    tile_rows: int = 32,
+    workers: int = None,
+) -> DisparityMap:
+    """
+    Dense disparity over the canvas box (left, top, right, bottom) of two
+    aligned eyes, given their pyramids, transforms and image sizes
+    """
+    box_width, box_height = box[2] - box[0], box[3] - box[1]
+    if box_width >= box_height:
+        shape = (max(1, round(max_size * box_height / box_width)), max_size)
+    else:
+        shape = (max_size, max(1, round(max_size * box_width / box_height)))
+    with tracer.span("rectify for disparity"):
+        grays = [
+            rectify(p, t, s, box, shape)
+            for p, t, s in zip((left, right), (left_transform, right_transform), image_sizes)
+        ]
+    normalized = [_normalize(g, BLOCK_RADIUS) for g in grays]
+    max_disparity = max(1, int(SEARCH_RANGE * shape[1]))
+    disparity = numpy.zeros(shape, dtype=numpy.float32)
+    score = numpy.zeros(shape, dtype=numpy.float32)
+    in_range = numpy.zeros(shape, dtype=bool)
+
+    def match_rows(row0, row1):
+        with tracer.span("block matching rows", rows=row1 - row0):
+            d, s, r = _match_rows(
+                normalized[0][0], normalized[1][0], row0, row1, max_disparity, BLOCK_RADIUS
+            )
+        disparity[row0:row1], score[row0:row1], in_range[row0:row1] = d, s, r
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(match_rows, row0, min(shape[0], row0 + tile_rows))
+            for row0 in range(0, shape[0], tile_rows)
+        ]
+        for future in futures:
+            future.result()  # re-raise errors from the workers
+    _, left_std, left_complete = normalized[0]
+    valid = in_range & (score >= MIN_SCORE) & (left_std >= MIN_TEXTURE) & left_complete
+    return DisparityMap(disparity, score, valid, grays[0], box, 0.5 * image_sizes[0][0])
+
+
+def project_disparity(project, pyramids=None, **kwargs) -> DisparityMap:
+    """Disparity over a project's clip box; pyramids of both eyes are made if not given"""
+    if pyramids is None:
+        from schmereo.core.stereo_file import load_pixels
+
+        pyramids = [
+            ImagePyramid(load_pixels(e.image.file_name, **e.image.part())) for e in project.eyes()
+        ]
+    cb = project.clip_box
+    return disparity_map(
+        *pyramids,
+        project.left.image.transform,
+        project.right.image.transform,
+        [e.image_size() for e in project.eyes()],
+        (cb.left, cb.top, cb.right, cb.bottom),
+        **kwargs,
+    )
+
+
+def window_transforms(
+    left_transform: ImageTransform, right_transform: ImageTransform, disparity: float
+):
+    """
+    Copies of the transforms, moved horizontally so that content with the
+    given disparity, in canvas units, lands on the stereo window
+    """
+    lt, rt = copy.deepcopy(left_transform), copy.deepcopy(right_transform)
+    translate_eyes(lt, rt, disparity, 0.0)
+    return lt, rt
+
+
+def heatmap(disparity_map: DisparityMap, alpha: int = 160) -> numpy.ndarray:
+    """
+    (H, W, 4) uint8 colors of the disparity: red for the nearest content,
+    through yellow and cyan, to blue for the farthest; transparent where
+    nothing could be matched
+    """
+    height, width = disparity_map.disparity.shape
+    result = numpy.zeros((height, width, 4), dtype=numpy.uint8)
+    near, far = disparity_map.near(), disparity_map.far()
+    if near is None:
+        return result
+    scale = disparity_map.canvas_per_sample
+    t = (disparity_map.disparity * scale - near) / max(far - near, 1e-9 * scale)
+    t = numpy.clip(t, 0, 1)
+    stops = (0.0, 1 / 3, 2 / 3, 1.0)
+    colors = numpy.array(((255, 0, 0), (255, 255, 0), (0, 255, 255), (0, 0, 255)))
+    for channel in range(3):
+        result[..., channel] = numpy.interp(t, stops, colors[:, channel])
+    result[..., 3] = numpy.where(disparity_map.valid, alpha, 0)
+    return result
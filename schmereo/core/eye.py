@@ -0,0 +1,48 @@
+from typing import Optional
+
+import numpy
+
+from schmereo.core import transform
+from schmereo.core.image import ImageModel
+from schmereo.core.marker import MarkerArray
+
+
+class EyeModel(object):
+    """One eye of a stereo pair: its image and its markers"""
+
+    def __init__(
+        self, image: Optional[ImageModel] = None, markers: Optional[MarkerArray] = None
+    ):
+        if image is None:
+            image = ImageModel()
+        if markers is None:
+            markers = MarkerArray()
+        self.image = image
+        self.markers = markers
+
+    def image_size(self):
+        """Image size in pixels, or (1, 1) before an image is loaded"""
+        if self.image.width is None:
+            return 1, 1
+        return self.image.width, self.image.height
+
+    def canvas_from_image(self, points) -> numpy.ndarray:
+        return transform.canvas_from_image(
+            points, self.image.transform, self.image_size()
+        )
+
+    def image_from_canvas(self, points) -> numpy.ndarray:
+        return transform.image_from_canvas(
+            points, self.image.transform, self.image_size()
+        )
+
+    def canvas_markers(self) -> numpy.ndarray:
+        """Marker positions in canvas coordinates, as an (N, 2) array"""
+        return self.canvas_from_image(self.markers.points)
+
+    def to_dict(self):
+        return {"image": self.image.to_dict(), "markers": self.markers.to_dict()}
+
+    def from_dict(self, data):
+        self.image.from_dict(data["image"])
+        self.markers.from_dict(data["markers"])
@@ -0,0 +1,52 @@
+from schmereo.coord_sys import ImageTransform
+from schmereo.core.stereo_file import open_frame, part_size
+
+
+class ImageModel(object):
+    """
+    One eye image: where it comes from, how big it is, and how it is placed
+    on the canvas. Loading only reads the image header, not the pixels.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.file_name = None
+        self.half = None  # "left" or "right", for one half of a side by side file
+        self.frame = None  # frame number, for one frame of a multi-picture file
+        self.width = None
+        self.height = None
+        self.transform = ImageTransform()
+
+    def load_image(self, file_name, half=None, frame=None) -> bool:
+        """half or frame select one eye of a stereo file; see schmereo.core.stereo_file"""
+        if (file_name, half, frame) == (self.file_name, self.half, self.frame):
+            return True
+        with open_frame(file_name, frame) as image:
+            self.width, self.height = part_size(image.size, half)
+        self.file_name = file_name
+        self.half = half
+        self.frame = frame
+        return True
+
+    def size(self):
+        return self.width, self.height
+
+    def part(self) -> dict:
+        """Keyword arguments of load_image() that select this image's part of its file"""
+        part = {}
+        if self.half is not None:
+            part['half'] = self.half
+        if self.frame is not None:
+            part['frame'] = self.frame
+        return part
+
+    def to_dict(self):
+        return {
+            'file_name': self.file_name,
+            **self.part(),
+            'transform': self.transform.to_dict(self),
+        }
+
+    def from_dict(self, data):
+        self.load_image(data['file_name'], half=data.get('half'), frame=data.get('frame'))
+        self.transform.from_dict(data['transform'], self)
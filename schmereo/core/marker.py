@@ -0,0 +1,70 @@
+from typing import List
+
+import numpy
+
+from schmereo.coord_sys import ImagePixelCoordinate
+
+
+class MarkerArray(object):
+    """
+    Homologous points for one eye, in image pixel coordinates.
+    Stored as a growable (N, 2) float32 array.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._storage = numpy.zeros((16, 2), dtype=numpy.float32)
+        self._count = 0
+        self.version = 0  # incremented on every change
+
+    def __getitem__(self, index):
+        return self.points[index]
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __delitem__(self, key):
+        remaining = numpy.delete(self.points, key, axis=0)
+        self._count = 0
+        self._append(remaining)
+
+    def _append(self, points: numpy.ndarray):
+        n = self._count + len(points)
+        if n > len(self._storage):
+            storage = numpy.zeros((max(n, 2 * len(self._storage)), 2), dtype=numpy.float32)
+            storage[: self._count] = self.points
+            self._storage = storage
+        self._storage[self._count : n] = points
+        self._count = n
+        self.version += 1
+
+    def add_marker(self, pos: ImagePixelCoordinate):
+        self._append(numpy.array([[pos[0], pos[1]]], dtype=numpy.float32))
+
+    def add_markers(self, markers: List[ImagePixelCoordinate]):
+        if isinstance(markers, numpy.ndarray):
+            self._append(markers.reshape(-1, 2))
+        else:
+            self._append(numpy.array([[*m] for m in markers], dtype=numpy.float32).reshape(-1, 2))
+
+    def clear(self):
+        if self._count == 0:
+            return
+        self._count = 0
+        self.version += 1
+
+    @property
+    def points(self) -> numpy.ndarray:
+        """View of the current (N, 2) marker positions"""
+        return self._storage[: self._count]
+
+    def to_dict(self):
+        """Marker positions as an (N, 2) array; see schmereo.core.project_file"""
+        return self.points.copy()
+
+    def from_dict(self, data):
+        self.clear()
+        if isinstance(data, numpy.ndarray):  # possibly memory-mapped sidecar
+            self.add_markers(data)
+            return
+        self.add_markers([ImagePixelCoordinate(p["x"], p["y"]) for p in data])
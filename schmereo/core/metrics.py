@@ -0,0 +1,97 @@
+"""
+Alignment quality metrics: how far the current transforms are from putting
+each pair of homologous markers on the same canvas row.
+
+Distances are in pixels of the left eye image, so that they compare across
+projects regardless of how the canvas is scaled. Everything is computed
+with a few array operations over all pairs, so the metrics can be refreshed
+after every edit.
+"""
+
+import math
+
+import numpy
+
+from schmereo.core import transform
+from schmereo.core.eye import EyeModel
+
+# Alignment leaves less residual rotation than this when it has converged
+RESIDUAL_TOLERANCE_DEGREES = 0.05
+
+
+def alignment_metrics(left: EyeModel, right: EyeModel) -> dict:
+    """
+    JSON-able metrics of the marker pairs under the current transforms:
+    RMS and maximum vertical disparity, the range of horizontal disparity,
+    the rotation and offset of the right eye relative to the left, and the
+    rotation that another alignment would still apply.
+    """
+    lt, rt = left.image.transform, right.image.transform
+    scale = 0.5 * left.image_size()[0]  # left eye pixels per canvas unit
+    # Where the right image center sits relative to the left image center
+    centers = numpy.array(
+        (
+            transform.canvas_from_fract((0.0, 0.0), lt)[0],
+            transform.canvas_from_fract((0.0, 0.0), rt)[0],
+        )
+    )
+    metrics = {
+        "pairs": min(len(left.markers), len(right.markers)),
+        "rotation_degrees": math.degrees(rt.rotation - lt.rotation),
+        "offset_pixels": [float(v) for v in (centers[1] - centers[0]) * scale],
+        "rms_vertical_pixels": None,
+        "max_vertical_pixels": None,
+        "horizontal_range_pixels": None,
+        "residual_rotation_degrees": None,
+    }
+    count = metrics["pairs"]
+    if count < 1:
+        return metrics
+    lc = left.canvas_from_image(left.markers.points[:count])
+    rc = right.canvas_from_image(right.markers.points[:count])
+    disparity = (rc - lc) * scale
+    vertical = disparity[:, 1]
+    metrics["rms_vertical_pixels"] = float(numpy.sqrt(numpy.mean(vertical * vertical)))
+    metrics["max_vertical_pixels"] = float(numpy.max(numpy.abs(vertical)))
+    metrics["horizontal_range_pixels"] = [
+        float(disparity[:, 0].min()),
+        float(disparity[:, 0].max()),
+    ]
+    metrics["residual_rotation_degrees"] = math.degrees(_residual_rotation(lc, rc))
+    return metrics
+
+
+def _residual_rotation(lc: numpy.ndarray, rc: numpy.ndarray) -> float:
+    """
+    Relative rotation of matched canvas points, from the least squares slope
+    of vertical disparity across the canvas. A cheaper estimate of what
+    aligner.compute_rotation measures, and the same for small angles.
+    """
+    x = 0.5 * (lc[:, 0] + rc[:, 0])
+    x = x - x.mean()
+    dv = rc[:, 1] - lc[:, 1]
+    denominator = numpy.dot(x, x)
+    if denominator <= 0:
+        return 0.0
+    return math.atan(numpy.dot(x, dv - dv.mean()) / denominator)
+
+
+def converged(metrics: dict) -> bool:
+    """Whether aligning again would not rotate the eyes noticeably"""
+    residual = metrics["residual_rotation_degrees"]
+    return residual is None or abs(residual) < RESIDUAL_TOLERANCE_DEGREES
+
+
+def summary(metrics: dict) -> str:
+    """One line for a status bar or log"""
+    if metrics["pairs"] < 1:
+        return "No marker pairs"
+    low, high = metrics["horizontal_range_pixels"]
+    text = (
+        f"{metrics['pairs']} pairs: vertical RMS {metrics['rms_vertical_pixels']:.2f} px,"
+        f" max {metrics['max_vertical_pixels']:.2f} px;"
+        f" horizontal {low:.1f} to {high:.1f} px"
+    )
+    if not converged(metrics):
+        text += f"; not aligned ({metrics['residual_rotation_degrees']:+.2f}\N{DEGREE SIGN} left)"
+    return text
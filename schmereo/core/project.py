@@ -0,0 +1,74 @@
+from typing import Optional
+
+from schmereo.core.camera import CameraModel
+from schmereo.core.clip_box import ClipBoxModel
+from schmereo.core.color_match import ColorMatch
+from schmereo.core.eye import EyeModel
+from schmereo.core.metrics import alignment_metrics
+from schmereo.core.project_file import read_project_file, write_project_file
+from schmereo.version import __version__
+
+
+class Project(object):
+    """
+    Complete schmereo project state: both eyes, the clip box and the color
+    matching between the eyes.
+    to_dict() also stores the alignment metrics, for other tools to read;
+    they are derived data, so from_dict() ignores them.
+    to_dict() produces the same schema as SchmereoMainWindow.to_dict().
+    """
+
+    def __init__(
+        self,
+        left: Optional[EyeModel] = None,
+        right: Optional[EyeModel] = None,
+        clip_box: Optional[ClipBoxModel] = None,
+        camera: Optional[CameraModel] = None,
+        color_match: Optional[ColorMatch] = None,
+    ):
+        if left is None:
+            left = EyeModel()
+        if right is None:
+            right = EyeModel()
+        if camera is None:
+            camera = CameraModel()
+        if clip_box is None:
+            clip_box = ClipBoxModel(camera=camera, images=[left.image, right.image])
+        if color_match is None:
+            color_match = ColorMatch()
+        self.left = left
+        self.right = right
+        self.camera = camera
+        self.clip_box = clip_box
+        self.color_match = color_match
+
+    def eyes(self):
+        yield self.left
+        yield self.right
+
+    @classmethod
+    def load(cls, file_name: str) -> "Project":
+        project = cls()
+        project.from_dict(read_project_file(file_name))
+        return project
+
+    def save(self, file_name: str) -> None:
+        write_project_file(file_name, self.to_dict())
+
+    def to_dict(self):
+        self.clip_box.recenter()  # Normalize values before serialization
+        return {
+            "app": {"name": "schmereo", "version": __version__},
+            "clip_box": self.clip_box.to_dict(),
+            "left": self.left.to_dict(),
+            "right": self.right.to_dict(),
+            "color_match": self.color_match.to_dict(),
+            "metrics": alignment_metrics(self.left, self.right),
+        }
+
+    def from_dict(self, data):
+        self.left.from_dict(data["left"])
+        self.right.from_dict(data["right"])
+        if "clip_box" in data:
+            self.clip_box.from_dict(data["clip_box"])
+        self.color_match.from_dict(data.get("color_match", {}))
@@ -0,0 +1,92 @@
+"""
+Reading and writing schmereo project files.
+
+Project files are JSON. Marker sets larger than SIDECAR_MIN_MARKERS are
+written to a binary .npy "sidecar" file next to the project, and the JSON
+only holds a reference to it. All files are written atomically: data goes
+to a temporary file in the destination folder, is flushed to disk, and is
+then renamed over the target, so a crash never leaves a truncated project.
+"""
+
+import json
+import os
+
+import numpy
+
+from schmereo.core.atomic_file import atomic_write
+
+SIDECAR_MIN_MARKERS = 512
+EYES = ("left", "right")
+
+
+def autosave_file_name(file_name: str) -> str:
+    base, _ = os.path.splitext(file_name)
+    return f"{base}.autosave.json"
+
+
+def sidecar_file_name(file_name: str, eye: str) -> str:
+    base, _ = os.path.splitext(file_name)
+    return f"{base}.{eye}.markers.npy"
+
+
+def encode_markers(points, file_name: str, eye: str):
+    """
+    Convert an (N, 2) array of image pixel coordinates to its JSON form,
+    writing a sidecar file for large marker sets.
+    """
+    points = numpy.asarray(points, dtype=numpy.float32).reshape(-1, 2)
+    sidecar = sidecar_file_name(file_name, eye)
+    if len(points) < SIDECAR_MIN_MARKERS:
+        if os.path.exists(sidecar):
+            os.remove(sidecar)  # stale from an earlier, larger marker set
+        return [{"x": float(x), "y": float(y)} for x, y in points]
+    atomic_write(sidecar, lambda fh: numpy.save(fh, points), mode="wb")
+    return {
+        "sidecar": os.path.basename(sidecar),
+        "count": len(points),
+        "dtype": points.dtype.str,
+    }
+
+
+def decode_markers(data, file_name: str):
+    """
+    Inverse of encode_markers(). Sidecar arrays are memory-mapped read-only.
+    """
+    if isinstance(data, dict):
+        folder = os.path.dirname(os.path.abspath(file_name))
+        points = numpy.load(os.path.join(folder, data["sidecar"]), mmap_mode="r")
+        if len(points) != data["count"]:
+            raise ValueError(f"Marker sidecar {data['sidecar']} is truncated")
+        return points
+    return data
+
+
+def read_project_file(file_name: str) -> dict:
+    with open(file_name, "r") as fh:
+        data = json.load(fh)
+    for eye in EYES:
+        if eye in data and "markers" in data[eye]:
+            data[eye]["markers"] = decode_markers(data[eye]["markers"], file_name)
+    return data
+
+
+def write_project_file(file_name: str, data: dict) -> None:
+    """
+    Atomically write a project dictionary, as produced by
+    SchmereoMainWindow.to_dict(). Marker entries may be numpy arrays.
+    """
+    data = dict(data)
+    for eye in EYES:
+        if eye in data and "markers" in data[eye]:
+            data[eye] = dict(data[eye])
+            data[eye]["markers"] = encode_markers(
+                data[eye]["markers"], file_name, eye
+            )
+    atomic_write(file_name, lambda fh: json.dump(data, fh, indent=2))
+
+
+def remove_project_file(file_name: str) -> None:
+    """Delete a project file together with its sidecars, if present"""
+    for name in (file_name, *[sidecar_file_name(file_name, e) for e in EYES]):
+        if os.path.exists(name):
+            os.remove(name)
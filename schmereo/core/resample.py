@@ -0,0 +1,170 @@
+"""
+CPU image resampling for export.
+
+The live view filters on the GPU; exported images are resampled here, with
+the same geometry, so that masters can use better kernels than the display.
+Work is split into tiles of output rows, which numpy processes with the GIL
+released, so a thread pool keeps every core busy.
+"""
+
+import concurrent.futures
+import enum
+import math
+import os
+
+import numpy
+
+from schmereo.coord_sys import ImageTransform
+from schmereo.core import transform as xf
+from schmereo.core.color_match import apply_lut
+from schmereo.trace import tracer
+
+
+class FilterMode(enum.Enum):
+    NEAREST = 0
+    LINEAR = 1
+    CUBIC = 2
+    LANCZOS = 3  # export only; the live view shows CUBIC instead
+
+
+def _linear(x):
+    return numpy.maximum(numpy.float32(0), 1 - numpy.abs(x))
+
+
+def _cubic(x, a=-0.5):
+    """Keys cubic convolution; a = -0.5 is Catmull-Rom"""
+    x = numpy.abs(x)
+    near = ((a + 2) * x - (a + 3)) * x * x + 1
+    far = ((a * x - 5 * a) * x + 8 * a) * x - 4 * a
+    return numpy.where(x < 1, near, numpy.where(x < 2, far, numpy.float32(0)))
+
+
+def _lanczos3(x):
+    return numpy.where(
+        numpy.abs(x) < 3, numpy.sinc(x) * numpy.sinc(x / 3), numpy.float32(0)
+    )
+
+
+# filter mode -> (kernel, radius in source pixels); NEAREST has no kernel, see _axis_weights
+_KERNELS = {
+    FilterMode.LINEAR: (_linear, 1.0),
+    FilterMode.CUBIC: (_cubic, 2.0),
+    FilterMode.LANCZOS: (_lanczos3, 3.0),
+}
+
+
+def _axis_weights(coordinate, size, mode: FilterMode, scale: float):
+    """
+    Source indices and normalized weights along one axis, for sample
+    positions in pixel units (pixel centers at integer + 0.5). Each result
+    has shape (taps,) + coordinate.shape.
+    """
+    if mode == FilterMode.NEAREST:
+        # The pixel containing the sample, half-open, so that a sample on a
+        # boundary between pixels still gets one; a kernel would give neither
+        index = numpy.floor(coordinate).astype(numpy.int64)[None]
+        numpy.clip(index, 0, size - 1, out=index)
+        return index, numpy.ones(index.shape, dtype=numpy.float32)
+    kernel, radius = _KERNELS[mode]
+    radius *= scale
+    center = coordinate - 0.5
+    first = numpy.floor(center - radius).astype(numpy.int64) + 1
+    # offset of the first tap from the sample position; small, so float32 is exact enough
+    start = (first - center).astype(numpy.float32)
+    taps = int(math.ceil(2 * radius))
+    index = numpy.empty((taps,) + center.shape, dtype=numpy.int64)
+    weight = numpy.empty((taps,) + center.shape, dtype=numpy.float32)
+    for k in range(taps):
+        index[k] = first + k
+        weight[k] = kernel((start + k) / numpy.float32(scale))
+    total = weight.sum(axis=0)
+    total[total == 0] = 1
+    weight /= total
+    numpy.clip(index, 0, size - 1, out=index)
+    return index, weight
+
+
+def sample(
+    pixels: numpy.ndarray, x, y, mode=FilterMode.CUBIC, scale: float = 1.0
+) -> numpy.ndarray:
+    """
+    Filtered values of an (H, W, C) image at pixel positions x, y (arrays of
+    the same shape). Kernels are widened by scale, for minification.
+    Returns float32 values of shape x.shape + (C,); edges are clamped.
+    """
+    height, width = pixels.shape[:2]
+    x = numpy.asarray(x, dtype=numpy.float64)
+    y = numpy.asarray(y, dtype=numpy.float64)
+    scale = max(1.0, scale)
+    xi, xw = _axis_weights(x, width, mode, scale)
+    yi, yw = _axis_weights(y, height, mode, scale)
+    flat = pixels.reshape(height * width, -1)
+    result = numpy.zeros(x.shape + (flat.shape[1],), dtype=numpy.float32)
+    term = numpy.empty_like(result)
+    for j in range(len(yi)):
+        row = yi[j] * width
+        for i in range(len(xi)):
+            weight = (yw[j] * xw[i])[..., None]
+            numpy.multiply(flat.take(row + xi[i], axis=0), weight, out=term)
+            result += term
+    return result
+
+
+def resample_eye(
+    pixels: numpy.ndarray,
+    transform: ImageTransform,
+    out_size,
+    mode=FilterMode.CUBIC,
+    background=0.2,
+    lut=None,
+    tile_rows: int = 64,
+    workers: int = None,
+) -> numpy.ndarray:
+    """
+    Render one eye of the export, as EyeSaver does on the GPU: out_size
+    (width, height) pixels at one output pixel per image pixel, centered on
+    the canvas origin. pixels is the (H, W, C) uint8 image. lut is an
+    optional (3, 256) color lookup table for the image pixels, as in
+    schmereo.core.color_match. Returns an (height, width, C) uint8 array.
+    """
+    image_height, image_width, channels = pixels.shape
+    width, height = out_size
+    result = numpy.empty((height, width, channels), dtype=numpy.uint8)
+    fill = numpy.full(channels, round(255 * background), dtype=numpy.uint8)
+    if channels == 4:
+        fill[3] = 255
+    half_width = width / image_width  # canvas units from center to edge
+    half_height = height / image_width
+    canvas_x = (2.0 * (numpy.arange(width) + 0.5) / width - 1.0) * half_width
+
+    def render_rows(row0, row1):
+        with tracer.span("resample rows", rows=row1 - row0):
+            _render_rows(row0, row1)
+
+    def _render_rows(row0, row1):
+        canvas_y = (2.0 * (numpy.arange(row0, row1) + 0.5) / height - 1.0) * half_height
+        cx, cy = numpy.meshgrid(canvas_x, canvas_y)
+        canvas = numpy.stack((cx.ravel(), cy.ravel()), axis=1)
+        fract = xf.fract_from_canvas(canvas, transform)
+        image = xf.image_from_fract(fract, (image_width, image_height))
+        inside = (numpy.abs(fract[:, 0]) < 1.0) & (
+            numpy.abs(fract[:, 1]) < image_height / image_width
+        )
+        values = sample(pixels, image[inside, 0], image[inside, 1], mode)
+        block = result[row0:row1].reshape(-1, channels)
+        block[:] = fill
+        values = numpy.clip(values + 0.5, 0, 255).astype(numpy.uint8)
+        if lut is not None:
+            values = apply_lut(values, lut)
+        block[inside] = values
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(render_rows, row0, min(height, row0 + tile_rows))
+            for row0 in range(0, height, tile_rows)
+        ]
+        for future in futures:
+            future.result()  # re-raise errors from the workers
+    return result
@@ -0,0 +1,81 @@
+"""
+Image files that hold both eyes: side by side JPS and PNS files, and
+multi-picture MPO files from stereo cameras.
+
+Each eye of such a file is an image of its own, named by the file and a
+part: a half ("left" or "right") of a side by side file, or a frame number
+of a multi-picture file. Markers and transforms of an eye refer to its part
+only. Side by side files are taken to be cross-eyed, right eye on the left,
+which is the common convention for JPS and PNS, and the one schmereo's own
+.pns exports follow.
+"""
+
+import os
+from typing import List, Optional
+
+import numpy
+
+SIDE_BY_SIDE_EXTENSIONS = (".jps", ".pns")
+HALVES = ("left", "right")
+CROSS_EYED_HALVES = ("right", "left")  # halves with the left and right eye of a JPS or PNS
+
+
+def eye_parts(file_name: str) -> Optional[List[dict]]:
+    """
+    Keyword arguments that select the left and right eye of a stereo file,
+    e.g. [{"half": "right"}, {"half": "left"}], or None for other images.
+    """
+    from PIL import Image  # deferred; PIL is slow to import
+
+    with Image.open(file_name) as image:  # only reads the header
+        if image.format == "MPO" and getattr(image, "n_frames", 1) >= 2:
+            return [{"frame": 0}, {"frame": 1}]
+    if os.path.splitext(file_name)[1].lower() in SIDE_BY_SIDE_EXTENSIONS:
+        return [{"half": h} for h in CROSS_EYED_HALVES]
+    return None
+
+
+def half_columns(width: int, half: str):
+    """First and last + 1 column of one half of an image; both halves are equally wide"""
+    half_width = width // 2
+    if half == "left":
+        return 0, half_width
+    if half == "right":
+        return width - half_width, width
+    raise ValueError(f"Unknown half {half!r}")
+
+
+def part_size(size, half: Optional[str] = None):
+    """(width, height) of a part of an image of the given size"""
+    width, height = size
+    if half is None:
+        return width, height
+    column0, column1 = half_columns(width, half)
+    return column1 - column0, height
+
+
+def open_frame(file_name: str, frame: Optional[int] = None):
+    """PIL image, positioned at a frame; nothing is decoded yet"""
+    from PIL import Image
+
+    image = Image.open(file_name)
+    if frame is not None:
+        image.seek(frame)
+    return image
+
+
+def half_view(pixels: numpy.ndarray, half: Optional[str]) -> numpy.ndarray:
+    """The columns of one half of (H, W, C) pixels, as a view without copying"""
+    if half is None:
+        return pixels
+    column0, column1 = half_columns(pixels.shape[1], half)
+    return pixels[:, column0:column1]
+
+
+def load_pixels(
+    file_name: str, half: Optional[str] = None, frame: Optional[int] = None, mode: str = "RGB"
+) -> numpy.ndarray:
+    """(H, W, C) uint8 pixels of one part of an image file"""
+    with open_frame(file_name, frame) as image:
+        pixels = numpy.asarray(image.convert(mode))
+    return half_view(pixels, half)
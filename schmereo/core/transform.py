@@ -0,0 +1,58 @@
+"""
+Batched versions of the coordinate conversions in schmereo.coord_sys.
+
+Each function takes an (N, 2) array-like of points and returns a new
+(N, 2) float64 array. Keep these in sync with schmereo.coord_sys and
+with the image and marker shaders.
+"""
+
+import numpy
+
+from schmereo.coord_sys import ImageTransform
+
+
+def _points(points) -> numpy.ndarray:
+    return numpy.asarray(points, dtype=numpy.float64).reshape(-1, 2)
+
+
+def _rotation(transform: ImageTransform) -> numpy.ndarray:
+    """Matrix taking fractional image offsets to canvas positions"""
+    cr = numpy.cos(transform.rotation)
+    sr = numpy.sin(transform.rotation)
+    return numpy.array(((cr, -sr), (sr, cr)), dtype=numpy.float64)
+
+
+def fract_from_image(points, image_size) -> numpy.ndarray:
+    p = _points(points)
+    width, height = image_size
+    result = p * (2.0 / width)
+    result -= (1.0, height / width)
+    return result
+
+
+def image_from_fract(points, image_size) -> numpy.ndarray:
+    p = _points(points)
+    width, height = image_size
+    result = p + (1.0, height / width)
+    result *= 0.5 * width
+    return result
+
+
+def canvas_from_fract(points, transform: ImageTransform) -> numpy.ndarray:
+    p = _points(points) - transform.center[:]
+    # row vectors, so multiply by the transpose
+    return p @ _rotation(transform).T
+
+
+def fract_from_canvas(points, transform: ImageTransform) -> numpy.ndarray:
+    p = _points(points) @ _rotation(transform)
+    p += transform.center[:]
+    return p
+
+
+def canvas_from_image(points, transform: ImageTransform, image_size) -> numpy.ndarray:
+    return canvas_from_fract(fract_from_image(points, image_size), transform)
+
+
+def image_from_canvas(points, transform: ImageTransform, image_size) -> numpy.ndarray:
+    return image_from_fract(fract_from_canvas(points, transform), image_size)
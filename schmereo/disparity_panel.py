@@ -0,0 +1,170 @@
+"""
+Dense disparity of the aligned pair inside the clip box, shown as a heatmap
+over the left eye, with a suggested stereo window.
+
+The map is computed on a worker thread, from the image pyramids the marker
+matching keeps, when the panel is shown and on request; it takes a few
+seconds for a full card, so it does not follow every edit.
+"""
+
+import copy
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+from schmereo.command import AlignNowCommand
+from schmereo.core.aligner import AlignmentSolution
+from schmereo.core.disparity import disparity_map, heatmap, window_transforms
+
+
+def _overlay(disparity) -> QtGui.QImage:
+    """The left eye in gray, with the heatmap on top"""
+    gray = numpy.nan_to_num(disparity.left, nan=0.2 * 255)
+    gray = numpy.ascontiguousarray(numpy.clip(gray, 0, 255).astype(numpy.uint8))
+    height, width = gray.shape
+    image = QtGui.QImage(gray.data, width, height, width, QtGui.QImage.Format_Grayscale8)
+    image = image.convertToFormat(QtGui.QImage.Format_RGB32)
+    colors = numpy.ascontiguousarray(heatmap(disparity))
+    overlay = QtGui.QImage(colors.data, width, height, 4 * width, QtGui.QImage.Format_RGBA8888)
+    painter = QtGui.QPainter(image)
+    painter.drawImage(0, 0, overlay)
+    painter.end()
+    return image  # painted copies; the arrays may go
+
+
+def _transform_state(transform) -> tuple:
+    return transform.center.x, transform.center.y, transform.rotation
+
+
+class DisparityDock(QtWidgets.QDockWidget):
+    def __init__(self, main_window, parent=None):
+        super().__init__("Disparity", parent)
+        self.setObjectName("disparityDock")
+        self.main_window = main_window
+        self.widgets = list(main_window.eye_widgets())
+        self.disparity = None  # latest DisparityMap
+        self.transforms = None  # of both eyes, that the latest DisparityMap was computed for
+        self._pending_transforms = None
+        self.image = None  # its overlay, as a QImage
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="schmereo-disparity"
+        )
+        self._generation = 0
+        self.view = QtWidgets.QLabel()
+        self.view.setAlignment(QtCore.Qt.AlignCenter)
+        self.view.setMinimumSize(160, 90)
+        self.view.setSizePolicy(QtWidgets.QSizePolicy.Ignored, QtWidgets.QSizePolicy.Ignored)
+        self.summary = QtWidgets.QLabel()
+        self.summary.setWordWrap(True)
+        update_button = QtWidgets.QPushButton("Update")
+        update_button.clicked.connect(self.compute)
+        self.window_button = QtWidgets.QPushButton("Set Stereo Window")
+        self.window_button.setToolTip(
+            "Move the eyes so that the nearest content is at the window"
+        )
+        self.window_button.setEnabled(False)
+        self.window_button.clicked.connect(self.set_stereo_window)
+        buttons = QtWidgets.QHBoxLayout()
+        buttons.addWidget(update_button)
+        buttons.addWidget(self.window_button)
+        buttons.addStretch()
+        contents = QtWidgets.QWidget()
+        layout = QtWidgets.QVBoxLayout(contents)
+        layout.setContentsMargins(2, 2, 2, 2)
+        layout.addWidget(self.view, stretch=1)
+        layout.addWidget(self.summary)
+        layout.addLayout(buttons)
+        self.setWidget(contents)
+        self.computed.connect(self.on_computed)
+        self.visibilityChanged.connect(self.on_visibility_changed)
+
+    computed = QtCore.pyqtSignal(int, object)  # generation, DisparityMap or error message
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    @QtCore.pyqtSlot(bool)
+    def on_visibility_changed(self, visible: bool) -> None:
+        if visible and self.disparity is None:
+            self.compute()
+
+    @QtCore.pyqtSlot()
+    def compute(self) -> None:
+        suggester = self.main_window.marker_manager.suggester
+        pyramids = [suggester.pyramid(w.image) for w in self.widgets]
+        if None in pyramids:
+            self.summary.setText("Load both eye images first")
+            return
+        self._generation += 1
+        cb = self.main_window.clip_box
+        self._pending_transforms = [copy.deepcopy(w.image.transform) for w in self.widgets]
+        self._executor.submit(
+            self._compute,
+            self._generation,
+            pyramids,
+            self._pending_transforms,
+            [w.eye.image_size() for w in self.widgets],
+            (cb.left, cb.top, cb.right, cb.bottom),
+        )
+        self.summary.setText("Computing disparity...")
+        self.window_button.setEnabled(False)
+
+    def _compute(self, generation, pyramids, transforms, image_sizes, box) -> None:
+        try:
+            result = disparity_map(
+                *(p.result() for p in pyramids), *transforms, image_sizes, box
+            )
+        except Exception as exc:  # shown in the panel, instead of lost in the worker
+            result = f"{type(exc).__name__}: {exc}"
+        self.computed.emit(generation, result)
+
+    @QtCore.pyqtSlot(int, object)
+    def on_computed(self, generation: int, result) -> None:
+        if generation != self._generation:
+            return
+        if isinstance(result, str):
+            self.summary.setText(f"Disparity failed: {result}")
+            return
+        self.disparity = result
+        self.transforms = self._pending_transforms
+        self.image = _overlay(result)
+        self._show_image()
+        data = result.to_dict()
+        if data["near_pixels"] is None:
+            self.summary.setText("Nothing could be matched")
+            return
+        self.summary.setText(
+            f"Nearest {data['near_pixels']:.1f} px, farthest {data['far_pixels']:.1f} px"
+            f" ({100 * data['valid_fraction']:.0f}% matched). Red is near, blue is far."
+        )
+        self.window_button.setEnabled(abs(data["near_pixels"]) >= 0.5)
+
+    def _show_image(self) -> None:
+        pixmap = QtGui.QPixmap.fromImage(self.image)
+        size = self.view.size()
+        self.view.setPixmap(
+            pixmap.scaled(size, QtCore.Qt.KeepAspectRatio, QtCore.Qt.SmoothTransformation)
+        )
+
+    def resizeEvent(self, event: QtGui.QResizeEvent) -> None:
+        super().resizeEvent(event)
+        if self.image is not None:
+            self._show_image()
+
+    @QtCore.pyqtSlot()
+    def set_stereo_window(self) -> None:
+        near = None if self.disparity is None else self.disparity.near()
+        if near is None:
+            return
+        current = [_transform_state(w.image.transform) for w in self.widgets]
+        if current != [_transform_state(t) for t in self.transforms]:
+            # The disparities are of other transforms; they would misplace the window
+            self.main_window.log_message("The eyes have moved; updating the disparity first")
+            self.compute()
+            return
+        transforms = window_transforms(*self.transforms, near)
+        command = AlignNowCommand(self.main_window, AlignmentSolution(*transforms))
+        command.setText("set stereo window")
+        self.main_window.undo_stack.push(command)
+        self.compute()  # the disparities moved
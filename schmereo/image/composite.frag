@@ -0,0 +1,71 @@
+// Both eyes, cropped to the clip box, combined into one output image in a
+// single pass. Compiled after image_sampling.glsl, which has the #version
+// line. Keep in sync with schmereo.core.composite.
+
+// schmereo.core.composite.CompositeMode
+const int SIDE_BY_SIDE = 0;
+const int CROSS_EYE = 1;
+const int ANAGLYPH = 2;
+const int INTERLACED = 3;
+
+layout(binding = 0) uniform sampler2D left_image;
+layout(binding = 1) uniform sampler2D right_image;
+layout(binding = 2) uniform sampler1D left_lut;  // color matching
+layout(binding = 3) uniform sampler1D right_lut;
+layout(location = 0) uniform vec4 box = vec4(-1, -1, 1, 1);  // clip box: left, top, right, bottom
+layout(location = 1) uniform int mode = SIDE_BY_SIDE;
+layout(location = 2) uniform vec2 image_center[2];  // locations 2 and 3
+layout(location = 4) uniform float rotation[2];  // locations 4 and 5
+layout(location = 6) uniform int filter_mode[2];  // locations 6 and 7
+layout(location = 8) uniform int output_rows = 1;
+
+in noperspective vec2 outputCoord;
+out vec4 frag_color;
+
+// Dubois least squares red/cyan anaglyph matrices (columns are the inputs)
+const mat3 DUBOIS_LEFT = mat3(
+    0.437, -0.062, -0.048,
+    0.449, -0.062, -0.050,
+    0.164, -0.024, -0.017);
+const mat3 DUBOIS_RIGHT = mat3(
+    -0.011, 0.377, -0.026,
+    -0.032, 0.761, -0.093,
+    -0.007, 0.009, 1.234);
+
+vec4 eye_color(sampler2D image, sampler1D lut, vec2 tc, vec2 texels_per_pixel, int filtering)
+{
+    if (!is_inside_image(tc))
+        return bg_color;
+    return apply_lut(lut, filtered_texture(image, tc, texels_per_pixel, filtering));
+}
+
+void main()
+{
+    vec2 local = outputCoord;
+    int pane = 0;
+    if (mode == SIDE_BY_SIDE || mode == CROSS_EYE) {
+        pane = outputCoord.x < 0.5 ? 0 : 1;
+        local.x = 2.0 * outputCoord.x - pane;
+    }
+    vec2 canvas = mix(box.xy, box.zw, local);
+    vec2 left_tc = image_texture_coord(left_image, canvas, image_center[0], rotation[0]);
+    vec2 right_tc = image_texture_coord(right_image, canvas, image_center[1], rotation[1]);
+    vec2 left_tpp = fwidth(left_tc * textureSize(left_image, 0));
+    vec2 right_tpp = fwidth(right_tc * textureSize(right_image, 0));
+
+    if (mode == ANAGLYPH) {
+        vec3 left = eye_color(left_image, left_lut, left_tc, left_tpp, filter_mode[0]).rgb;
+        vec3 right = eye_color(right_image, right_lut, right_tc, right_tpp, filter_mode[1]).rgb;
+        frag_color = vec4(clamp(DUBOIS_LEFT * left + DUBOIS_RIGHT * right, 0.0, 1.0), 1);
+        return;
+    }
+    int eye = pane;
+    if (mode == CROSS_EYE)
+        eye = 1 - pane;
+    else if (mode == INTERLACED)
+        eye = int(outputCoord.y * output_rows) & 1;  // left eye on even rows, from the top
+    if (eye == 0)
+        frag_color = eye_color(left_image, left_lut, left_tc, left_tpp, filter_mode[0]);
+    else
+        frag_color = eye_color(right_image, right_lut, right_tc, right_tpp, filter_mode[1]);
+}
@@ -0,0 +1,18 @@
+#version 460
+
+// Quad over the viewport, with outputCoord running from (0, 0) at the
+// upper left to (1, 1) at the lower right of the output image
+
+const vec2 CORNERS[4] = vec2[4](
+    vec2(1, 1),  // lower right
+    vec2(1, 0),  // upper right
+    vec2(0, 1),  // lower left
+    vec2(0, 0)   // upper left
+);
+
+out noperspective vec2 outputCoord;
+
+void main() {
+    outputCoord = CORNERS[gl_VertexID];
+    gl_Position = vec4(2 * outputCoord.x - 1, 1 - 2 * outputCoord.y, 0.5, 1);
+}
@@ -0,0 +1,144 @@
+"""
+Reduced-resolution rendering while the user drags or zooms.
+
+During interaction an eye view draws its image into a smaller offscreen
+framebuffer, which is then stretched over the window. The size factor adapts
+so that frames take about target_frame_ms of GPU time. Shortly after the
+input stops, the view is drawn once more at full resolution.
+"""
+
+import collections
+import math
+
+import numpy
+from OpenGL import GL
+from PyQt5 import QtCore, QtGui
+
+from schmereo.shader_program import shader_program
+
+
+class GpuFrameTimer(object):
+    """
+    GPU time of recent frames, from GL_TIME_ELAPSED queries. Results arrive
+    a frame or two late, so reading them never stalls the pipeline.
+    """
+
+    def __init__(self):
+        self._free = []
+        self._pending = collections.deque()  # (query, render scale)
+        self._active = None
+        self.last_ms = None
+
+    def begin(self, scale: float) -> None:
+        query = self._free.pop() if self._free else GL.glGenQueries(1)
+        GL.glBeginQuery(GL.GL_TIME_ELAPSED, query)
+        self._active = (query, scale)
+
+    def end(self) -> None:
+        GL.glEndQuery(GL.GL_TIME_ELAPSED)
+        self._pending.append(self._active)
+        self._active = None
+
+    def results(self):
+        """(milliseconds, render scale) of frames finished since the last call"""
+        available = numpy.zeros(1, dtype=numpy.int32)
+        nanoseconds = numpy.zeros(1, dtype=numpy.uint64)
+        while self._pending:
+            query, scale = self._pending[0]
+            GL.glGetQueryObjectiv(query, GL.GL_QUERY_RESULT_AVAILABLE, available)
+            if not available[0]:
+                break
+            self._pending.popleft()
+            self._free.append(query)
+            GL.glGetQueryObjectui64v(query, GL.GL_QUERY_RESULT, nanoseconds)
+            self.last_ms = float(nanoseconds[0]) * 1e-6
+            yield self.last_ms, scale
+
+
+class DynamicResolution(QtCore.QObject):
+    def __init__(self, parent=None):
+        super().__init__(parent=parent)
+        settings = QtCore.QSettings()
+        self.enabled = settings.value("render/dynamic_resolution", True, type=bool)
+        self.target_frame_ms = settings.value("render/target_frame_ms", 12.0, type=float)
+        self.min_scale = 0.25
+        self.scale = 1.0  # fraction of window resolution while interacting
+        self.interactive = False
+        self.timer = GpuFrameTimer()
+        self._fbo = None
+        self._idle_timer = QtCore.QTimer(self)
+        self._idle_timer.setSingleShot(True)
+        self._idle_timer.setInterval(150)  # milliseconds without input
+        self._idle_timer.timeout.connect(self._on_idle)
+
+    refine = QtCore.pyqtSignal()  # time to draw a full resolution frame
+
+    def _on_idle(self) -> None:
+        self.interactive = False
+        self.refine.emit()
+
+    def adapt(self, frame_ms: float, frame_scale: float) -> None:
+        """
+        Choose the next scale from the GPU time of a frame drawn at
+        frame_scale, assuming the time is proportional to the pixel count.
+        """
+        if frame_ms <= 0:
+            return
+        ideal = frame_scale * math.sqrt(self.target_frame_ms / frame_ms)
+        scale = 0.5 * (self.scale + ideal)  # damped, so the scale does not flicker
+        self.scale = min(1.0, max(self.min_scale, scale))
+
+    def interact(self) -> None:
+        """Call on each drag or wheel event"""
+        if not self.enabled:
+            return
+        self.interactive = True
+        self._idle_timer.start()
+
+    @property
+    def render_scale(self) -> float:
+        if self.enabled and self.interactive:
+            return self.scale
+        return 1.0
+
+    def memory_bytes(self):
+        if self._fbo is None:
+            return 0, 0
+        return 0, self._fbo.width() * self._fbo.height() * 4
+
+    def bind_target(self, width: int, height: int) -> bool:
+        """
+        Bind the reduced-size framebuffer for a window of width x height
+        pixels. Returns False, binding nothing, at full resolution.
+        """
+        scale = self.render_scale
+        if scale >= 0.95:
+            return False
+        w = max(1, int(width * scale))
+        h = max(1, int(height * scale))
+        if self._fbo is None or self._fbo.width() != w or self._fbo.height() != h:
+            self._fbo = QtGui.QOpenGLFramebufferObject(w, h)
+            GL.glBindTexture(GL.GL_TEXTURE_2D, self._fbo.texture())
+            GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_MAG_FILTER, GL.GL_LINEAR)
+            GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_MIN_FILTER, GL.GL_LINEAR)
+        self._fbo.bind()
+        GL.glViewport(0, 0, w, h)
+        return True
+
+    def present(self, framebuffer: int, width: int, height: int, vao: int) -> None:
+        """Stretch the reduced-size frame over the window framebuffer"""
+        GL.glBindFramebuffer(GL.GL_FRAMEBUFFER, framebuffer)
+        GL.glViewport(0, 0, width, height)
+        GL.glBindVertexArray(vao)
+        GL.glUseProgram(shader_program("schmereo.image", "upscale.vert", "upscale.frag"))
+        GL.glDisable(GL.GL_BLEND)
+        GL.glBindTexture(GL.GL_TEXTURE_2D, self._fbo.texture())
+        GL.glDrawArrays(GL.GL_TRIANGLE_STRIP, 0, 4)
+
+    def set_target_frame_ms(self, value: float) -> None:
+        self.target_frame_ms = value
+        QtCore.QSettings().setValue("render/target_frame_ms", value)
+
+    def set_enabled(self, value: bool) -> None:
+        self.enabled = value
+        QtCore.QSettings().setValue("render/dynamic_resolution", value)
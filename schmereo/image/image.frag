@@ -1,46 +1,30 @@
-#version 460
+// Compiled after image_sampling.glsl, which has the #version line
 
 const float PI = 3.1415926535897932384626433832795;
 
 uniform sampler2D image;
+layout(binding = 1) uniform sampler1D lut;  // color matching
 layout(location = 3) uniform vec2 image_center = vec2(0);
 layout(location = 4) uniform float rotation = 0.0 * PI / 180.0;  // radians
+// schmereo.core.resample.FilterMode: 0 nearest, 1 linear, 2 cubic
+layout(location = 5) uniform int filter_mode = 1;
 
 in noperspective vec2 canvasCoord;
 out vec4 frag_color;
 
-const vec4 bg_color = vec4(vec3(0.2), 1);
-
 void main()
 {
-    // correct for image aspect ratio
-    ivec2 tsz = textureSize(image, 0);
-    float image_aspect = 1;
-    if (tsz.x > 0)
-        image_aspect = float(tsz.y) / tsz.x;
-
-    float cr = cos(rotation);
-    float sr = sin(rotation);
-    mat2 rot = mat2(cr, -sr,
-                    sr,  cr);
-    vec2 fip = rot * canvasCoord;
-    fip += image_center;
-    vec2 ipc = fip + vec2(1, image_aspect);
-    ipc.x *= 0.5;
-    ipc.y *= 0.5/image_aspect;
-
-    vec2 rel = ipc - vec2(0.5);
-    rel *= 2.0;
-    float mtc = max(abs(rel.x), abs(rel.y));
+    vec2 ipc = image_texture_coord(image, canvasCoord, image_center, rotation);
+    vec2 texels_per_pixel = fwidth(ipc * textureSize(image, 0));
 
-    if (mtc >= 1.0)
+    if (!is_inside_image(ipc))
     {
         // gray background
         frag_color = bg_color;
     }
     else
     {
-        // frag_color = vec4(texCoord, 0.5, 1);
-        frag_color = texture(image, ipc);
+        frag_color = filtered_texture(image, ipc, texels_per_pixel, filter_mode);
+        frag_color = apply_lut(lut, frag_color);
     }
 }
@@ -0,0 +1,96 @@
+#version 460
+
+// Image placement and filtering, shared by image.frag and the output
+// composite shader. Compiled in front of them; see shader_program().
+
+const vec4 bg_color = vec4(vec3(0.2), 1);
+
+// schmereo.core.resample.FilterMode
+const int FILTER_NEAREST = 0;
+const int FILTER_LINEAR = 1;
+const int FILTER_CUBIC = 2;
+
+// Texture coordinate of a canvas position, for an image placed with
+// image_center and rotation, as in schmereo.core.transform.
+vec2 image_texture_coord(sampler2D image, vec2 canvas, vec2 image_center, float rotation)
+{
+    // correct for image aspect ratio
+    ivec2 tsz = textureSize(image, 0);
+    float image_aspect = 1;
+    if (tsz.x > 0)
+        image_aspect = float(tsz.y) / tsz.x;
+
+    float cr = cos(rotation);
+    float sr = sin(rotation);
+    mat2 rot = mat2(cr, -sr,
+                    sr,  cr);
+    vec2 fip = rot * canvas;
+    fip += image_center;
+    vec2 ipc = fip + vec2(1, image_aspect);
+    ipc.x *= 0.5;
+    ipc.y *= 0.5/image_aspect;
+    return ipc;
+}
+
+bool is_inside_image(vec2 tc)
+{
+    vec2 rel = 2.0 * (tc - vec2(0.5));
+    return max(abs(rel.x), abs(rel.y)) < 1.0;
+}
+
+// Catmull-Rom weights of the texels at offsets -1, 0, 1, 2 from position t in [0, 1)
+vec4 cubic_weights(float t)
+{
+    float t2 = t * t;
+    float t3 = t2 * t;
+    return vec4(
+        -0.5 * t3 + t2 - 0.5 * t,
+        1.5 * t3 - 2.5 * t2 + 1.0,
+        -1.5 * t3 + 2.0 * t2 + 0.5 * t,
+        0.5 * t3 - 0.5 * t2);
+}
+
+// Same kernel as FilterMode.CUBIC in schmereo.core.resample
+vec4 texture_cubic(sampler2D image, vec2 tc)
+{
+    ivec2 tsz = textureSize(image, 0);
+    vec2 p = tc * tsz - 0.5;
+    vec2 base = floor(p);
+    vec4 wx = cubic_weights(p.x - base.x);
+    vec4 wy = cubic_weights(p.y - base.y);
+    vec4 result = vec4(0);
+    for (int j = 0; j < 4; ++j) {
+        vec4 row = vec4(0);
+        for (int i = 0; i < 4; ++i) {
+            ivec2 texel = clamp(ivec2(base) + ivec2(i - 1, j - 1), ivec2(0), tsz - 1);
+            row += wx[i] * texelFetch(image, texel, 0);
+        }
+        result += wy[j] * row;
+    }
+    return result;
+}
+
+// Per channel color lookup table, as in schmereo.core.color_match.apply_lut()
+vec4 apply_lut(sampler1D lut, vec4 color)
+{
+    ivec3 index = ivec3(clamp(color.rgb, 0.0, 1.0) * 255.0 + 0.5);
+    return vec4(
+        texelFetch(lut, index.r, 0).r,
+        texelFetch(lut, index.g, 0).g,
+        texelFetch(lut, index.b, 0).b,
+        color.a);
+}
+
+// texels_per_pixel comes from the caller, because derivatives are only
+// defined outside of branches
+vec4 filtered_texture(sampler2D image, vec2 tc, vec2 texels_per_pixel, int filter_mode)
+{
+    // Nearest and cubic are for magnification; minified views use the mipmaps
+    if (filter_mode == FILTER_LINEAR || max(texels_per_pixel.x, texels_per_pixel.y) > 1.0)
+        return texture(image, tc);
+    if (filter_mode == FILTER_NEAREST) {
+        ivec2 tsz = textureSize(image, 0);
+        return texelFetch(image, clamp(ivec2(floor(tc * tsz)), ivec2(0), tsz - 1), 0);
+    }
+    return texture_cubic(image, tc);
+}
@@ -1,13 +1,10 @@
 import datetime
 import enum
 from functools import partial
-import pkg_resources
 from typing import Optional
 
 import numpy
 from OpenGL import GL
-from PIL import Image
-from PIL.ImageQt import ImageQt
 from PyQt5 import QtCore, QtGui, QtWidgets
 from PyQt5.QtCore import Qt
 
@@ -20,15 +17,18 @@ from schmereo.coord_sys import (
     CanvasPos,
     ImagePixelCoordinate,
 )
+from schmereo.core.eye import EyeModel
+from schmereo.image.dynamic_resolution import DynamicResolution
 from schmereo.image.single_image import SingleImage
 from schmereo.marker import MarkerSet
+from schmereo.render_scheduler import FrameStats
+from schmereo import resources
+from schmereo.startup_profile import profile
+from schmereo.trace import tracer
 
 
 def _make_cursor(file_name):
-    fh = pkg_resources.resource_stream("schmereo", file_name)
-    img = ImageQt(Image.open(fh).convert("RGBA"))
-    cursor = QtGui.QCursor(QtGui.QPixmap.fromImage(img))
-    return cursor
+    return resources.cursor("schmereo", file_name)
 
 
 class DragMode(enum.Enum):
@@ -45,12 +45,17 @@ class ImageWidget(QtWidgets.QOpenGLWidget):
             camera = Camera()
         self.image = SingleImage(camera=camera)
         self.markers = MarkerSet(camera=camera)
+        # click-to-match: a clicked point waiting for its match, or a proposed match
+        self.suggestion = MarkerSet(camera=camera, color=(0.3, 1.0, 1.0, 0.9))
+        self.eye = EyeModel(image=self.image, markers=self.markers)
         self.aspect_ratio = 1.0
         # TODO: drag detection object
         self.drag_mode = DragMode.NONE
         self.latent_drag_mode = DragMode.PAN
         self.clip_box_edge = Edge.NONE
         self.previous_mouse: Optional[WindowPos] = None
+        # latest unhandled mouse motion: (position, buttons, arrival time)
+        self._pending_motion = None
         #
         self.setAcceptDrops(True)
         self.setMouseTracking(True)
@@ -60,7 +65,8 @@ class ImageWidget(QtWidgets.QOpenGLWidget):
         self.cross_cursor = _make_cursor("crosshair32.png")
         self.drag_cursor = self.grab_cursor
         self.hover_cursor = self.openhand_cursor
-        self.setCursor(self.hover_cursor)
+        self._cursor = None  # last cursor passed to setCursor()
+        self.set_cursor(self.hover_cursor)
         # TODO: click detection object
         self.mouse_press_pos = None
         self.mouse_press_time = datetime.datetime.now()
@@ -74,11 +80,28 @@ class ImageWidget(QtWidgets.QOpenGLWidget):
         self.clip_box = None
         self.clip_box_is_hovered = False
         self.painter = QtGui.QPainter()
+        #
+        self.render_scheduler = None
+        self.painted_state = None
+        self.frame_stats = FrameStats()
+        self.show_frame_stats = False
+        self.dynamic_resolution = DynamicResolution(self)
+        self.dynamic_resolution.refine.connect(
+            partial(self.request_repaint, "full resolution", True)
+        )
+        # "Pixel: x, y" readout, at most every STATUS_INTERVAL_MS
+        self._status_pos: Optional[QtCore.QPoint] = None
+        self._status_timer = QtCore.QTimer(self)
+        self._status_timer.setSingleShot(True)
+        self._status_timer.setInterval(self.STATUS_INTERVAL_MS)
+        self._status_timer.timeout.connect(self._send_status)
+
+    STATUS_INTERVAL_MS = 100
 
     def add_marker(self, image_pos: ImagePixelCoordinate):
         self.markers.add_marker(image_pos)
         self.marker_added.emit()
-        self.update()
+        self.request_repaint("markers")
 
     def add_marker_from_action(self, action):
         mouse_pos = action.data()
@@ -92,7 +115,7 @@ class ImageWidget(QtWidgets.QOpenGLWidget):
     @camera.setter
     def camera(self, value):
         self.image.camera = value
-        self.image.camera.changed.connect(self.update)
+        self.image.camera.changed.connect(partial(self.request_repaint, "camera"))
 
     def contextMenuEvent(self, event: QtGui.QContextMenuEvent):
         if self.image.image is None:
@@ -121,20 +144,15 @@ class ImageWidget(QtWidgets.QOpenGLWidget):
 
     file_dropped = QtCore.pyqtSignal(str)
 
+    # Image pixels are of the eye's part of its file, e.g. one half of a JPS,
+    # as in the texture and the core EyeModel
+
     def fract_from_image(self, pos: ImagePixelCoordinate) -> FractionalImagePos:
-        img = self.image.image
-        img_size = (1, 1)
-        if img:
-            img_size = (img.width, img.height)
-        return FractionalImagePos.from_ImagePixelCoordinate(pos, img_size)
+        return FractionalImagePos.from_ImagePixelCoordinate(pos, self.eye.image_size())
 
     def image_from_canvas(self, pos: CanvasPos) -> ImagePixelCoordinate:
-        fip = FractionalImagePos.from_CanvasPos(pos, self.image.transform)
-        img = self.image.image
-        img_size = (1, 1)
-        if img:
-            img_size = (img.width, img.height)
-        ip = ImagePixelCoordinate.from_FractionalImagePos(fip, img_size)
+        fip = FractionalImagePos.from_CanvasPos(pos, self.image.display_transform)
+        ip = ImagePixelCoordinate.from_FractionalImagePos(fip, self.eye.image_size())
         return ip
 
     def image_from_window_qpoint(self, q_point: QtCore.QPoint) -> ImagePixelCoordinate:
@@ -143,31 +161,51 @@ class ImageWidget(QtWidgets.QOpenGLWidget):
         return self.image_from_canvas(cp)
 
     def initializeGL(self) -> None:
-        super().initializeGL()
-        self.image.initializeGL()
-        self.markers.initializeGL()
-
-    def load_image(self, file_name) -> bool:
-        result = self.image.load_image(file_name)
+        with profile.span(f"initialize OpenGL {self.objectName()}"):
+            super().initializeGL()
+            self.image.initializeGL()
+            self.markers.initializeGL()
+            self.suggestion.initializeGL()
+
+    def load_image(self, file_name, half=None, frame=None) -> bool:
+        result = self.image.load_image(file_name, half=half, frame=frame)
         return result
 
     marker_added = QtCore.pyqtSignal()
+    marker_clicked = QtCore.pyqtSignal(object)  # ImagePixelCoordinate, in add marker mode
 
     messageSent = QtCore.pyqtSignal(str, int)
 
     def mouseClickEvent(self, event: QtGui.QMouseEvent) -> None:
         self.maybe_clicking = False
         if self._add_marker_mode and (event.button() == Qt.LeftButton):
-            image_pos = self.image_from_window_qpoint(event.pos())
-            self.undo_stack.push(AddMarkerCommand(self, image_pos))
+            self.marker_clicked.emit(self.image_from_window_qpoint(event.pos()))
 
     def mouseDoubleClickEvent(self, *args, **kwargs):
         self.maybe_clicking = False
 
     def mouseMoveEvent(self, event: QtGui.QMouseEvent):
-        if self.drag_mode != DragMode.NONE and not event.buttons() & Qt.LeftButton:
+        received = self.frame_stats.input_received()
+        self._pending_motion = (QtCore.QPoint(event.pos()), event.buttons(), received)
+        if self.render_scheduler is None:
+            self.process_motion()
+        else:
+            # Handle only the latest of the motion events arriving in one frame
+            self.render_scheduler.defer_input(self, self.process_motion)
+
+    def process_motion(self) -> None:
+        """Handle the latest mouse motion, if it has not been handled yet"""
+        if self._pending_motion is None:
             return
-        wp = WindowPos.from_QPoint(event.pos())
+        pos, buttons, received = self._pending_motion
+        self._pending_motion = None
+        self._handle_motion(pos, buttons)
+        self.frame_stats.input_handled(received)
+
+    def _handle_motion(self, pos: QtCore.QPoint, buttons) -> None:
+        if self.drag_mode != DragMode.NONE and not buttons & Qt.LeftButton:
+            return
+        wp = WindowPos.from_QPoint(pos)
         if self.drag_mode != DragMode.NONE and self.previous_mouse is None:
             self.previous_mouse = wp
             return
@@ -182,7 +220,9 @@ class ImageWidget(QtWidgets.QOpenGLWidget):
             if self.drag_mode == DragMode.CLIP_BOX:
                 self.clip_box.adjust(self.clip_box_edge, dPosC)
                 self.clip_box.notify()
+                self.dynamic_resolution.interact()
             elif self.drag_mode == DragMode.PAN:
+                self.dynamic_resolution.interact()
                 self.camera.center -= dPosC
                 self.camera.notify()  # update UI now
         else:  # just hovering, not dragging
@@ -191,27 +231,36 @@ class ImageWidget(QtWidgets.QOpenGLWidget):
             )
             if self.clip_box_edge == Edge.NONE:
                 is_hovered = False
-                self.setCursor(self.hover_cursor)
+                self.set_cursor(self.hover_cursor)
                 self.latent_drag_mode = DragMode.PAN
             else:
                 is_hovered = True
                 self.latent_drag_mode = DragMode.CLIP_BOX
                 if self.clip_box_edge in (Edge.TOP, Edge.BOTTOM):
-                    self.setCursor(Qt.SizeVerCursor)
+                    self.set_cursor(Qt.SizeVerCursor)
                 elif self.clip_box_edge in (Edge.LEFT, Edge.RIGHT):
-                    self.setCursor(Qt.SizeHorCursor)
+                    self.set_cursor(Qt.SizeHorCursor)
                 elif self.clip_box_edge in (Edge.TOP_LEFT, Edge.BOTTOM_RIGHT):
-                    self.setCursor(Qt.SizeFDiagCursor)
+                    self.set_cursor(Qt.SizeFDiagCursor)
                 elif self.clip_box_edge in (Edge.TOP_RIGHT, Edge.BOTTOM_LEFT):
-                    self.setCursor(Qt.SizeBDiagCursor)
+                    self.set_cursor(Qt.SizeBDiagCursor)
             if self.clip_box_is_hovered != is_hovered:
                 self.clip_box_is_hovered = is_hovered
-                self.update()
+                self.request_repaint("clip box")
             #
-            ip = self.image_from_window_qpoint(event.pos())
-            self.messageSent.emit(f"Pixel: {ip.x: 0.1f}, {ip.y: 0.1f}", 3000)
+            self._status_pos = pos
+            if not self._status_timer.isActive():
+                self._status_timer.start()
+
+    def _send_status(self) -> None:
+        if self._status_pos is None:
+            return
+        ip = self.image_from_window_qpoint(self._status_pos)
+        self._status_pos = None
+        self.messageSent.emit(f"Pixel: {ip.x: 0.1f}, {ip.y: 0.1f}", 3000)
 
     def mousePressEvent(self, event: QtGui.QMouseEvent):
+        self.process_motion()  # hover state decides what the press does
         if not event.buttons() & Qt.LeftButton:
             return
         # drag detection
@@ -226,13 +275,14 @@ class ImageWidget(QtWidgets.QOpenGLWidget):
         self.mouse_press_time = datetime.datetime.now()
         # cursor shape
         if self.drag_cursor != self.hover_cursor:
-            self.setCursor(self.drag_cursor)
-            self.update()
+            self.set_cursor(self.drag_cursor)
+            self.request_repaint("cursor")
 
     def mouseReleaseEvent(self, event: QtGui.QMouseEvent):
+        self.process_motion()  # finish the drag at its final position
         # cursor shape
         if self.drag_cursor != self.hover_cursor:
-            self.setCursor(self.hover_cursor)
+            self.set_cursor(self.hover_cursor)
         # drag detection
         if self.drag_mode == DragMode.CLIP_BOX and self.clip_box.press_state is not None and self.clip_box.press_state != self.clip_box.state:
             old_state = self.clip_box.press_state
@@ -267,7 +317,16 @@ class ImageWidget(QtWidgets.QOpenGLWidget):
             self.hover_cursor = self.openhand_cursor
             self.drag_cursor = self.grab_cursor
         self._add_marker_mode = checked
-        self.setCursor(self.hover_cursor)
+        self.set_cursor(self.hover_cursor)
+
+    def set_cursor(self, cursor) -> None:
+        """setCursor(), skipped when the shape is already showing"""
+        if cursor is self._cursor or (
+            isinstance(cursor, Qt.CursorShape) and cursor == self._cursor
+        ):
+            return
+        self._cursor = cursor
+        self.setCursor(cursor)
 
     def wheelEvent(self, event: QtGui.QWheelEvent):
         dScale = event.angleDelta().y() / 120.0
@@ -287,46 +346,135 @@ class ImageWidget(QtWidgets.QOpenGLWidget):
         else:
             # zoom centered on widget center
             self.camera.zoom *= dScale
+        self.dynamic_resolution.interact()
         self.camera.notify()
 
     def paintGL(self) -> None:
-        self.image.paintGL(self.aspect_ratio)
+        tracer.count("frames drawn")
+        with tracer.span("paint", view=self.objectName()):
+            self._paint()
+
+    def _paint(self) -> None:
+        self.frame_stats.begin_frame()
+        self.painted_state = self.render_state()
         img = self.image.image
+        resolution = self.dynamic_resolution
+        for frame_ms, frame_scale in resolution.timer.results():
+            resolution.adapt(frame_ms, frame_scale)
+        scale = resolution.render_scale
+        resolution.timer.begin(scale)
+        ratio = self.devicePixelRatioF()
+        width, height = int(self.width() * ratio), int(self.height() * ratio)
+        reduced = img is not None and resolution.bind_target(width, height)
+        if self.image.paintGL(self.aspect_ratio):
+            # texture upload continues in the next frame
+            self.request_repaint("texture upload", force=True)
+        if reduced:
+            resolution.present(
+                self.defaultFramebufferObject(), width, height, vao=self.image.vao
+            )
         if img:
-            image_size = numpy.array([img.width, img.height], dtype=numpy.int32)
+            image_size = numpy.array(self.eye.image_size(), dtype=numpy.int32)
         else:
             image_size = numpy.array([640, 480], dtype=numpy.int32)
-        self.markers.paintGL(
-            image_size=image_size,
-            transform=self.image.transform,
-            camera=self.camera,
-            window_aspect=self.aspect_ratio,
-        )
-        if img:
-            assert self.painter.begin(self)
-            self.clip_box.paint_gl(
-                window_size=self.size(),
+        for marker_set in (self.markers, self.suggestion):
+            marker_set.paintGL(
+                image_size=image_size,
+                transform=self.image.display_transform,
                 camera=self.camera,
-                painter=self.painter,
-                hover=self.clip_box_is_hovered,
+                window_aspect=self.aspect_ratio,
             )
-            self.painter.end()
+        if img:
+            self.paint_clip_box()
+        resolution.timer.end()
+        self.frame_stats.end_frame(self.image.frame_upload_ms)
+        self.frame_stats.gpu_ms = resolution.timer.last_ms
+        self.frame_stats.render_scale = scale if reduced else 1.0
+        if self.show_frame_stats:
+            self.paint_frame_stats()
+
+    def paint_clip_box(self) -> None:
+        if self.clip_box.use_shader:
+            try:
+                self.clip_box.paint_shader(
+                    window_size=self.size(),
+                    camera=self.camera,
+                    window_aspect=self.aspect_ratio,
+                    hover=self.clip_box_is_hovered,
+                    vao=self.image.vao,
+                )
+                return
+            except RuntimeError as exc:  # e.g. the shader did not compile
+                self.messageSent.emit(f"Clip box shader failed: {exc}", 5000)
+                self.clip_box.use_shader = False
+        assert self.painter.begin(self)
+        self.clip_box.paint_gl(
+            window_size=self.size(),
+            camera=self.camera,
+            painter=self.painter,
+            hover=self.clip_box_is_hovered,
+        )
+        self.painter.end()
+
+    def paint_frame_stats(self) -> None:
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, 0)
+        assert self.painter.begin(self)
+        self.painter.setFont(QtGui.QFontDatabase.systemFont(QtGui.QFontDatabase.FixedFont))
+        text = f"{self.objectName()}\n{self.frame_stats.text()}"
+        rect = self.painter.boundingRect(QtCore.QRect(8, 8, 400, 200), 0, text)
+        self.painter.fillRect(rect.adjusted(-4, -4, 4, 4), QtGui.QColor(0, 0, 0, 0xA0))
+        self.painter.setPen(QtGui.QColor(0xFF, 0xFF, 0x80))
+        self.painter.drawText(rect, 0, text)
+        self.painter.end()
+
+    def render_state(self) -> tuple:
+        """Everything paintGL() draws depends on; equal states draw the same frame"""
+        camera = self.camera
+        transform = self.image.display_transform
+        clip_box = None
+        if self.clip_box is not None:
+            cb = self.clip_box
+            clip_box = (cb.left, cb.right, cb.top, cb.bottom)
+        return (
+            self.width(),
+            self.height(),
+            self.image.texture_key,
+            camera.zoom,
+            camera.center.x,
+            camera.center.y,
+            transform.center.x,
+            transform.center.y,
+            transform.rotation,
+            self.image.filter_mode,
+            self.image.lut_version,
+            self.markers.version,
+            self.suggestion.version,
+            clip_box,
+            self.clip_box_is_hovered,
+            self.show_frame_stats,
+        )
+
+    def request_repaint(self, source: str, force=False) -> None:
+        """Repaint soon, coalesced with other requests in the same frame"""
+        if self.render_scheduler is None:
+            self.update()
+        else:
+            self.render_scheduler.request(self, source, force)
 
     def resizeGL(self, width: int, height: int) -> None:
         self.aspect_ratio = height / width
 
     def to_dict(self):
-        return {"image": self.image.to_dict(), "markers": self.markers.to_dict()}
+        return self.eye.to_dict()
 
     def from_dict(self, data):
-        self.image.from_dict(data["image"])
-        self.markers.from_dict(data["markers"])
+        self.eye.from_dict(data)
 
     def x_fract_from_canvas(self, pos: CanvasPos) -> FractionalImagePos:
-        return FractionalImagePos.from_CanvasPos(pos, self.image.transform)
+        return FractionalImagePos.from_CanvasPos(pos, self.image.display_transform)
 
     def x_canvas_from_image(self, pos: ImagePixelCoordinate) -> CanvasPos:
         f = self.fract_from_image(pos)
-        xform = self.image.transform
+        xform = self.image.display_transform
         c = CanvasPos.from_FractionalImagePos(f, xform)
         return c
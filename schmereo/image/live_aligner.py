@@ -0,0 +1,139 @@
+"""
+Live alignment preview: while markers are placed, the eyes are drawn as
+Align Now would place them, without changing their transforms until the
+preview is accepted.
+
+LiveAligner is registered with the RenderScheduler as an observer, so it
+notices every change of the markers, the transforms or the image sizes.
+After a short pause in changes it solves the alignment on a worker thread,
+from a copy of the markers, so the GUI thread never waits for a solve. A
+change during a solve supersedes it: a solve that has not started is
+cancelled, and the result of one that has is dropped.
+"""
+
+import copy
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt5 import QtCore
+
+from schmereo.core.aligner import solve_alignment
+from schmereo.core.eye import EyeModel
+from schmereo.core.image import ImageModel
+from schmereo.core.marker import MarkerArray
+from schmereo.trace import tracer
+
+
+def _snapshot(eye: EyeModel) -> EyeModel:
+    """What the solver reads of an eye, sharing nothing with the GUI objects"""
+    image = ImageModel()
+    image.width, image.height = eye.image.width, eye.image.height
+    image.transform = copy.deepcopy(eye.image.transform)
+    markers = MarkerArray()
+    markers.add_markers(eye.markers.points.copy())
+    return EyeModel(image=image, markers=markers)
+
+
+class LiveAligner(QtCore.QObject):
+    DEBOUNCE_MS = 150
+
+    def __init__(self, widgets, parent=None):
+        super().__init__(parent=parent)
+        self.widgets = list(widgets)
+        self.enabled = False
+        self.painted_state = None
+        self.solution = None  # AlignmentSolution being previewed
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="schmereo-align")
+        self._future = None
+        self._generation = 0  # of the latest solve; older results are dropped
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(self.DEBOUNCE_MS)
+        self._timer.timeout.connect(self._solve)
+        self.solved.connect(self._on_solved)
+
+    solved = QtCore.pyqtSignal(int, object)  # generation, AlignmentSolution
+    preview_changed = QtCore.pyqtSignal(bool)  # whether a preview is shown
+
+    def render_state(self) -> tuple:
+        """Everything a solve depends on; see RenderScheduler"""
+        state = []
+        for w in self.widgets:
+            transform = w.image.transform
+            state.extend(
+                (
+                    w.markers.version,
+                    w.eye.image_size(),
+                    transform.center.x,
+                    transform.center.y,
+                    transform.rotation,
+                )
+            )
+        return tuple(state)
+
+    def update(self) -> None:
+        self.painted_state = self.render_state()
+        if self.enabled:
+            self._cancel()
+            self._timer.start()  # restarts the pause
+
+    def set_enabled(self, enabled: bool) -> None:
+        self.enabled = enabled
+        self.painted_state = None
+        if enabled:
+            self.update()
+        else:
+            self._cancel()
+            self.clear_preview()
+
+    def shutdown(self) -> None:
+        self._cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _cancel(self) -> None:
+        self._timer.stop()
+        self._generation += 1
+        if self._future is not None:
+            self._future.cancel()
+            self._future = None
+
+    def _solve(self) -> None:
+        if min(len(w.markers) for w in self.widgets) < 2:
+            self.clear_preview()  # one pair cannot show a rotation
+            return
+        self._generation += 1
+        eyes = [_snapshot(w.eye) for w in self.widgets]
+        self._future = self._executor.submit(self._run, self._generation, *eyes)
+
+    def _run(self, generation: int, left: EyeModel, right: EyeModel) -> None:
+        if generation != self._generation:
+            return
+        with tracer.span("live align"):
+            solution = solve_alignment(left, right)
+        self.solved.emit(generation, solution)
+
+    @QtCore.pyqtSlot(int, object)
+    def _on_solved(self, generation: int, solution) -> None:
+        if generation != self._generation or not self.enabled:
+            return
+        self._future = None
+        self.solution = solution
+        transforms = (solution.left_transform, solution.right_transform)
+        for w, transform in zip(self.widgets, transforms):
+            w.image.preview_transform = transform
+            w.request_repaint("alignment preview")
+        self.preview_changed.emit(True)
+
+    def clear_preview(self) -> None:
+        if self.solution is None:
+            return
+        self.solution = None
+        for w in self.widgets:
+            w.image.preview_transform = None
+            w.request_repaint("alignment preview")
+        self.preview_changed.emit(False)
+
+    def take_solution(self):
+        """The previewed solution, to apply with AlignNowCommand; ends the preview"""
+        solution = self.solution
+        self.clear_preview()
+        return solution
@@ -1,125 +1,226 @@
-import pkg_resources
+import os
+import weakref
 
 import numpy
 from OpenGL import GL
-from OpenGL.GL.shaders import compileProgram, compileShader
-from PIL import Image
 from PyQt5.QtCore import QObject, pyqtSignal
 
 from schmereo.camera import Camera
 from schmereo.coord_sys import ImageTransform
+from schmereo.core.color_match import histogram, identity_lut
+from schmereo.core.image import ImageModel
+from schmereo.core.resample import FilterMode
+from schmereo.core.stereo_file import half_view, open_frame, part_size
+from schmereo.image.texture_registry import image_key, texture_registry
+from schmereo.image.texture_upload import TextureUpload
+from schmereo.memory_ledger import memory_ledger
+from schmereo.shader_program import shader_program
+from schmereo.trace import tracer
 
 
-class SingleImage(QObject):
+class DecodedImage(object):
+    """Image pixels, shared by every SingleImage showing the same file"""
+
+    def __init__(self, image, pixels):
+        self.image = image
+        self.pixels = pixels
+
+    def memory_bytes(self):
+        """CPU bytes of the RGBA pixels, plus PIL's own decoded copy"""
+        pil_bytes = self.image.width * self.image.height * len(self.image.getbands())
+        return self.pixels.nbytes + pil_bytes, 0
+
+
+_decoded_images = weakref.WeakValueDictionary()  # image key -> DecodedImage
+
+
+class SingleImage(QObject, ImageModel):
     def __init__(self, camera: Camera):
         super().__init__()
         self.camera = camera
         self.vao = None
         self.shader = None
-        self.texture = None
+        self.texture = None  # SharedTexture
+        self.texture_key = None
+        self.decoded = None
         self.image = None
-        self.image_needs_upload = False
         self.aspect_location = 0
         self.zoom_location = 1
         self.canvas_center_location = 2
         self.image_center_location = 3
         self.rotation_location = 4
-        self.file_name = None
+        self.filter_mode_location = 5
+        self.filter_mode = FilterMode.LINEAR
+        self.lut = None  # (3, 256) uint8 color lookup tables, or None
+        self.lut_version = 0
+        self._lut_texture = None
+        self._uploaded_lut_version = None
+        self._histogram = None  # (region, histogram) of the latest request
         self.pixels = None
-        self.transform = ImageTransform()
+        self.preview_transform = None  # tentative ImageTransform, e.g. a live alignment
+        self.upload_budget_ms = 8.0  # per frame, while streaming a new texture
+        self.frame_upload_ms = 0.0  # spent uploading during the latest frame
+        self.max_frame_upload_ms = 0.0
 
-    def initializeGL(self) -> None:
-        self.vao = GL.glGenVertexArrays(1)
-        self.shader = compileProgram(
-            compileShader(
-                pkg_resources.resource_string("schmereo.image", "image.vert"),
-                GL.GL_VERTEX_SHADER,
-            ),
-            compileShader(
-                pkg_resources.resource_string("schmereo.image", "image.frag"),
-                GL.GL_FRAGMENT_SHADER,
-            ),
+    def _load_shader(self) -> None:
+        """Load on first use, so that an empty window starts faster"""
+        self.shader = shader_program(
+            "schmereo.image", "image.vert", ("image_sampling.glsl", "image.frag")
         )
-        self.texture = GL.glGenTextures(1)
 
-    def load_image(self, file_name) -> bool:
-        if file_name == self.file_name:
-            return True
-        image = Image.open(file_name)
-        if image is None:
-            self.log_message(f"ERROR: Image load failed.")
-            return False
+    def _decode(self, file_name, frame, key):
+        decoded = _decoded_images.get(key)
+        if decoded is not None:
+            return decoded  # the other eye already loaded this file
+        with tracer.span("decode image", file=file_name):
+            image = open_frame(file_name, frame)  # only this frame of a multi-picture file
+            if image is None:
+                self.log_message(f"ERROR: Image load failed.")
+                return None
+            image.load()
         self.log_message(f"Processing image {file_name}...")
-        pixels = numpy.frombuffer(
-            buffer=image.convert("RGBA").tobytes(), dtype=numpy.ubyte
-        )
+        with tracer.span("convert RGBA"):
+            pixels = numpy.frombuffer(
+                buffer=image.convert("RGBA").tobytes(), dtype=numpy.ubyte
+            )
         if pixels is None or len(pixels) < 1:
             self.log_message(f"ERROR: Image processing failed.")
-            return False
+            return None
         self.log_message(f"Finished processing image {file_name}")
+        decoded = DecodedImage(image, pixels)
+        _decoded_images[key] = decoded
+        memory_ledger.register(
+            decoded, "decoded images", DecodedImage.memory_bytes, name=os.path.basename(file_name)
+        )
+        return decoded
+
+    def _release_texture(self) -> None:
+        if self.texture is not None:
+            texture_registry.release(self.texture)
+            self.texture = None
+
+    def initializeGL(self) -> None:
+        self.vao = GL.glGenVertexArrays(1)
+
+    def load_image(self, file_name, half=None, frame=None) -> bool:
+        """
+        half or frame select one eye of a stereo file. Both halves of a side
+        by side file share one decoded buffer; each eye's pixels are a view
+        of its own columns, and only those go to its texture.
+        """
+        if (file_name, half, frame) == (self.file_name, self.half, self.frame):
+            return True
+        frame_part = () if frame is None else ("frame", frame)
+        decoded = self._decode(file_name, frame, image_key(file_name, *frame_part))
+        if decoded is None:
+            return False
+        self._release_texture()
         self.file_name = file_name
-        self.pixels = pixels
-        self.image = image
-        self.image_needs_upload = True
+        self.half = half
+        self.frame = frame
+        half_part = () if half is None else ("half", half)
+        self.texture_key = image_key(file_name, *frame_part, *half_part)
+        self.width, self.height = part_size(decoded.image.size, half)
+        self.decoded = decoded
+        full_width, full_height = decoded.image.size
+        self.pixels = half_view(decoded.pixels.reshape(full_height, full_width, 4), half)
+        self.image = decoded.image
+        self._histogram = None
         return True
 
+    def histogram(self, region=None):
+        """
+        (3, 256) RGB histogram of a subsample of the pixels, of an (x0, y0,
+        x1, y1) region if given, or None before there are pixels
+        """
+        if self.pixels is None:
+            return None
+        if self._histogram is None or self._histogram[0] != region:
+            pixels = self.pixels.reshape(self.height, self.width, 4)
+            self._histogram = region, histogram(pixels, region=region)
+        return self._histogram[1]
+
+    def set_lut(self, lut) -> None:
+        self.lut = lut
+        self.lut_version += 1
+
+    def bind_lut(self, unit: int) -> None:
+        """Bind the color lookup table, as a 1D texture, to a texture unit"""
+        GL.glActiveTexture(GL.GL_TEXTURE0 + unit)
+        if self._lut_texture is None:
+            self._lut_texture = GL.glGenTextures(1)
+            GL.glBindTexture(GL.GL_TEXTURE_1D, self._lut_texture)
+            GL.glTexStorage1D(GL.GL_TEXTURE_1D, 1, GL.GL_RGBA8, 256)
+            GL.glTexParameteri(GL.GL_TEXTURE_1D, GL.GL_TEXTURE_MAG_FILTER, GL.GL_NEAREST)
+            GL.glTexParameteri(GL.GL_TEXTURE_1D, GL.GL_TEXTURE_MIN_FILTER, GL.GL_NEAREST)
+        GL.glBindTexture(GL.GL_TEXTURE_1D, self._lut_texture)
+        if self._uploaded_lut_version != self.lut_version:
+            lut = identity_lut() if self.lut is None else self.lut
+            rgba = numpy.full((256, 4), 255, dtype=numpy.ubyte)
+            rgba[:, :3] = lut.T
+            GL.glPixelStorei(GL.GL_UNPACK_ALIGNMENT, 1)
+            GL.glTexSubImage1D(GL.GL_TEXTURE_1D, 0, 0, 256, GL.GL_RGBA, GL.GL_UNSIGNED_BYTE, rgba)
+            self._uploaded_lut_version = self.lut_version
+        GL.glActiveTexture(GL.GL_TEXTURE0)
+
     def log_message(self, message):
         self.messageSent.emit(message, 5000)
 
     messageSent = pyqtSignal(str, int)
 
-    def paintGL(self, aspect_ratio, camera=None) -> None:
+    @property
+    def display_transform(self) -> ImageTransform:
+        """The transform the image is drawn with: a preview, if any, else its own"""
+        if self.preview_transform is not None:
+            return self.preview_transform
+        return self.transform
+
+    def paintGL(self, aspect_ratio, camera=None, complete_upload=False) -> bool:
+        """
+        Draw the image. Returns True while the texture upload is still in
+        progress, in which case the caller should schedule another frame.
+        With complete_upload, finish the upload now instead of streaming it.
+        """
         if self.pixels is None:
-            return
+            return False
         if camera is None:
             camera = self.camera
         GL.glBindVertexArray(self.vao)
-        GL.glBindTexture(GL.GL_TEXTURE_2D, self.texture)
-        if self.image_needs_upload:
-            GL.glPixelStorei(GL.GL_UNPACK_ALIGNMENT, 1)
-            GL.glTexImage2D(
-                GL.GL_TEXTURE_2D,
-                0,
-                GL.GL_RGBA,
-                self.image.width,
-                self.image.height,
-                0,
-                GL.GL_RGBA,
-                GL.GL_UNSIGNED_BYTE,
-                self.pixels,
-            )
-            # TODO: implement toggle between NEAREST, LINEAR, CUBIC...
-            GL.glTexParameteri(
-                GL.GL_TEXTURE_2D, GL.GL_TEXTURE_MAG_FILTER, GL.GL_LINEAR
-            )
-            GL.glTexParameteri(
-                GL.GL_TEXTURE_2D, GL.GL_TEXTURE_MIN_FILTER, GL.GL_LINEAR_MIPMAP_LINEAR
-            )
-            GL.glTexParameteri(
-                GL.GL_TEXTURE_2D, GL.GL_TEXTURE_WRAP_S, GL.GL_CLAMP_TO_EDGE
-            )
-            GL.glTexParameteri(
-                GL.GL_TEXTURE_2D, GL.GL_TEXTURE_WRAP_T, GL.GL_CLAMP_TO_EDGE
-            )
-            GL.glGenerateMipmap(GL.GL_TEXTURE_2D)
-            self.image_needs_upload = False
+        if self.texture is None:
+            self.texture = texture_registry.acquire(self.texture_key)
+        texture = self.texture
+        self.frame_upload_ms = 0.0
+        if not texture.uploaded:
+            if texture.upload is None:
+                texture.upload = TextureUpload(
+                    texture.texture, self.width, self.height, self.pixels
+                )
+            budget = None if complete_upload else self.upload_budget_ms
+            uploaded_before = texture.upload.bytes_uploaded
+            with tracer.span("texture upload"):
+                done = texture.upload.step(budget)
+            tracer.count("bytes uploaded", texture.upload.bytes_uploaded - uploaded_before)
+            self.frame_upload_ms = texture.upload.last_step_ms
+            self.max_frame_upload_ms = max(self.max_frame_upload_ms, self.frame_upload_ms)
+            if done:
+                texture.upload.delete()
+                texture.upload = None
+                texture.set_uploaded(self.width, self.height)
+        if texture.uploaded:
+            GL.glBindTexture(GL.GL_TEXTURE_2D, texture.texture)
+        else:
+            GL.glBindTexture(GL.GL_TEXTURE_2D, texture.upload.preview_texture)
+        self.bind_lut(unit=1)
+        if self.shader is None:
+            self._load_shader()
         GL.glUseProgram(self.shader)
         GL.glUniform1f(self.aspect_location, aspect_ratio)
         GL.glUniform1f(self.zoom_location, camera.zoom)
         GL.glUniform2fv(self.canvas_center_location, 1, camera.center.bytes)
-        GL.glUniform2fv(self.image_center_location, 1, self.transform.center.bytes)
-        GL.glUniform1f(self.rotation_location, self.transform.rotation)
+        transform = self.display_transform
+        GL.glUniform2fv(self.image_center_location, 1, transform.center.bytes)
+        GL.glUniform1f(self.rotation_location, transform.rotation)
+        # The shader has no Lanczos; it is for export
+        GL.glUniform1i(self.filter_mode_location, min(self.filter_mode.value, 2))
         GL.glDrawArrays(GL.GL_TRIANGLE_STRIP, 0, 4)
-
-    def size(self):
-        return self.image.width, self.image.height
-
-    def to_dict(self):
-        return {
-            'file_name': self.file_name,
-            'transform': self.transform.to_dict(self),
-        }
-
-    def from_dict(self, data):
-        self.load_image(data['file_name'])
-        self.transform.from_dict(data['transform'], self)
+        return not texture.uploaded
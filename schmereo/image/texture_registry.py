@@ -0,0 +1,97 @@
+"""
+Reference-counted image textures shared by every view in the OpenGL share
+group, keyed by image identity.
+
+Views acquire a texture for an image, and release it when they show
+something else. A texture with no users stays resident, up to
+resident_budget bytes of video memory, so that reopening a recent project
+does not upload the same image again. All GL calls happen in acquire(),
+which is only called while a context of the share group is current.
+"""
+
+import collections
+import os
+
+from OpenGL import GL
+
+from schmereo.memory_ledger import memory_ledger
+
+
+def image_key(file_name: str, *parts) -> tuple:
+    """Identity of an image file: the same key means the same pixels"""
+    path = os.path.abspath(file_name)
+    stat = os.stat(path)
+    return (path, stat.st_mtime_ns, stat.st_size, *parts)
+
+
+class SharedTexture(object):
+    def __init__(self, key: tuple, texture: int):
+        self.key = key
+        self.texture = texture
+        self.ref_count = 0
+        self.uploaded = False
+        self.upload = None  # TextureUpload, while streaming
+        self.nbytes = 0  # estimated video memory, including mipmaps
+
+    def delete(self) -> None:
+        if self.upload is not None:
+            self.upload.delete()
+            self.upload = None
+        GL.glDeleteTextures([self.texture])
+
+    def memory_bytes(self):
+        if self.upload is not None:
+            return 0, self.upload.gpu_bytes
+        return 0, self.nbytes
+
+    def set_uploaded(self, width: int, height: int) -> None:
+        self.uploaded = True
+        self.nbytes = width * height * 4 * 4 // 3
+
+
+class TextureRegistry(object):
+    def __init__(self, resident_budget: int = 1024 ** 3):
+        self.resident_budget = resident_budget
+        self._textures = collections.OrderedDict()  # least recently used first
+
+    def __len__(self) -> int:
+        return len(self._textures)
+
+    def acquire(self, key: tuple) -> SharedTexture:
+        """Texture for an image; check .uploaded before drawing with it"""
+        if key in self._textures:
+            self._textures.move_to_end(key)
+            entry = self._textures[key]
+        else:
+            entry = SharedTexture(key, GL.glGenTextures(1))
+            self._textures[key] = entry
+            memory_ledger.register(
+                entry, "textures", SharedTexture.memory_bytes, name=os.path.basename(key[0])
+            )
+        entry.ref_count += 1
+        self._evict()
+        return entry
+
+    def release(self, entry: SharedTexture) -> None:
+        entry.ref_count -= 1
+        assert entry.ref_count >= 0
+
+    @property
+    def resident_bytes(self) -> int:
+        return sum(e.nbytes for e in self._textures.values())
+
+    def _evict(self) -> None:
+        """Delete unused textures, oldest first, until under budget"""
+        excess = self.resident_bytes - self.resident_budget
+        for key, entry in list(self._textures.items()):
+            if entry.ref_count > 0:
+                continue
+            if entry.uploaded and excess <= 0:
+                continue
+            entry.delete()
+            del self._textures[key]
+            excess -= entry.nbytes
+
+
+# One registry is enough, because all views share one OpenGL context group
+texture_registry = TextureRegistry()
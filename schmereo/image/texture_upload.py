@@ -0,0 +1,162 @@
+"""
+Incremental texture upload through a pixel buffer object.
+
+Uploading a 100 megapixel image with one glTexImage2D() call stalls the
+GUI for seconds. Instead, TextureUpload copies a few rows at a time into an
+orphaned PBO and from there into the texture, stopping each frame once its
+time budget is spent. Until the last row is in, views draw a small,
+subsampled preview texture that is uploaded immediately.
+"""
+
+import ctypes
+import math
+import time
+
+import numpy
+from OpenGL import GL
+
+from schmereo.trace import tracer
+
+PREVIEW_SIZE = 512  # pixels, longest side
+CHUNK_BYTES = 4 * 1024 ** 2
+
+
+def _set_texture_parameters():
+    GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_MAG_FILTER, GL.GL_LINEAR)
+    GL.glTexParameteri(
+        GL.GL_TEXTURE_2D, GL.GL_TEXTURE_MIN_FILTER, GL.GL_LINEAR_MIPMAP_LINEAR
+    )
+    GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_WRAP_S, GL.GL_CLAMP_TO_EDGE)
+    GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_WRAP_T, GL.GL_CLAMP_TO_EDGE)
+
+
+class TextureUpload(object):
+    def __init__(self, texture: int, width: int, height: int, pixels: numpy.ndarray):
+        """Call with an OpenGL context current"""
+        self.texture = texture
+        self.width = width
+        self.height = height
+        self.pixels = pixels.reshape(height, width * 4)
+        self.next_row = 0
+        self.mipmaps_done = False
+        self.rows_per_chunk = max(1, CHUNK_BYTES // (width * 4))
+        # Statistics, in milliseconds
+        self.last_step_ms = 0.0
+        self.max_step_ms = 0.0
+        self.total_ms = 0.0
+        self.bytes_uploaded = 0
+        #
+        levels = 1 + int(math.log2(max(width, height)))
+        GL.glBindTexture(GL.GL_TEXTURE_2D, self.texture)
+        GL.glTexStorage2D(GL.GL_TEXTURE_2D, levels, GL.GL_RGBA8, width, height)
+        _set_texture_parameters()
+        self.preview_texture = self._create_preview()
+        self.pbo = GL.glGenBuffers(1)
+
+    def _create_preview(self) -> int:
+        step = max(1, int(math.ceil(max(self.width, self.height) / PREVIEW_SIZE)))
+        preview = self.pixels.reshape(self.height, self.width, 4)[::step, ::step]
+        preview = numpy.ascontiguousarray(preview)
+        texture = GL.glGenTextures(1)
+        GL.glBindTexture(GL.GL_TEXTURE_2D, texture)
+        GL.glPixelStorei(GL.GL_UNPACK_ALIGNMENT, 1)
+        GL.glTexImage2D(
+            GL.GL_TEXTURE_2D,
+            0,
+            GL.GL_RGBA,
+            preview.shape[1],
+            preview.shape[0],
+            0,
+            GL.GL_RGBA,
+            GL.GL_UNSIGNED_BYTE,
+            preview,
+        )
+        _set_texture_parameters()
+        GL.glGenerateMipmap(GL.GL_TEXTURE_2D)
+        return texture
+
+    @property
+    def gpu_bytes(self) -> int:
+        """Estimated video memory: the texture with mipmaps, the preview and the PBO"""
+        total = self.width * self.height * 4 * 4 // 3
+        step = max(1, int(math.ceil(max(self.width, self.height) / PREVIEW_SIZE)))
+        total += (self.width // step) * (self.height // step) * 4 * 4 // 3
+        if self.pbo is not None:
+            total += self.rows_per_chunk * self.width * 4
+        return total
+
+    @property
+    def done(self) -> bool:
+        return self.mipmaps_done
+
+    def delete(self) -> None:
+        """Free the staging resources; the texture itself is not ours"""
+        if self.preview_texture is not None:
+            GL.glDeleteTextures([self.preview_texture])
+            self.preview_texture = None
+        if self.pbo is not None:
+            GL.glDeleteBuffers(1, [self.pbo])
+            self.pbo = None
+        self.pixels = None
+
+    def step(self, budget_ms=None) -> bool:
+        """
+        Upload rows until budget_ms milliseconds have passed, or everything
+        if budget_ms is None. Returns True once the texture is complete.
+        """
+        if self.done:
+            return True
+        start = time.perf_counter()
+        GL.glBindTexture(GL.GL_TEXTURE_2D, self.texture)
+        GL.glBindBuffer(GL.GL_PIXEL_UNPACK_BUFFER, self.pbo)
+        GL.glPixelStorei(GL.GL_UNPACK_ALIGNMENT, 1)
+        while self.next_row < self.height:
+            self._upload_chunk()
+            elapsed = (time.perf_counter() - start) * 1000.0
+            if budget_ms is not None and elapsed >= budget_ms:
+                break
+        GL.glBindBuffer(GL.GL_PIXEL_UNPACK_BUFFER, 0)
+        if self.next_row >= self.height:
+            elapsed = (time.perf_counter() - start) * 1000.0
+            # Mipmap generation is one call, so give it a frame of its own
+            if budget_ms is None or elapsed < 0.5 * budget_ms:
+                with tracer.span("generate mipmaps"):
+                    GL.glGenerateMipmap(GL.GL_TEXTURE_2D)
+                    GL.glFlush()  # make the texture visible to the other views
+                self.mipmaps_done = True
+        self.last_step_ms = (time.perf_counter() - start) * 1000.0
+        self.max_step_ms = max(self.max_step_ms, self.last_step_ms)
+        self.total_ms += self.last_step_ms
+        return self.done
+
+    def _upload_chunk(self) -> None:
+        row0 = self.next_row
+        row1 = min(self.height, row0 + self.rows_per_chunk)
+        rows = self.pixels[row0:row1]
+        nbytes = rows.shape[0] * rows.shape[1]
+        # Orphan the previous buffer, so we never wait for the GPU to finish with it
+        GL.glBufferData(GL.GL_PIXEL_UNPACK_BUFFER, nbytes, None, GL.GL_STREAM_DRAW)
+        address = GL.glMapBufferRange(
+            GL.GL_PIXEL_UNPACK_BUFFER,
+            0,
+            nbytes,
+            GL.GL_MAP_WRITE_BIT | GL.GL_MAP_INVALIDATE_BUFFER_BIT,
+        )
+        mapped = numpy.frombuffer(
+            (ctypes.c_ubyte * nbytes).from_address(address), dtype=numpy.ubyte
+        ).reshape(rows.shape)
+        mapped[...] = rows  # also handles non-contiguous source rows
+        GL.glUnmapBuffer(GL.GL_PIXEL_UNPACK_BUFFER)
+        GL.glTexSubImage2D(
+            GL.GL_TEXTURE_2D,
+            0,
+            0,
+            row0,
+            self.width,
+            row1 - row0,
+            GL.GL_RGBA,
+            GL.GL_UNSIGNED_BYTE,
+            ctypes.c_void_p(0),  # offset into the bound PBO
+        )
+        self.next_row = row1
+        self.bytes_uploaded += nbytes
@@ -0,0 +1,11 @@
+#version 460
+
+uniform sampler2D frame;
+
+in noperspective vec2 texCoord;
+out vec4 frag_color;
+
+void main()
+{
+    frag_color = texture(frame, texCoord);
+}
@@ -0,0 +1,17 @@
+#version 460
+
+// Full-window quad, for drawing a reduced-resolution frame at full size
+
+const vec4 SCREEN_QUAD[4] = vec4[4](
+    vec4( 1, -1, 0.5, 1),  // lower right
+    vec4( 1,  1, 0.5, 1),  // upper right
+    vec4(-1, -1, 0.5, 1),  // lower left
+    vec4(-1,  1, 0.5, 1)   // upper left
+);
+
+out noperspective vec2 texCoord;
+
+void main() {
+    gl_Position = SCREEN_QUAD[gl_VertexID];
+    texCoord = 0.5 * SCREEN_QUAD[gl_VertexID].xy + vec2(0.5);
+}
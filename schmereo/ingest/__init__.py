@@ -0,0 +1,13 @@
+"""
+Unattended ingest of stereocard scans: `schmereo ingest -o OUTPUT SCANS...`
+splits each scan into its eyes, places markers by image correlation,
+aligns, measures disparity (and with --stereo-window sets the stereo
+window from it), crops and exports, writing a project file per card that can be
+revisited in the GUI. See schmereo.ingest.pipeline. With --watch it keeps
+running and ingests scans as they are dropped into the scan folders; see
+schmereo.ingest.watch.
+"""
+
+from schmereo.ingest.manifest import Manifest
+from schmereo.ingest.pipeline import main, run_ingest
+from schmereo.ingest.stages import STAGES, IngestError
@@ -0,0 +1,110 @@
+"""
+Durable queue of scans for the watched-folder ingest, in an SQLite file in
+the output folder.
+
+Each scan is a job that moves from queued to running to done or failed.
+Every change is committed before it is acted on, so after a crash or a
+restart, jobs that were running go back to the queue and nothing that was
+found is forgotten. Which stages of a card are already done is the
+manifest's business; a restarted job picks up where it stopped.
+"""
+
+import os
+import sqlite3
+import time
+from typing import List, Optional
+
+QUEUE_FILE_NAME = "ingest_queue.sqlite"
+STATES = ("queued", "running", "done", "failed")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    scan TEXT PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    enqueued REAL NOT NULL,
+    started REAL,
+    finished REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_by_state ON jobs (state, enqueued);
+"""
+
+
+class JobQueue(object):
+    def __init__(self, file_name: str):
+        self.file_name = file_name
+        self._db = sqlite3.connect(file_name, isolation_level=None)  # autocommit
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self._db.close()
+
+    def recover(self, retry_failed: bool = False) -> int:
+        """Requeue jobs that were running when the last run stopped; returns how many"""
+        states = ("running", "failed") if retry_failed else ("running",)
+        marks = ", ".join("?" * len(states))
+        cursor = self._db.execute(
+            f"UPDATE jobs SET state = 'queued', started = NULL WHERE state IN ({marks})", states
+        )
+        return cursor.rowcount
+
+    def enqueue(self, scan: str) -> Optional[str]:
+        """
+        Queue a scan, unless it is already known with the same size and
+        modification time. Returns the card name of a newly queued job.
+        """
+        stat = os.stat(scan)
+        row = self._db.execute(
+            "SELECT name, mtime_ns, size, state FROM jobs WHERE scan = ?", (scan,)
+        ).fetchone()
+        if row is not None:
+            name, mtime_ns, size, state = row
+            if (mtime_ns, size) == (stat.st_mtime_ns, stat.st_size) or state == "running":
+                return None
+            self._db.execute(
+                "UPDATE jobs SET mtime_ns = ?, size = ?, state = 'queued', enqueued = ?,"
+                " started = NULL, finished = NULL WHERE scan = ?",
+                (stat.st_mtime_ns, stat.st_size, time.time(), scan),
+            )
+            return name
+        name = self._unique_name(os.path.splitext(os.path.basename(scan))[0])
+        self._db.execute(
+            "INSERT INTO jobs (scan, name, mtime_ns, size, state, enqueued)"
+            " VALUES (?, ?, ?, ?, 'queued', ?)",
+            (scan, name, stat.st_mtime_ns, stat.st_size, time.time()),
+        )
+        return name
+
+    def _unique_name(self, base: str) -> str:
+        name, number = base, 1
+        while self._db.execute("SELECT 1 FROM jobs WHERE name = ?", (name,)).fetchone():
+            number += 1
+            name = f"{base}-{number}"
+        return name
+
+    def claim(self, count: int) -> List[tuple]:
+        """Up to count oldest queued jobs, as (scan, name), now marked running"""
+        rows = self._db.execute(
+            "SELECT scan, name FROM jobs WHERE state = 'queued' ORDER BY enqueued LIMIT ?",
+            (count,),
+        ).fetchall()
+        now = time.time()
+        self._db.executemany(
+            "UPDATE jobs SET state = 'running', started = ? WHERE scan = ?",
+            [(now, scan) for scan, _ in rows],
+        )
+        return rows
+
+    def finish(self, name: str, state: str) -> None:
+        self._db.execute(
+            "UPDATE jobs SET state = ?, finished = ? WHERE name = ?", (state, time.time(), name)
+        )
+
+    def depth(self) -> dict:
+        """Number of jobs in each state"""
+        counts = dict.fromkeys(STATES, 0)
+        counts.update(self._db.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state"))
+        return counts
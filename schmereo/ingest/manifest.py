@@ -0,0 +1,114 @@
+"""
+The ingest manifest records, per card and per stage, whether the stage is
+done or failed, its result, how long it took and how often it was tried.
+A rerun reads it back and only does what is left: stages that are done
+are skipped, unless the scan changed or a stage's output files are gone,
+and failed stages are retried only on request.
+"""
+
+import json
+import os
+import time
+from typing import Optional
+
+from schmereo.core.atomic_file import atomic_write
+from schmereo.ingest.stages import STAGES
+
+MANIFEST_FILE_NAME = "ingest_manifest.json"
+VERSION = 1
+
+
+def _scan_identity(file_name: str) -> dict:
+    stat = os.stat(file_name)
+    return {"scan": file_name, "mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+
+class Manifest(object):
+    def __init__(self, file_name: str):
+        self.file_name = file_name
+        self.cards = {}  # card name -> {"scan", "mtime_ns", "size", "stages": {...}}
+        if os.path.exists(file_name):
+            with open(file_name) as fh:
+                data = json.load(fh)
+            if data.get("version") == VERSION:
+                self.cards = data["cards"]
+
+    def add_card(self, name: str, scan: str) -> None:
+        """Track a card, forgetting earlier work if its scan changed"""
+        identity = _scan_identity(scan)
+        entry = self.cards.get(name)
+        if entry is None or any(entry.get(k) != v for k, v in identity.items()):
+            self.cards[name] = {**identity, "stages": {}}
+
+    def next_stage(self, name: str, retry_failed: bool = False) -> Optional[str]:
+        """
+        The first stage of a card that still needs to run, or None when the
+        card is finished, or stuck on a failure that is not to be retried.
+        """
+        stages = self.cards[name]["stages"]
+        for stage in STAGES:
+            record = stages.get(stage)
+            if record is None:
+                return stage
+            if record["status"] == "failed":
+                return stage if retry_failed else None
+            outputs = record["result"].get("outputs", [])
+            if not all(os.path.exists(f) for f in outputs):
+                return stage
+        return None
+
+    def record(
+        self,
+        name: str,
+        stage: str,
+        seconds: Optional[float],
+        result: Optional[dict] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        """Store the outcome of a stage; later stages are stale and dropped"""
+        stages = self.cards[name]["stages"]
+        attempts = stages.get(stage, {}).get("attempts", 0) + 1
+        for later in STAGES[STAGES.index(stage) + 1 :]:
+            stages.pop(later, None)
+        stages[stage] = {
+            "status": "failed" if error is not None else "done",
+            "seconds": seconds,
+            "result": result or {},
+            "error": error,
+            "attempts": attempts,
+            "finished": time.time(),
+        }
+
+    def status(self, name: str) -> str:
+        """One of done, failed or pending"""
+        stages = self.cards[name]["stages"]
+        if any(r["status"] == "failed" for r in stages.values()):
+            return "failed"
+        if all(stages.get(s, {}).get("status") == "done" for s in STAGES):
+            return "done"
+        return "pending"
+
+    def flagged(self) -> dict:
+        """Card name -> quality flags, for aligned cards that have any"""
+        result = {}
+        for name, entry in self.cards.items():
+            record = entry["stages"].get("align", {})
+            flags = record.get("result", {}).get("flags")
+            if record.get("status") == "done" and flags:
+                result[name] = flags
+        return result
+
+    def stage_seconds(self) -> dict:
+        """Total seconds spent in each stage, over the successful runs"""
+        totals = dict.fromkeys(STAGES, 0.0)
+        for entry in self.cards.values():
+            for stage, record in entry["stages"].items():
+                if record["status"] == "done" and record["seconds"] is not None:
+                    totals[stage] += record["seconds"]
+        return totals
+
+    def to_dict(self) -> dict:
+        return {"version": VERSION, "cards": self.cards}
+
+    def save(self) -> None:
+        atomic_write(self.file_name, lambda fh: json.dump(self.to_dict(), fh, indent=1))
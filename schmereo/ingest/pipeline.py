@@ -0,0 +1,344 @@
+"""
+Runs the ingest stages over many cards in a pool of worker processes.
+
+Each card moves through the stages one at a time; when one of its stages
+finishes, its next stage is queued ahead of cards that have not started,
+so finished cards appear early and intermediate files do not pile up.
+What is in flight at once is bounded twice: by a number of stages, and by
+the estimated memory of the scans they work on. The manifest is saved
+after every stage, so an interrupted run loses at most the stages that
+were in flight.
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import os
+import signal
+import sys
+from typing import List
+
+from schmereo.core import FilterMode
+from schmereo.ingest.manifest import MANIFEST_FILE_NAME, Manifest
+from schmereo.ingest.stages import BYTES_PER_SCAN_PIXEL, STAGES, run_stage
+
+SCAN_EXTENSIONS = (".jpg", ".jpeg", ".png", ".tif", ".tiff", ".jps", ".pns", ".mpo")
+
+
+def find_scans(paths: List[str]) -> List[str]:
+    """Image files named on the command line, or directly inside named directories"""
+    scans = []
+    for path in paths:
+        if os.path.isdir(path):
+            for entry in sorted(os.listdir(path)):
+                file_name = os.path.join(path, entry)
+                if os.path.isfile(file_name) and entry.lower().endswith(SCAN_EXTENSIONS):
+                    scans.append(os.path.abspath(file_name))
+        else:
+            scans.append(os.path.abspath(path))
+    return scans
+
+
+def make_cards(scans: List[str], output: str, options: dict) -> List[dict]:
+    """One card per scan, named after the scan, with clashing names numbered"""
+    cards = []
+    names = set()
+    for scan in scans:
+        base = name = os.path.splitext(os.path.basename(scan))[0]
+        number = 1
+        while name in names:
+            number += 1
+            name = f"{base}-{number}"
+        names.add(name)
+        cards.append({"name": name, "scan": scan, "output": os.path.abspath(output), **options})
+    return cards
+
+
+def scan_bytes(scan: str) -> int:
+    """Estimated peak memory of a stage working on a scan"""
+    from PIL import Image  # deferred; PIL is slow to import
+
+    with Image.open(scan) as image:  # only reads the header
+        width, height = image.size
+    return width * height * BYTES_PER_SCAN_PIXEL
+
+
+class InlineExecutor(object):
+    """Runs each task as it is submitted, for debugging without worker processes"""
+
+    def submit(self, fn, *args) -> concurrent.futures.Future:
+        future = concurrent.futures.Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as exc:
+            future.set_exception(exc)
+        return future
+
+    def shutdown(self, wait: bool = True, cancel_futures: bool = False) -> None:
+        pass
+
+
+class IngestScheduler(object):
+    """
+    Feeds the stages of added cards to an executor, one stage per card at a
+    time. What is in flight is bounded by max_in_flight stages, and by the
+    estimated memory_budget bytes of their scans; one stage always fits.
+    on_finished(name, status) is called when a card is done or has failed.
+    """
+
+    def __init__(
+        self,
+        manifest: Manifest,
+        executor,
+        max_in_flight: int,
+        memory_budget: int,
+        retry_failed: bool = False,
+        log=print,
+        on_finished=None,
+    ):
+        self.manifest = manifest
+        self.executor = executor
+        self.max_in_flight = max_in_flight
+        self.memory_budget = memory_budget
+        self.retry_failed = retry_failed
+        self.log = log
+        self.on_finished = on_finished
+        self.cards = {}
+        self.ready = collections.deque()  # card names
+        self.in_flight = {}  # future -> (card name, stage, cost)
+        self.in_flight_bytes = 0
+        self._costs = {}
+
+    @property
+    def busy(self) -> bool:
+        return bool(self.ready or self.in_flight)
+
+    def add(self, card: dict) -> None:
+        name = card["name"]
+        self.cards[name] = card
+        self.manifest.add_card(name, card["scan"])
+        if self.manifest.next_stage(name, self.retry_failed) is None:
+            self._finished(name)
+        else:
+            self.ready.append(name)
+
+    def step(self, timeout=None) -> None:
+        """Submit what fits, then handle the stages that finish within timeout seconds"""
+        self._admit()
+        if not self.in_flight:
+            return
+        done, _ = concurrent.futures.wait(
+            self.in_flight, timeout=timeout, return_when=concurrent.futures.FIRST_COMPLETED
+        )
+        for future in done:
+            name, stage, cost = self.in_flight.pop(future)
+            self.in_flight_bytes -= cost
+            try:
+                result, seconds = future.result()
+            except Exception as exc:
+                self.manifest.record(name, stage, None, error=f"{type(exc).__name__}: {exc}")
+                self.log(f"{name}: {stage} failed: {exc}")
+            else:
+                self.manifest.record(name, stage, seconds, result)
+                self.log(f"{name}: {stage} done in {seconds:.2f} s")
+                if result.get("flags"):
+                    self.log(f"{name}: flagged: {'; '.join(result['flags'])}")
+            self.manifest.save()
+            if self.manifest.status(name) == "pending":
+                self.ready.appendleft(name)  # finish started cards first
+            else:
+                self._finished(name)
+
+    def _admit(self) -> None:
+        while self.ready and len(self.in_flight) < self.max_in_flight:
+            name = self.ready[0]
+            if name not in self._costs:
+                try:
+                    self._costs[name] = scan_bytes(self.cards[name]["scan"])
+                except OSError as exc:  # not an image
+                    self.ready.popleft()
+                    error = f"{type(exc).__name__}: {exc}"
+                    self.manifest.record(name, STAGES[0], None, error=error)
+                    self.manifest.save()
+                    self.log(f"{name}: cannot read scan: {exc}")
+                    self._finished(name)
+                    continue
+            cost = self._costs[name]
+            if self.in_flight and self.in_flight_bytes + cost > self.memory_budget:
+                break
+            self.ready.popleft()
+            stage = self.manifest.next_stage(name, self.retry_failed)
+            future = self.executor.submit(run_stage, stage, self.cards[name])
+            self.in_flight[future] = (name, stage, cost)
+            self.in_flight_bytes += cost
+
+    def _finished(self, name: str) -> None:
+        self._costs.pop(name, None)
+        if self.on_finished is not None:
+            self.on_finished(name, self.manifest.status(name))
+
+
+def _ignore_interrupts() -> None:
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C is for the parent to handle
+
+
+def make_executor(workers: int):
+    if workers > 0:
+        return concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, initializer=_ignore_interrupts
+        )
+    return InlineExecutor()
+
+
+def run_ingest(
+    cards: List[dict],
+    manifest: Manifest,
+    workers: int,
+    max_in_flight: int,
+    memory_budget: int,
+    retry_failed: bool = False,
+    log=print,
+) -> bool:
+    """Run every remaining stage of cards; True if all cards are done"""
+    executor = make_executor(workers)
+    scheduler = IngestScheduler(
+        manifest, executor, max_in_flight, memory_budget, retry_failed, log
+    )
+    try:
+        for card in cards:
+            scheduler.add(card)
+        manifest.save()
+        log(f"{len(scheduler.ready)} of {len(cards)} cards to process")
+        while scheduler.busy:
+            scheduler.step()
+    finally:
+        executor.shutdown(wait=True)
+    counts = collections.Counter(manifest.status(c["name"]) for c in cards)
+    totals = manifest.stage_seconds()
+    log(", ".join(f"{counts[s]} {s}" for s in ("done", "failed", "pending")))
+    flagged = manifest.flagged()
+    if flagged:
+        log(f"{len(flagged)} flagged for review: {', '.join(sorted(flagged))}")
+    log("Stage seconds: " + ", ".join(f"{s} {totals[s]:.1f}" for s in STAGES))
+    return counts["done"] == len(cards)
+
+
+def _aspect(text: str) -> float:
+    """Aspect ratio from "3:2" or "1.5" """
+    try:
+        values = [float(v) for v in text.split(":")]
+        aspect = values[0] / values[1] if len(values) == 2 else values[0]
+    except (ValueError, IndexError, ZeroDivisionError):
+        aspect = 0
+    if not aspect > 0:
+        raise argparse.ArgumentTypeError(f"not an aspect ratio: {text}")
+    return aspect
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="schmereo ingest",
+        description="Split, align, crop and export stereocard scans, unattended. "
+        "Each card gets a project file that opens in schmereo, and a cross-eyed PNS "
+        f"image. Progress is kept in {MANIFEST_FILE_NAME} in the output folder; "
+        "rerun the same command to finish an interrupted ingest.",
+    )
+    parser.add_argument("scans", nargs="+", help="scan image files, or folders of them")
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="keep running, and ingest scans as they appear in the scan folders",
+    )
+    parser.add_argument(
+        "--settle",
+        type=float,
+        default=5.0,
+        help="with --watch, seconds a file must stay unchanged before it is queued (default: 5)",
+    )
+    parser.add_argument(
+        "--poll",
+        type=float,
+        default=2.0,
+        help="with --watch, seconds between looks at the scan folders (default: 2)",
+    )
+    parser.add_argument("-o", "--output", required=True, help="folder for all outputs")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="worker processes; 0 runs everything in this process (default: one per CPU)",
+    )
+    parser.add_argument(
+        "--max-in-flight",
+        type=int,
+        default=None,
+        help="most stages running or queued for the workers at once (default: workers)",
+    )
+    parser.add_argument(
+        "--memory-budget",
+        type=float,
+        default=2048,
+        help="estimated megabytes for the scans in flight (default: 2048)",
+    )
+    parser.add_argument(
+        "--retry-failed", action="store_true", help="retry stages that failed before"
+    )
+    parser.add_argument(
+        "--aspect", type=_aspect, default=None, help="crop to this width:height, e.g. 3:2"
+    )
+    parser.add_argument(
+        "--max-points", type=int, default=200, help="most markers per card (default: 200)"
+    )
+    parser.add_argument(
+        "--max-disparity",
+        type=float,
+        default=1.0,
+        help="flag cards whose RMS vertical disparity after alignment is larger, "
+        "in pixels (default: 1)",
+    )
+    parser.add_argument(
+        "--stereo-window",
+        action="store_true",
+        help="move the eyes so that the nearest content of each card is at the stereo window",
+    )
+    parser.add_argument(
+        "--filter",
+        choices=[m.name for m in FilterMode],
+        default=FilterMode.CUBIC.name,
+        help="export resampling filter (default: CUBIC)",
+    )
+    args = parser.parse_args(argv)
+    os.makedirs(args.output, exist_ok=True)
+    options = {
+        "aspect": args.aspect,
+        "max_points": args.max_points,
+        "max_disparity": args.max_disparity,
+        "stereo_window": args.stereo_window,
+        "filter": args.filter,
+    }
+    limits = {
+        "workers": args.workers,
+        "max_in_flight": max(1, args.max_in_flight or args.workers),
+        "memory_budget": int(args.memory_budget * 1024 ** 2),
+        "retry_failed": args.retry_failed,
+        "log": lambda text: print(text, file=sys.stderr),
+    }
+    if args.watch:
+        from schmereo.ingest.watch import run_watch
+
+        not_folders = [f for f in args.scans if not os.path.isdir(f)]
+        if not_folders:
+            parser.error(f"--watch needs folders, not {', '.join(not_folders)}")
+        run_watch(
+            args.scans,
+            args.output,
+            options,
+            settle_seconds=args.settle,
+            poll_seconds=args.poll,
+            **limits,
+        )
+        return 0
+    cards = make_cards(find_scans(args.scans), args.output, options)
+    manifest = Manifest(os.path.join(args.output, MANIFEST_FILE_NAME))
+    ok = run_ingest(cards, manifest, **limits)
+    return 0 if ok else 1
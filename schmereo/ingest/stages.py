@@ -0,0 +1,208 @@
+"""
+The stages of the ingest pipeline, in order: split the scan into eyes, find
+markers, align, measure disparity and place the stereo window, crop and
+export.
+
+Each stage is a top-level function, so that it can run in a worker process.
+It takes a card, a dict of plain data describing one scan and where its
+outputs go, and returns a small JSON-able result for the manifest. From the
+markers stage on, stages hand their state to each other through the card's
+project file, which is an ordinary schmereo project that opens in the GUI.
+"""
+
+import math
+import os
+import time
+
+import numpy
+
+from schmereo.core import (
+    CompositeMode,
+    FilterMode,
+    Project,
+    auto_crop,
+    alignment_metrics,
+    composite,
+    solve_alignment,
+)
+from schmereo.core.atomic_file import atomic_write
+from schmereo.core.color_match import histogram, shown_region
+from schmereo.core.correspondence import ImagePyramid, find_correspondences
+from schmereo.core.disparity import disparity_map, window_transforms
+from schmereo.core.metrics import converged
+from schmereo.core.resample import resample_eye
+from schmereo.core.stereo_file import HALVES, eye_parts, load_pixels
+
+STAGES = ("split", "markers", "align", "window", "crop", "export")
+MIN_MATCHES = 4
+# Rough peak memory of any stage, per pixel of the scan: decoded eyes,
+# grayscale pyramids and float resampling buffers
+BYTES_PER_SCAN_PIXEL = 16
+
+
+class IngestError(Exception):
+    """A card that cannot be processed, e.g. one with too few matches"""
+
+
+def card_files(card: dict) -> dict:
+    """Output file names of a card"""
+    base = os.path.join(card["output"], card["name"])
+    return {
+        "left": f"{base}_L.jpg",
+        "right": f"{base}_R.jpg",
+        "project": f"{base}.json",
+        "export": f"{base}.pns",
+    }
+
+
+def _save_image(image, file_name: str, file_format: str, **kwargs) -> None:
+    atomic_write(file_name, lambda fh: image.save(fh, file_format, **kwargs), mode="wb")
+
+
+def split(card: dict) -> dict:
+    """
+    The eyes of the scan: its halves, as split_stereo.py makes them, or the
+    frames of a multi-picture file
+    """
+    from PIL import Image
+
+    files = card_files(card)
+    parts = eye_parts(card["scan"]) or [{"half": h} for h in HALVES]
+    for part, file_name in zip(parts, (files["left"], files["right"])):
+        eye = Image.fromarray(load_pixels(card["scan"], **part))
+        _save_image(eye, file_name, "JPEG", quality=90)
+    width, height = eye.size
+    return {"eye_width": width, "eye_height": height, "outputs": [files["left"], files["right"]]}
+
+
+def markers(card: dict) -> dict:
+    """Homologous points by image correlation; creates the project file"""
+    files = card_files(card)
+    left_points, right_points, scores = find_correspondences(
+        load_pixels(files["left"]), load_pixels(files["right"]), max_points=card["max_points"]
+    )
+    if len(scores) < MIN_MATCHES:
+        raise IngestError(f"Only {len(scores)} matches between the eyes; need {MIN_MATCHES}")
+    project = Project()
+    project.left.image.load_image(files["left"])
+    project.right.image.load_image(files["right"])
+    project.left.markers.add_markers(left_points.astype(numpy.float32))
+    project.right.markers.add_markers(right_points.astype(numpy.float32))
+    project.save(files["project"])
+    return {
+        "matches": len(scores),
+        "mean_score": float(scores.mean()),
+        "outputs": [files["project"]],
+    }
+
+
+def quality_flags(metrics: dict, max_disparity: float) -> list:
+    """Reasons to have a person look at an aligned card; empty if it looks fine"""
+    flags = []
+    if metrics["rms_vertical_pixels"] > max_disparity:
+        flags.append(f"vertical disparity {metrics['rms_vertical_pixels']:.2f} px RMS")
+    if not converged(metrics):
+        flags.append(f"residual rotation {metrics['residual_rotation_degrees']:.3f} degrees")
+    return flags
+
+
+def align(card: dict) -> dict:
+    """Also measures the alignment, and flags cards that need a closer look"""
+    files = card_files(card)
+    project = Project.load(files["project"])
+    solution = solve_alignment(project.left, project.right)
+    project.left.image.transform = solution.left_transform
+    project.right.image.transform = solution.right_transform
+    project.save(files["project"])
+    metrics = alignment_metrics(project.left, project.right)
+    return {
+        "residual_degrees": math.degrees(solution.residual_rotation),
+        "metrics": metrics,
+        "flags": quality_flags(metrics, card["max_disparity"]),
+        "outputs": [files["project"]],
+    }
+
+
+def window(card: dict) -> dict:
+    """
+    Dense disparity where the eyes overlap; with the stereo_window option,
+    also moves the eyes so that the nearest content is at the window
+    """
+    files = card_files(card)
+    project = Project.load(files["project"])
+    images = [e.image for e in project.eyes()]
+    box = auto_crop(images, None)
+    if box is None:
+        raise IngestError("The eye images do not overlap")
+    pyramids = [ImagePyramid(load_pixels(i.file_name, **i.part())) for i in images]
+    disparity = disparity_map(
+        *pyramids, *(i.transform for i in images), [i.size() for i in images], box, workers=1
+    )
+    result = {"disparity": disparity.to_dict(), "window_pixels": None}
+    near = disparity.near()
+    if card["stereo_window"] and near is not None:
+        transforms = window_transforms(*(i.transform for i in images), near)
+        for image, transform in zip(images, transforms):
+            image.transform = transform
+        result["window_pixels"] = result["disparity"]["near_pixels"]
+    project.save(files["project"])
+    result["outputs"] = [files["project"]]
+    return result
+
+
+def crop(card: dict) -> dict:
+    files = card_files(card)
+    project = Project.load(files["project"])
+    box = auto_crop([e.image for e in project.eyes()], card["aspect"])
+    if box is None:
+        raise IngestError("The eye images do not overlap")
+    clip_box = project.clip_box
+    clip_box.left, clip_box.top, clip_box.right, clip_box.bottom = box
+    project.save(files["project"])  # also recenters the clip box
+    width, height = clip_box.size
+    return {"width": int(width), "height": int(height), "outputs": [files["project"]]}
+
+
+def export(card: dict) -> dict:
+    """Cross-eyed side by side PNS image of the cropped, aligned pair, right eye first"""
+    from PIL import Image
+
+    files = card_files(card)
+    project = Project.load(files["project"])
+    project.clip_box.recenter()
+    out_size = tuple(int(v) for v in project.clip_box.size)
+    pixels = [
+        load_pixels(e.image.file_name, mode="RGBA", **e.image.part()) for e in project.eyes()
+    ]
+    luts = [None, None]
+    if project.color_match.eye is not None:
+        cb = project.clip_box
+        box = (cb.left, cb.top, cb.right, cb.bottom)
+        regions = [shown_region(e.image_size(), e.image.transform, box) for e in project.eyes()]
+        luts = project.color_match.luts([histogram(p, region=r) for p, r in zip(pixels, regions)])
+    eyes = [
+        resample_eye(
+            p, e.image.transform, out_size, mode=FilterMode[card["filter"]], lut=lut, workers=1
+        )
+        for p, e, lut in zip(pixels, project.eyes(), luts)
+    ]
+    combined = composite(*eyes, CompositeMode.CROSS_EYE)  # the PNS convention
+    _save_image(Image.fromarray(combined, "RGBA"), files["export"], "PNG")
+    return {"width": out_size[0], "height": out_size[1], "outputs": [files["export"]]}
+
+
+STAGE_FUNCTIONS = {
+    "split": split,
+    "markers": markers,
+    "align": align,
+    "window": window,
+    "crop": crop,
+    "export": export,
+}
+
+
+def run_stage(stage: str, card: dict):
+    """Worker entry point: (result, seconds)"""
+    start = time.perf_counter()
+    result = STAGE_FUNCTIONS[stage](card)
+    return result, time.perf_counter() - start
@@ -0,0 +1,163 @@
+"""
+Watched-folder ingest: a long-running loop that picks up scans as they are
+dropped into input folders and runs the same stages as a batch ingest.
+
+Scanners and file shares write files gradually, so a file is only queued
+once its size and modification time have not changed for a settle time.
+Queued scans wait in the durable JobQueue; only as many are taken from it
+as the workers can start on, which is the backpressure: a burst of scans
+grows the queue on disk, not the memory of this process. Throughput and
+queue depth go to a status file in the output folder, rewritten every few
+seconds, for monitoring.
+"""
+
+import collections
+import json
+import os
+import time
+
+from schmereo.core.atomic_file import atomic_write
+from schmereo.ingest.job_queue import QUEUE_FILE_NAME, JobQueue
+from schmereo.ingest.manifest import MANIFEST_FILE_NAME, Manifest
+from schmereo.ingest.pipeline import SCAN_EXTENSIONS, IngestScheduler, make_executor
+
+STATUS_FILE_NAME = "ingest_status.json"
+THROUGHPUT_WINDOW = 600.0  # seconds
+
+
+class FolderWatcher(object):
+    """Polls folders for scans whose size has settled"""
+
+    def __init__(self, folders, settle_seconds: float = 5.0):
+        self.folders = [os.path.abspath(f) for f in folders]
+        self.settle_seconds = settle_seconds
+        self._seen = {}  # file name -> ((size, mtime_ns), time it was first seen so)
+
+    def poll(self, now=None) -> list:
+        """Scans that have not changed for settle_seconds, in name order"""
+        if now is None:
+            now = time.monotonic()
+        stable = []
+        present = set()
+        for folder in self.folders:
+            try:
+                entries = sorted(os.scandir(folder), key=lambda e: e.name)
+            except OSError:  # e.g. a share that is briefly unavailable
+                continue
+            for entry in entries:
+                if entry.name.startswith(".") or not entry.name.lower().endswith(SCAN_EXTENSIONS):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:  # deleted meanwhile
+                    continue
+                if not entry.is_file():
+                    continue
+                present.add(entry.path)
+                signature = (stat.st_size, stat.st_mtime_ns)
+                previous = self._seen.get(entry.path)
+                if previous is None or previous[0] != signature:
+                    self._seen[entry.path] = (signature, now)
+                elif now - previous[1] >= self.settle_seconds:
+                    stable.append(entry.path)
+        for file_name in set(self._seen) - present:
+            del self._seen[file_name]
+        return stable
+
+
+class WatchStatus(object):
+    """Throughput and queue depth, for the status file"""
+
+    def __init__(self, file_name: str, workers: int):
+        self.file_name = file_name
+        self.workers = workers
+        self.started = time.time()
+        self.finished = collections.deque()  # (time, status) of recent cards
+        self.counts = collections.Counter()  # cards finished since start, by status
+
+    def card_finished(self, status: str) -> None:
+        now = time.time()
+        self.counts[status] += 1
+        self.finished.append((now, status))
+        while self.finished and self.finished[0][0] < now - THROUGHPUT_WINDOW:
+            self.finished.popleft()
+
+    def to_dict(self, queue: JobQueue, scheduler: IngestScheduler) -> dict:
+        now = time.time()
+        window = min(THROUGHPUT_WINDOW, max(now - self.started, 1e-3))
+        recent = [t for t, status in self.finished if t >= now - window and status == "done"]
+        return {
+            "time": now,
+            "uptime_seconds": now - self.started,
+            "workers": self.workers,
+            "queue": queue.depth(),
+            "stages_in_flight": len(scheduler.in_flight),
+            "in_flight_bytes": scheduler.in_flight_bytes,
+            "cards_since_start": dict(self.counts),
+            "cards_per_minute": 60.0 * len(recent) / window,
+            "cards_flagged": len(scheduler.manifest.flagged()),
+            "stage_seconds": scheduler.manifest.stage_seconds(),
+        }
+
+    def write(self, queue: JobQueue, scheduler: IngestScheduler) -> None:
+        data = self.to_dict(queue, scheduler)
+        atomic_write(self.file_name, lambda fh: json.dump(data, fh, indent=1))
+
+
+def run_watch(
+    folders,
+    output: str,
+    options: dict,
+    workers: int,
+    max_in_flight: int,
+    memory_budget: int,
+    retry_failed: bool = False,
+    settle_seconds: float = 5.0,
+    poll_seconds: float = 2.0,
+    log=print,
+) -> None:
+    """Ingest scans from folders as they arrive, until interrupted"""
+    output = os.path.abspath(output)
+    queue = JobQueue(os.path.join(output, QUEUE_FILE_NAME))
+    recovered = queue.recover(retry_failed)
+    if recovered:
+        log(f"Requeued {recovered} unfinished scans")
+    manifest = Manifest(os.path.join(output, MANIFEST_FILE_NAME))
+    status = WatchStatus(os.path.join(output, STATUS_FILE_NAME), workers)
+    watcher = FolderWatcher(folders, settle_seconds)
+
+    def on_finished(name, card_status):
+        queue.finish(name, "done" if card_status == "done" else "failed")
+        status.card_finished(card_status)
+
+    executor = make_executor(workers)
+    scheduler = IngestScheduler(
+        manifest, executor, max_in_flight, memory_budget, retry_failed, log, on_finished
+    )
+    log(f"Watching {', '.join(watcher.folders)}; stop with Ctrl+C")
+    next_poll = 0.0
+    try:
+        while True:
+            now = time.monotonic()
+            if now >= next_poll:
+                next_poll = now + poll_seconds
+                for scan in watcher.poll(now):
+                    name = queue.enqueue(scan)
+                    if name is not None:
+                        log(f"{name}: queued {scan}")
+                status.write(queue, scheduler)
+            # Backpressure: keep only enough cards in memory to keep the workers busy
+            room = max_in_flight - len(scheduler.ready) - len(scheduler.in_flight)
+            for scan, name in queue.claim(max(room, 0)):
+                scheduler.add({"name": name, "scan": scan, "output": output, **options})
+            if scheduler.busy:
+                scheduler.step(timeout=max(0.0, next_poll - time.monotonic()))
+            else:
+                time.sleep(max(0.0, next_poll - time.monotonic()))
+    except KeyboardInterrupt:
+        log("Stopping; unfinished scans resume on the next start")
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        status.write(queue, scheduler)
+        queue.close()
+
@@ -1,46 +1,57 @@
 import inspect
-import json
 import os
+from functools import partial
 
-import pkg_resources
+from typing import Optional
 
-from PIL import Image
-from PIL.ImageQt import ImageQt
-from PyQt5 import QtCore, QtGui, QtWidgets, uic
+from PyQt5 import QtCore, QtGui, QtWidgets
 from PyQt5.QtGui import QKeySequence, QCloseEvent
 from PyQt5.QtCore import Qt
 from PyQt5.QtWidgets import QUndoStack, QMessageBox
 
+from schmereo.alignment_panel import AlignmentDock, AlignmentMonitor, AlignmentStatus
 from schmereo.camera import Camera
 from schmereo.clip_box import ClipBox
-from schmereo.command import AlignNowCommand, ClearMarkersCommand
+from schmereo.color_match import ColorMatchManager
+from schmereo.command import AdjustClipBoxCommand, AlignNowCommand, ClearMarkersCommand
 from schmereo.coord_sys import FractionalImagePos, ImagePixelCoordinate, CanvasPos
+from schmereo.core.auto_crop import auto_crop
+from schmereo.core.project import Project
+from schmereo.core.resample import FilterMode
+from schmereo.core.stereo_file import eye_parts
+from schmereo.disparity_panel import DisparityDock
 from schmereo.image.aligner import Aligner
+from schmereo.image.dynamic_resolution import DynamicResolution
 from schmereo.image.image_saver import ImageSaver
+from schmereo.image.live_aligner import LiveAligner
+from schmereo.marker import MarkerSet
 from schmereo.marker.marker_manager import MarkerManager
+from schmereo.memory_ledger import memory_ledger
+from schmereo.memory_panel import MemoryDock, undo_stack_bytes
+from schmereo.output_preview import OutputPreviewDock
+from schmereo.core.project_file import (
+    autosave_file_name,
+    read_project_file,
+    remove_project_file,
+)
+from schmereo.project_writer import ProjectWriter
 from schmereo.recent_file import RecentFileList
+from schmereo.render_scheduler import RenderScheduler
+from schmereo import resources
+from schmereo.startup_profile import profile
+from schmereo.trace import tracer
 from schmereo.version import __version__
 
 
 def _set_action_icon(action, package, image, on_image=None):
-    fh = pkg_resources.resource_stream(package, image)
-    img = ImageQt(Image.open(fh).convert("RGBA"))
-    icon = QtGui.QIcon(QtGui.QPixmap.fromImage(img))
-    if on_image is not None:
-        fh2 = pkg_resources.resource_stream(package, on_image)
-        img2 = ImageQt(Image.open(fh2).convert("RGBA"))
-        pm = QtGui.QPixmap.fromImage(img2)
-        icon.addPixmap(pm, state=QtGui.QIcon.On)
-    action.setIcon(icon)
+    action.setIcon(resources.icon(package, image, on_image))
 
 
 class SchmereoMainWindow(QtWidgets.QMainWindow):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.ui = uic.loadUi(
-            uifile=pkg_resources.resource_stream("schmereo", "schmereo.ui"),
-            baseinstance=self,
-        )
+        with profile.span("load user interface"):
+            self.ui = resources.load_ui("schmereo", "schmereo.ui", baseinstance=self)
         # Platform-specific semantic keyboard shortcuts cannot be set in Qt Designer
         self.ui.actionNew.setShortcut(QKeySequence.New)
         self.ui.actionOpen.setShortcut(QKeySequence.Open)
@@ -109,11 +120,167 @@ class SchmereoMainWindow(QtWidgets.QMainWindow):
         self.ui.menuEdit.insertSeparator(self.ui.actionAlign_Now)
         self.clip_box = ClipBox(parent=self, camera=self.shared_camera, images=[i.image for i in self.eye_widgets()])
         self.ui.actionResolve_Clip_Box.triggered.connect(self.recenter_clip_box)
+        self.render_scheduler = RenderScheduler(self)
         for w in self.eye_widgets():
             w.undo_stack = self.undo_stack
             w.clip_box = self.clip_box
-            self.clip_box.changed.connect(w.update)
+            w.render_scheduler = self.render_scheduler
+            self.render_scheduler.add_widget(w)
+            name = w.objectName()
+            memory_ledger.register(w.markers, "markers", MarkerSet.memory_bytes, name=name)
+            memory_ledger.register(
+                w.dynamic_resolution, "render targets", DynamicResolution.memory_bytes, name=name
+            )
+        memory_ledger.register(
+            self.undo_stack, "undo history", undo_stack_bytes, name="undo stack"
+        )
+        self.clip_box.changed.connect(
+            partial(self.render_scheduler.request_all, "clip box")
+        )
+        self.output_preview_dock = OutputPreviewDock(
+            images=[w.image for w in self.eye_widgets()], clip_box=self.clip_box, parent=self
+        )
+        self.addDockWidget(Qt.BottomDockWidgetArea, self.output_preview_dock)
+        self.output_preview_dock.hide()
+        self.render_scheduler.add_observer(self.output_preview_dock.preview)
+        self.ui.menuView.addAction(self.output_preview_dock.toggleViewAction())
+        self.memory_dock = MemoryDock(parent=self)
+        self.addDockWidget(Qt.RightDockWidgetArea, self.memory_dock)
+        self.memory_dock.hide()
+        self.ui.menuView.addAction(self.memory_dock.toggleViewAction())
+        self.alignment_monitor = AlignmentMonitor(
+            eyes=[w.eye for w in self.eye_widgets()], parent=self
+        )
+        self.render_scheduler.add_observer(self.alignment_monitor)
+        self.alignment_dock = AlignmentDock(parent=self)
+        self.addDockWidget(Qt.RightDockWidgetArea, self.alignment_dock)
+        self.alignment_dock.hide()
+        self.ui.menuView.addAction(self.alignment_dock.toggleViewAction())
+        self.disparity_dock = DisparityDock(self, parent=self)
+        self.addDockWidget(Qt.RightDockWidgetArea, self.disparity_dock)
+        self.disparity_dock.hide()
+        self.ui.menuView.addAction(self.disparity_dock.toggleViewAction())
+        self.live_aligner = LiveAligner(self.eye_widgets(), parent=self)
+        self.render_scheduler.add_observer(self.live_aligner)
+        self.live_aligner.preview_changed.connect(self.ui.actionAccept_Live_Alignment.setEnabled)
+        self.ui.actionAccept_Live_Alignment.setEnabled(False)
+        self.alignment_status = AlignmentStatus()
+        self.statusBar().addPermanentWidget(self.alignment_status)
+        for view in (self.alignment_dock, self.alignment_status):
+            self.alignment_monitor.changed.connect(view.show_metrics)
+            view.show_metrics(self.alignment_monitor.metrics)
+        filter_group = QtWidgets.QActionGroup(self)
+        for mode, action in (
+            (FilterMode.NEAREST, self.ui.actionFilter_Nearest),
+            (FilterMode.LINEAR, self.ui.actionFilter_Linear),
+            (FilterMode.CUBIC, self.ui.actionFilter_Cubic),
+            (FilterMode.LANCZOS, self.ui.actionFilter_Lanczos),
+        ):
+            filter_group.addAction(action)
+            action.triggered.connect(partial(self.set_filter_mode, mode))
+        self.ui.actionDynamic_Resolution.setChecked(
+            self.ui.leftImageWidget.dynamic_resolution.enabled
+        )
+        self.ui.actionRecord_Trace.setChecked(tracer.enabled)  # e.g. from SCHMEREO_TRACE
+        # Keeps the frame statistics overlay current while nothing else repaints
+        self.frame_stats_timer = QtCore.QTimer(self)
+        self.frame_stats_timer.setInterval(500)
+        self.frame_stats_timer.timeout.connect(
+            partial(self.render_scheduler.request_all, "frame statistics", True)
+        )
+        self.color_match_manager = ColorMatchManager(self)
+        self.render_scheduler.add_observer(self.color_match_manager)
+        self.project = Project(
+            left=self.ui.leftImageWidget.eye,
+            right=self.ui.rightImageWidget.eye,
+            clip_box=self.clip_box,
+            camera=self.shared_camera,
+            color_match=self.color_match_manager.color_match,
+        )
         self.project_folder = None
+        #
+        self.project_writer = ProjectWriter(self)
+        self.project_writer.saved.connect(self.on_project_writer_saved)
+        self.project_writer.failed.connect(self.on_project_writer_failed)
+        self.autosave_interval = 60 * 1000  # milliseconds
+        self._autosave_index = None  # undo stack index at last autosave
+        self._save_indexes = {}  # file name -> undo stack index of its pending save
+        self.autosave_timer = QtCore.QTimer(self)
+        self.autosave_timer.timeout.connect(self.autosave)
+        self.autosave_timer.start(self.autosave_interval)
+
+    def autosave(self) -> None:
+        """Write unsaved changes to a recovery file next to the project"""
+        if self.undo_stack.isClean():
+            return
+        if self.undo_stack.index() == self._autosave_index:
+            return  # nothing new since the last autosave
+        file_name = self.autosave_file_name()
+        if file_name is None:
+            return
+        self._autosave_index = self.undo_stack.index()
+        self.project_writer.save(file_name, self.to_dict())
+
+    def autosave_file_name(self) -> Optional[str]:
+        if self.project_file_name is not None:
+            return autosave_file_name(self.project_file_name)
+        file_name = self.untitled_autosave_file_name()
+        if file_name is not None:
+            os.makedirs(os.path.dirname(file_name), exist_ok=True)
+        return file_name
+
+    @staticmethod
+    def untitled_autosave_file_name() -> Optional[str]:
+        folder = QtCore.QStandardPaths.writableLocation(
+            QtCore.QStandardPaths.AppDataLocation
+        )
+        if not folder:
+            return None
+        return os.path.join(folder, "autosave", "untitled.autosave.json")
+
+    def discard_autosave(self) -> None:
+        """Delete the recovery file of changes the user chose to discard"""
+        if self.project_file_name is None:
+            self.discard_untitled_autosave()
+            return
+        self.project_writer.wait()  # an autosave in flight would bring it back
+        remove_project_file(autosave_file_name(self.project_file_name))
+
+    def discard_untitled_autosave(self) -> None:
+        """Delete the recovery file of an untitled project, once it is saved or discarded"""
+        file_name = self.untitled_autosave_file_name()
+        if file_name is None:
+            return
+        self.project_writer.wait()  # an autosave in flight would bring it back
+        remove_project_file(file_name)
+
+    def recover_untitled(self) -> None:
+        """Offer to recover an untitled project that was autosaved, but never saved"""
+        file_name = self.untitled_autosave_file_name()
+        if file_name is None or not os.path.exists(file_name):
+            return
+        result = QMessageBox.question(
+            self,
+            "Recover unsaved changes?",
+            "An untitled project was not saved when Schmereo last closed.\n"
+            "Do you want to recover it?",
+            QMessageBox.Yes | QMessageBox.No,
+            QMessageBox.Yes,
+        )
+        if result != QMessageBox.Yes:
+            remove_project_file(file_name)
+            return
+        try:
+            data = read_project_file(file_name)
+        except (OSError, ValueError) as exc:
+            self.log_message(f"ERROR: Failed to recover {file_name}: {exc}")
+            return
+        self.from_dict(data)
+        for w in self.eye_widgets():
+            w.update()
+        self.undo_stack.clear()
+        self.undo_stack.resetClean()  # recovered changes are not saved yet
+        self._autosave_index = None
 
     def check_save(self) -> bool:
         if self.undo_stack.isClean():
@@ -128,10 +295,11 @@ class SchmereoMainWindow(QtWidgets.QMainWindow):
         )
         if result == QMessageBox.Save:
             if self.project_file_name is None:
-                return self.on_actionSave_Project_As_triggered()
+                return self.on_actionSave_Project_As_triggered(block=True)
             else:
-                return self.save_project_file(self.project_file_name)
+                return self.save_project_file(self.project_file_name, block=True)
         elif result == QMessageBox.Discard:
+            self.discard_autosave()
             return True  # OK to do whatever now
         elif result == QMessageBox.Cancel:
             return False
@@ -140,10 +308,25 @@ class SchmereoMainWindow(QtWidgets.QMainWindow):
 
     def closeEvent(self, event: QCloseEvent):
         if self.check_save():
+            self.autosave_timer.stop()
+            self.project_writer.shutdown()
+            self.marker_manager.suggester.shutdown()
+            self.live_aligner.shutdown()
+            self.disparity_dock.shutdown()
+            self.discard_untitled_autosave()
+            self.finish_trace()
             event.accept()
         else:
             event.ignore()
 
+    def finish_trace(self) -> None:
+        """
+        Offer to save a trace started from the menu; at exit, only traces
+        started with SCHMEREO_TRACE are written, to their own file
+        """
+        if tracer.enabled and tracer.output_file is None:
+            self.ui.actionRecord_Trace.setChecked(False)  # asks where to save it
+
     def eye_widgets(self):
         for w in (self.ui.leftImageWidget, self.ui.rightImageWidget):
             yield w
@@ -162,16 +345,27 @@ class SchmereoMainWindow(QtWidgets.QMainWindow):
     def load_file(self, file_name: str) -> bool:
         result = False
         self.log_message(f"Loading file {file_name}...")
+        from PIL import Image  # deferred; PIL is slow to import
+
         try:
             image = Image.open(file_name)
         except OSError:
             return self.load_project(file_name)
-        result = self.ui.leftImageWidget.load_image(file_name)
-        if result:
-            result = self.ui.rightImageWidget.load_image(file_name)
+        parts = eye_parts(file_name)
+        if parts is None:
+            # One image for both eyes, e.g. a scanned card: each eye starts on its half
+            parts = [{}, {}]
+            centers = (FractionalImagePos(-0.5, 0), FractionalImagePos(+0.5, 0))
+        else:
+            centers = (FractionalImagePos(0, 0), FractionalImagePos(0, 0))
+        result = True
+        for w, part, center in zip(self.eye_widgets(), parts, centers):
+            result = result and w.load_image(file_name, **part)
+            w.image.transform.center = center
         if result:
             self.ui.leftImageWidget.update()
             self.ui.rightImageWidget.update()
+            self.color_match_manager.update_luts()
             self.recent_files.add_file(file_name)
             self.project_folder = os.path.dirname(file_name)
         else:
@@ -179,18 +373,37 @@ class SchmereoMainWindow(QtWidgets.QMainWindow):
         return result
 
     def load_project(self, file_name):
-        with open(file_name, "r") as fh:
-            data = json.load(fh)
-            self.from_dict(data)
-            for w in self.eye_widgets():
-                w.update()
-            self.recent_files.add_file(file_name)
-            self.project_file_name = file_name
-            self.project_folder = os.path.dirname(file_name)
-            self.setWindowFilePath(self.project_file_name)
-            self.undo_stack.clear()
-            self.undo_stack.setClean()
-            return True
+        recovered = False
+        autosave_name = autosave_file_name(file_name)
+        data_file_name = file_name
+        if os.path.exists(autosave_name) and os.path.getmtime(
+            autosave_name
+        ) > os.path.getmtime(file_name):
+            result = QMessageBox.question(
+                self,
+                "Recover unsaved changes?",
+                "An autosaved version of this project is newer than the project file.\n"
+                "Do you want to recover the autosaved changes?",
+                QMessageBox.Yes | QMessageBox.No,
+                QMessageBox.Yes,
+            )
+            if result == QMessageBox.Yes:
+                data_file_name = autosave_name
+                recovered = True
+        data = read_project_file(data_file_name)
+        self.from_dict(data)
+        for w in self.eye_widgets():
+            w.update()
+        self.recent_files.add_file(file_name)
+        self.project_file_name = file_name
+        self.project_folder = os.path.dirname(file_name)
+        self.setWindowFilePath(self.project_file_name)
+        self.undo_stack.clear()
+        self.undo_stack.setClean()
+        self._autosave_index = None
+        if recovered:
+            self.undo_stack.resetClean()  # recovered changes are not saved yet
+        return True
 
     def log_message(self, message: str) -> None:
         self.ui.statusbar.showMessage(message)
@@ -215,6 +428,52 @@ class SchmereoMainWindow(QtWidgets.QMainWindow):
         self.clip_box.recenter()
         self.undo_stack.push(AlignNowCommand(self))
 
+    @QtCore.pyqtSlot(bool)
+    def on_actionLive_Alignment_Preview_toggled(self, checked: bool):
+        self.live_aligner.set_enabled(checked)
+
+    @QtCore.pyqtSlot()
+    def on_actionAccept_Live_Alignment_triggered(self):
+        # Unlike Align Now, leaves the clip box where it is
+        solution = self.live_aligner.take_solution()
+        if solution is not None:
+            self.undo_stack.push(AlignNowCommand(self, solution))
+
+    def auto_crop(self, aspect: Optional[float] = None) -> None:
+        """Shrink the clip box to the largest one with no background in either eye"""
+        images = [w.image for w in self.eye_widgets()]
+        if any(i.width is None for i in images):
+            return
+        box = auto_crop(images, aspect)
+        if box is None:
+            self.log_message("The images do not overlap; nothing to crop")
+            return
+        old_state = self.clip_box.state
+        new_state = dict(old_state)
+        new_state["left"], new_state["top"], new_state["right"], new_state["bottom"] = box
+        self.undo_stack.push(AdjustClipBoxCommand(self.clip_box, old_state, new_state))
+
+    @QtCore.pyqtSlot()
+    def on_actionAuto_Crop_triggered(self):
+        self.auto_crop()
+
+    @QtCore.pyqtSlot()
+    def on_actionAuto_Crop_to_Aspect_Ratio_triggered(self):
+        ratios = ("3:2", "4:3", "16:9", "5:4", "1:1", "2:3", "3:4", "9:16")
+        text, ok = QtWidgets.QInputDialog.getItem(
+            self, "Auto Crop", "Output width:height", ratios, 0, True
+        )
+        if not ok:
+            return
+        try:
+            width, height = (float(v) for v in text.split(":"))
+        except ValueError:
+            width = height = 0
+        if not (width > 0 and height > 0):
+            self.log_message(f"Not an aspect ratio: {text}")
+            return
+        self.auto_crop(width / height)
+
     @QtCore.pyqtSlot()
     def on_actionClear_Markers_triggered(self):
         self.undo_stack.push(ClearMarkersCommand(*self.eye_widgets()))
@@ -223,14 +482,17 @@ class SchmereoMainWindow(QtWidgets.QMainWindow):
     def on_actionNew_triggered(self):
         if not self.check_save():
             return
+        self.discard_untitled_autosave()
         self.project_folder = None
         self.project_file_name = None
         self.setWindowFilePath("untitled")
         self.shared_camera.reset()
         for w in self.eye_widgets():
             w.image.transform.reset()
+        self.color_match_manager.reset()
         self.undo_stack.clear()
         self.undo_stack.setClean()
+        self._autosave_index = None
 
     @QtCore.pyqtSlot()
     def on_actionOpen_triggered(self):
@@ -243,7 +505,10 @@ class SchmereoMainWindow(QtWidgets.QMainWindow):
             parent=self,
             caption="Load Image",
             directory=folder,
-            filter="Projects and Images (*.json *.tif);;All Files (*)",
+            filter="Projects and Images"
+            " (*.json *.jps *.pns *.mpo *.jpg *.jpeg *.png *.tif *.tiff)"
+            ";;Stereo Images (*.jps *.pns *.mpo)"
+            ";;Cross-eyed Side by Side, Right Eye First (*.jps *.pns);;All Files (*)",
         )
         if file_name is None:
             return
@@ -251,9 +516,70 @@ class SchmereoMainWindow(QtWidgets.QMainWindow):
             return
         self.load_file(file_name)
 
+    def set_filter_mode(self, mode: FilterMode) -> None:
+        for w in self.eye_widgets():
+            w.image.filter_mode = mode
+            w.request_repaint("filter mode")
+
+    @QtCore.pyqtSlot(bool)
+    def on_actionDynamic_Resolution_toggled(self, checked: bool):
+        for w in self.eye_widgets():
+            w.dynamic_resolution.set_enabled(checked)
+
+    @QtCore.pyqtSlot()
+    def on_actionTarget_Frame_Time_triggered(self):
+        resolution = self.ui.leftImageWidget.dynamic_resolution
+        value, ok = QtWidgets.QInputDialog.getDouble(
+            self,
+            "Target Frame Time",
+            "While panning and zooming, reduce the resolution to keep\n"
+            "each frame below this many milliseconds of GPU time:",
+            resolution.target_frame_ms,
+            1.0,
+            100.0,
+            1,
+        )
+        if ok:
+            for w in self.eye_widgets():
+                w.dynamic_resolution.set_target_frame_ms(value)
+
+    @QtCore.pyqtSlot(bool)
+    def on_actionShow_Frame_Statistics_toggled(self, checked: bool):
+        for w in self.eye_widgets():
+            w.show_frame_stats = checked
+        if checked:
+            self.frame_stats_timer.start()
+        else:
+            self.frame_stats_timer.stop()
+        self.render_scheduler.request_all("frame statistics")
+
+    @QtCore.pyqtSlot(bool)
+    def on_actionRecord_Trace_toggled(self, checked: bool):
+        if checked:
+            if not tracer.enabled:
+                tracer.start()
+            return
+        file_name = tracer.output_file
+        tracer.stop()  # writes the trace itself, if started with SCHMEREO_TRACE
+        if file_name is not None:
+            self.log_message(f"Saved trace {file_name}")
+            return
+        file_name, _ = QtWidgets.QFileDialog.getSaveFileName(
+            parent=self,
+            caption="Save Trace",
+            directory="schmereo_trace.json",
+            filter="Chrome Trace (*.json)",
+        )
+        if not file_name:
+            return
+        tracer.write(file_name)
+        self.log_message(f"Saved trace {file_name}")
+
     @QtCore.pyqtSlot()
     def on_actionQuit_triggered(self):
         if self.check_save():
+            self.discard_untitled_autosave()
+            self.finish_trace()
             QtCore.QCoreApplication.quit()
 
     @QtCore.pyqtSlot()
@@ -273,6 +599,7 @@ class SchmereoMainWindow(QtWidgets.QMainWindow):
         if not self.image_saver.can_save():
             return
         self.clip_box.recenter()
+        self.color_match_manager.update_luts()  # for the eyes' parts in the clip box
         path = ""
         if self.project_file_name is not None:
             path = f"{os.path.splitext(self.project_file_name)[0]}.pns"
@@ -282,7 +609,7 @@ class SchmereoMainWindow(QtWidgets.QMainWindow):
             parent=self,
             caption="Save File(s)",
             directory=path,
-            filter="3D Images (*.pns *.jps)",
+            filter="Cross-eyed 3D Images (*.pns *.jps)",
         )
         if file_name is None:
             return
@@ -295,7 +622,7 @@ class SchmereoMainWindow(QtWidgets.QMainWindow):
             self.project_folder = os.path.dirname(file_name)
 
     @QtCore.pyqtSlot()
-    def on_actionSave_Project_As_triggered(self) -> bool:
+    def on_actionSave_Project_As_triggered(self, block=False) -> bool:
         path = ""
         if self.project_file_name is not None:
             path = os.path.dirname(self.project_file_name)
@@ -311,7 +638,7 @@ class SchmereoMainWindow(QtWidgets.QMainWindow):
             return False
         if len(file_name) < 1:
             return False
-        return self.save_project_file(file_name)
+        return self.save_project_file(file_name, block=block)
 
     @QtCore.pyqtSlot()
     def on_actionZoom_In_triggered(self):
@@ -321,6 +648,24 @@ class SchmereoMainWindow(QtWidgets.QMainWindow):
     def on_actionZoom_Out_triggered(self):
         self.zoom(amount=1.0 / self.zoom_increment)
 
+    @QtCore.pyqtSlot(str, str)
+    def on_project_writer_failed(self, file_name: str, message: str):
+        self._save_indexes.pop(file_name, None)  # the stack stays modified
+        self.log_message(f"ERROR: Failed to save {file_name}: {message}")
+
+    @QtCore.pyqtSlot(str)
+    def on_project_writer_saved(self, file_name: str):
+        index = self._save_indexes.pop(file_name, None)
+        if index is None:
+            return  # an autosave, or a blocking save that was handled already
+        if file_name == self.project_file_name and index == self.undo_stack.index():
+            self.undo_stack.setClean()  # unless there were changes during the write
+            self._autosave_index = None
+        for name in (autosave_file_name(file_name), self.untitled_autosave_file_name()):
+            if name is not None and os.path.exists(name):
+                remove_project_file(name)
+        self.log_message(f"Saved project {file_name}")
+
     @QtCore.pyqtSlot(bool)
     def on_undoStack_cleanChanged(self, is_clean: bool):
         self.ui.actionSave.setEnabled(not is_clean)
@@ -336,32 +681,35 @@ class SchmereoMainWindow(QtWidgets.QMainWindow):
         self.clip_box.notify()
         self.camera.notify()
 
-    def save_project_file(self, file_name) -> bool:
-        with open(file_name, "w") as fh:
-            self.clip_box.recenter()
-            json.dump(self.to_dict(), fh, indent=2)
-            self.recent_files.add_file(file_name)
-            self.setWindowFilePath(file_name)
-            self.project_file_name = file_name
-            self.project_folder = os.path.dirname(file_name)
-            self.undo_stack.setClean()
-            return True
-        return False
+    def save_project_file(self, file_name, block=False) -> bool:
+        """
+        Write the project in the background; the undo stack is marked clean
+        when the writer reports success. With block=True, wait for the write
+        to finish and report whether it succeeded.
+        """
+        self.clip_box.recenter()
+        self._save_indexes[file_name] = self.undo_stack.index()
+        self.project_writer.save(file_name, self.to_dict())
+        self.recent_files.add_file(file_name)
+        self.setWindowFilePath(file_name)
+        self.project_file_name = file_name
+        self.project_folder = os.path.dirname(file_name)
+        if block:
+            succeeded = self.project_writer.wait()
+            # The writer's signals are queued behind this call; handle them now
+            if succeeded:
+                self.on_project_writer_saved(file_name)
+            else:
+                self._save_indexes.pop(file_name, None)
+            return succeeded
+        return True
 
     def to_dict(self):
-        self.clip_box.recenter()  # Normalize values before serialization
-        return {
-            "app": {"name": "schmereo", "version": __version__},
-            "clip_box": self.clip_box.to_dict(),
-            "left": self.ui.leftImageWidget.to_dict(),
-            "right": self.ui.rightImageWidget.to_dict(),
-        }
+        return self.project.to_dict()
 
     def from_dict(self, data):
-        self.ui.leftImageWidget.from_dict(data["left"])
-        self.ui.rightImageWidget.from_dict(data["right"])
-        if "clip_box" in data:
-            self.clip_box.from_dict(data["clip_box"])
+        self.project.from_dict(data)
+        self.color_match_manager.set_state(self.project.color_match.state)
 
     @QtCore.pyqtSlot()
     def zoom(self, amount: float):
@@ -1,83 +1,50 @@
-import pkg_resources
-from typing import List
-
 import numpy
 from OpenGL import GL
-from OpenGL.GL.shaders import compileProgram, compileShader
-from PIL import Image
 
-from schmereo.coord_sys import ImagePixelCoordinate
+from schmereo.core.marker import MarkerArray
+from schmereo.memory_ledger import memory_ledger
+from schmereo import resources
+from schmereo.shader_program import shader_program
 
 
-class MarkerSet(object):
-    def __init__(self, camera):
+class MarkerSet(MarkerArray):
+    def __init__(self, camera, color=(1.0, 1.0, 0.2, 0.3)):
+        super().__init__()
         self.camera = camera
+        self.color = color  # RGBA, multiplying the crosshair image
         self.vao = None
         self.shader = None
-        stream = pkg_resources.resource_stream(__name__, "crosshair64.png")
-        self.image = Image.open(stream)
-        self.pixels = numpy.frombuffer(
-            buffer=self.image.convert("RGBA").tobytes(), dtype=numpy.ubyte
-        )
         self.texture = None
-        self.points = list()
-        self._array = None
-        self._dirty_array = False
+        self._uploaded_version = None
+        self._uploaded_bytes = 0
         self.vbo = None
 
-    def __getitem__(self, index):
-        return self.points[index]
-
-    def __len__(self) -> int:
-        return len(self.points)
-
-    def __delitem__(self, key):
-        del self.points[key]
-        self._dirty_array = True
-
-    def add_marker(self, pos: ImagePixelCoordinate):
-        self.points.append([*pos])
-        self._dirty_array = True
+    def memory_bytes(self):
+        return self._storage.nbytes, self._uploaded_bytes
 
-    def add_markers(self, markers: List[ImagePixelCoordinate]):
-        for m in markers:
-            self.points.append([*m])
-        self._dirty_array = True
-
-    def clear(self):
-        if len(self.points) == 0:
-            return
-        self.points[:] = []
-        self._dirty_array = True
+    def _load_shader(self) -> None:
+        """Load on first use, so that an empty window starts faster"""
+        self.shader = shader_program("schmereo.marker", "marker.vert", "marker.frag")
 
     def initializeGL(self):
         self.vao = GL.glGenVertexArrays(1)
-        self.shader = compileProgram(
-            compileShader(
-                pkg_resources.resource_string("schmereo.marker", "marker.vert"),
-                GL.GL_VERTEX_SHADER,
-            ),
-            compileShader(
-                pkg_resources.resource_string("schmereo.marker", "marker.frag"),
-                GL.GL_FRAGMENT_SHADER,
-            ),
-        )
         GL.glBindVertexArray(self.vao)
         GL.glEnable(GL.GL_PROGRAM_POINT_SIZE)
         GL.glEnable(GL.GL_BLEND)
         GL.glBlendFunc(GL.GL_SRC_ALPHA, GL.GL_ONE_MINUS_SRC_ALPHA)
         self.texture = GL.glGenTextures(1)
         GL.glBindTexture(GL.GL_TEXTURE_2D, self.texture)
+        width, height, pixels = resources.rgba_pixels("schmereo.marker", "crosshair64.png")
         GL.glTexImage2D(
             GL.GL_TEXTURE_2D,
             0,
             GL.GL_RGBA,
-            self.image.width,
-            self.image.height,
+            width,
+            height,
             0,
             GL.GL_RGBA,
             GL.GL_UNSIGNED_BYTE,
-            self.pixels,
+            pixels,
         )
         GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_MAG_FILTER, GL.GL_LINEAR)
         GL.glTexParameteri(
@@ -92,16 +59,19 @@ class MarkerSet(object):
         GL.glVertexAttribPointer(0, 2, GL.GL_FLOAT, False, 0, None)
 
     def paintGL(self, image_size, transform, camera, window_aspect):
-        if not self._dirty_array and self._array is None:
+        if len(self) == 0 and self._uploaded_version is None:
             return
         GL.glBindVertexArray(self.vao)
         GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self.vbo)
         GL.glEnable(GL.GL_BLEND)
         GL.glBlendFunc(GL.GL_SRC_ALPHA, GL.GL_ONE_MINUS_SRC_ALPHA)
-        if self._dirty_array:
-            self._array = numpy.array(self.points, dtype=numpy.float32)
-            GL.glBufferData(GL.GL_ARRAY_BUFFER, self._array, GL.GL_STATIC_DRAW)
-            self._dirty_array = False
+        if self._uploaded_version != self.version:
+            array = numpy.ascontiguousarray(self.points)
+            GL.glBufferData(GL.GL_ARRAY_BUFFER, array, GL.GL_STATIC_DRAW)
+            self._uploaded_version = self.version
+            self._uploaded_bytes = array.nbytes
+        if self.shader is None:
+            self._load_shader()
         GL.glUseProgram(self.shader)
         GL.glBindTexture(GL.GL_TEXTURE_2D, self.texture)
         GL.glUniform1i(0, 0)  # marker image is in texture unit zero
@@ -111,12 +81,5 @@ class MarkerSet(object):
         GL.glUniform1f(4, camera.zoom)
         GL.glUniform1f(5, window_aspect)
         GL.glUniform1f(6, transform.rotation)
+        GL.glUniform4f(7, *self.color)
         GL.glDrawArrays(GL.GL_POINTS, 0, len(self.points))
-
-    def to_dict(self):
-        return [{'x': float(p[0]), 'y': float(p[1])} for p in self.points]
-
-    def from_dict(self, data):
-        self.clear()
-        for p in data:
-            self.add_marker(ImagePixelCoordinate(p['x'], p['y']))
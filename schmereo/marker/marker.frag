@@ -1,11 +1,11 @@
 #version 460 core
 
 layout(location=0) uniform sampler2D markerImage;
+layout(location=7) uniform vec4 markerColor = vec4(1.0, 1.0, 0.2, 0.3);
 
 out vec4 fragColor;
 
 void main()
 {
-    vec4 color = vec4(1.0, 1.0, 0.2, 0.3);
-    fragColor = texture(markerImage, gl_PointCoord) * color;
+    fragColor = texture(markerImage, gl_PointCoord) * markerColor;
 }
@@ -1,6 +1,6 @@
 #version 460 core
 
-in vec2 position;  // in image pixels
+layout(location = 0) in vec2 position;  // in image pixels
 
 layout(location=1) uniform ivec2 imageSize = ivec2(640, 480);  // in image pixels
 layout(location=2) uniform vec2 transformCenter = vec2(0.0, 0.0);  // in fip? TODO:
@@ -1,5 +1,10 @@
+from functools import partial
+
 from PyQt5.QtCore import pyqtSlot, QObject
 
+from schmereo.command import AddMarkerCommand, AddMarkerPairCommand
+from schmereo.marker.match_suggester import MatchSuggester
+
 
 class MarkerManager(QObject):
     def __init__(self, main_window):
@@ -8,12 +13,22 @@ class MarkerManager(QObject):
         ama = main_window.ui.actionAdd_Marker
         ama.toggled.connect(self.on_actionAdd_Marker_toggled)
         self.actionAdd_Marker = ama
+        self.actionMatch = main_window.ui.actionMatch_Markers_Automatically
+        self.actionAccept = main_window.ui.actionAccept_Suggested_Match
+        self.actionAccept.triggered.connect(self.accept_suggestion)
+        self.actionAccept.setEnabled(False)
         self.widgets = list(main_window.eye_widgets())
         main_window.ui.actionHand_Mode.triggered.connect(
             self.on_actionHand_Mode_triggered
         )
-        for w in self.widgets:
+        for index, w in enumerate(self.widgets):
             w.marker_added.connect(self.on_marker_added)
+            w.marker_clicked.connect(partial(self.on_marker_clicked, index))
+        self.suggester = MatchSuggester(self)
+        self.suggester.suggested.connect(self.on_suggested)
+        self.pending = None  # (widget index, image position) of a click awaiting its match
+        self.generation = None  # of the suggestion being waited for
+        self.suggestion = None  # suggested image position in the other eye
 
     @pyqtSlot(bool)
     def on_actionAdd_Marker_toggled(self, toggled):
@@ -29,9 +44,12 @@ class MarkerManager(QObject):
                     w.set_add_marker_mode(True)
                 else:
                     w.set_add_marker_mode(False)
+            if self.actionMatch.isChecked():
+                self.suggester.prefetch(self.widgets)
         else:
             for w in self.widgets:
                 w.set_add_marker_mode(False)
+            self.clear_pending()
 
     @pyqtSlot()
     def on_actionHand_Mode_triggered(self):
@@ -48,5 +66,72 @@ class MarkerManager(QObject):
         else:
             self.widgets[1].set_add_marker_mode(False)
 
+    def on_marker_clicked(self, index: int, image_pos):
+        widget = self.widgets[index]
+        counts_match = len(self.widgets[0].markers) == len(self.widgets[1].markers)
+        if self.pending is not None and self.pending[0] != index:
+            # A click in the other eye places the match by hand
+            self.push_pair(image_pos)
+        elif not self.actionMatch.isChecked() or not counts_match:
+            widget.undo_stack.push(AddMarkerCommand(widget, image_pos))
+        else:
+            self.clear_pending()
+            self.pending = (index, image_pos)
+            self._show(widget, image_pos)
+            other = self.widgets[1 - index]
+            self.generation = self.suggester.suggest(widget, other, image_pos)
+            if self.generation is not None:
+                self.main_window.log_message("Looking for the matching point...")
+
+    @pyqtSlot(int, object, float)
+    def on_suggested(self, generation: int, image_pos, score: float):
+        if self.pending is None or generation != self.generation:
+            return  # the click was superseded or abandoned
+        self.generation = None
+        if image_pos is None:
+            self.main_window.log_message(
+                f"No confident match found (score {score:.2f}); click the matching point"
+            )
+            return
+        self.suggestion = image_pos
+        self._show(self.widgets[1 - self.pending[0]], image_pos)
+        self.actionAccept.setEnabled(True)
+        self.main_window.log_message(
+            f"Suggested match, score {score:.2f}: press Enter to accept, "
+            "or click the matching point"
+        )
+
+    @pyqtSlot()
+    def accept_suggestion(self):
+        if self.pending is not None and self.suggestion is not None:
+            self.push_pair(self.suggestion)
+
+    def push_pair(self, other_pos) -> None:
+        """Add the pending marker and its match in the other eye, as one undo step"""
+        index, image_pos = self.pending
+        positions = [None, None]
+        positions[index] = image_pos
+        positions[1 - index] = other_pos
+        self.clear_pending()
+        left, right = self.widgets
+        left.undo_stack.push(AddMarkerPairCommand(left, right, *positions))
+
+    def clear_pending(self) -> None:
+        self.pending = None
+        self.generation = None
+        self.suggestion = None
+        self.actionAccept.setEnabled(False)
+        for w in self.widgets:
+            self._show(w, None)
+
+    @staticmethod
+    def _show(widget, image_pos) -> None:
+        if len(widget.suggestion) == 0 and image_pos is None:
+            return
+        widget.suggestion.clear()
+        if image_pos is not None:
+            widget.suggestion.add_marker(image_pos)
+        widget.request_repaint("markers")
+
     def set_marker_mode(self, mode_on=True):
         self.actionAdd_Marker.setChecked(mode_on)
@@ -0,0 +1,153 @@
+"""
+Accounting of what is resident: each component that holds a lot of memory
+registers itself with the ledger, along with a function that measures its
+CPU and estimated GPU bytes. Nothing is measured until someone asks, so
+registration is free.
+
+    memory_ledger.register(owner, "decoded images", measure, name=file_name)
+
+Owners are held weakly; an owner that is garbage collected drops out of the
+ledger by itself. The View > Memory panel shows the ledger, and can dump it
+as JSON or compare tracemalloc snapshots, e.g. before and after opening and
+closing a few projects, to find leaks.
+"""
+
+import json
+import sys
+import time
+import tracemalloc
+import weakref
+
+import numpy
+from PyQt5.QtCore import QObject
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def process_resident_bytes():
+    """Resident set size of this process, or None where unknown"""
+    if resource is None:  # Windows
+        return None
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * resource.getpagesize()
+    except (OSError, IndexError, ValueError):  # not Linux: report the peak instead
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def estimate_bytes(value, _seen=None) -> int:
+    """
+    Rough CPU bytes held by plain data: numpy arrays, containers, numbers,
+    strings, and the attributes of simple objects. Qt objects and modules are
+    references to things accounted elsewhere, so they count as nothing.
+    """
+    if _seen is None:
+        _seen = set()
+    if id(value) in _seen or isinstance(value, (QObject, type(sys))):
+        return 0
+    _seen.add(id(value))
+    if isinstance(value, numpy.ndarray):
+        return value.nbytes if value.base is None else 0
+    total = sys.getsizeof(value)
+    if isinstance(value, dict):
+        for key, item in value.items():
+            total += estimate_bytes(key, _seen) + estimate_bytes(item, _seen)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        total += sum(estimate_bytes(v, _seen) for v in value)
+    elif hasattr(value, "__dict__") and not isinstance(value, type):
+        total += estimate_bytes(vars(value), _seen)
+    return total
+
+
+class LedgerEntry(object):
+    def __init__(self, owner, category: str, measure, name: str):
+        self.owner = weakref.ref(owner)
+        self.category = category
+        self.measure = measure  # measure(owner) -> (cpu_bytes, gpu_bytes)
+        self.name = name
+
+
+class MemoryLedger(object):
+    def __init__(self):
+        self._entries = []
+        self._snapshot = None  # tracemalloc baseline for compare_allocations()
+
+    def register(self, owner, category: str, measure, name: str = "") -> None:
+        """measure(owner) returns (cpu_bytes, gpu_bytes)"""
+        self._entries.append(LedgerEntry(owner, category, measure, name))
+
+    def rows(self) -> list:
+        """One dict per live component: category, name, cpu_bytes, gpu_bytes"""
+        result = []
+        live = []
+        for entry in self._entries:
+            owner = entry.owner()
+            if owner is None:
+                continue
+            live.append(entry)
+            cpu_bytes, gpu_bytes = entry.measure(owner)
+            result.append(
+                {
+                    "category": entry.category,
+                    "name": entry.name,
+                    "cpu_bytes": int(cpu_bytes),
+                    "gpu_bytes": int(gpu_bytes),
+                }
+            )
+        self._entries = live
+        return result
+
+    def to_dict(self) -> dict:
+        rows = self.rows()
+        categories = {}
+        for row in rows:
+            totals = categories.setdefault(row["category"], {"cpu_bytes": 0, "gpu_bytes": 0})
+            totals["cpu_bytes"] += row["cpu_bytes"]
+            totals["gpu_bytes"] += row["gpu_bytes"]
+        return {
+            "time": time.time(),
+            "process_resident_bytes": process_resident_bytes(),
+            "python_traced_bytes": tracemalloc.get_traced_memory()[0]
+            if tracemalloc.is_tracing()
+            else None,
+            "categories": categories,
+            "components": rows,
+        }
+
+    def write(self, file_name: str) -> None:
+        with open(file_name, "w") as fh:
+            json.dump(self.to_dict(), fh, indent=2)
+
+    # Python allocation tracking, for leaks
+
+    def start_tracing(self, frames: int = 8) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        self._snapshot = None
+
+    def stop_tracing(self) -> None:
+        tracemalloc.stop()
+        self._snapshot = None
+
+    def compare_allocations(self, limit: int = 20) -> list:
+        """
+        Source lines whose allocations grew the most since the previous
+        call, as text; the first call only takes the baseline snapshot.
+        """
+        if not tracemalloc.is_tracing():
+            return []
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            (tracemalloc.Filter(False, tracemalloc.__file__),)
+        )
+        previous, self._snapshot = self._snapshot, snapshot
+        if previous is None:
+            return []
+        differences = snapshot.compare_to(previous, "lineno")
+        return [str(d) for d in differences[:limit] if d.size_diff != 0]
+
+
+memory_ledger = MemoryLedger()
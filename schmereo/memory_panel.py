@@ -0,0 +1,137 @@
+"""
+Debug panel showing the MemoryLedger: CPU and estimated GPU bytes per
+component, grouped by category, refreshed every second while visible.
+"""
+
+from PyQt5 import QtCore, QtWidgets
+
+from schmereo.memory_ledger import estimate_bytes, memory_ledger
+
+
+def undo_stack_bytes(stack: QtWidgets.QUndoStack):
+    """Measure for the ledger: the data the undo commands keep, e.g. old markers"""
+    total = 0
+    commands = [stack.command(i) for i in range(stack.count())]
+    while commands:
+        command = commands.pop()
+        total += estimate_bytes(vars(command))
+        commands.extend(command.child(i) for i in range(command.childCount()))
+    return total, 0
+
+
+def format_bytes(count) -> str:
+    if count is None:
+        return "?"
+    for unit in ("B", "KB", "MB"):
+        if abs(count) < 1024:
+            return f"{count:.0f} {unit}" if unit == "B" else f"{count:.1f} {unit}"
+        count /= 1024
+    return f"{count:.2f} GB"
+
+
+class MemoryDock(QtWidgets.QDockWidget):
+    def __init__(self, parent=None):
+        super().__init__("Memory", parent)
+        self.setObjectName("memoryDock")
+        self.tree = QtWidgets.QTreeWidget()
+        self.tree.setHeaderLabels(("Component", "CPU", "GPU"))
+        self.tree.setRootIsDecorated(True)
+        self.summary = QtWidgets.QLabel()
+        save_button = QtWidgets.QPushButton("Save JSON...")
+        save_button.clicked.connect(self.save)
+        self.tracing_box = QtWidgets.QCheckBox("Track Python allocations")
+        self.tracing_box.toggled.connect(self.set_tracing)
+        self.snapshot_button = QtWidgets.QPushButton("Snapshot")
+        self.snapshot_button.setToolTip(
+            "Compare Python allocations with the previous snapshot, e.g. after\n"
+            "opening and closing the same project a few times"
+        )
+        self.snapshot_button.setEnabled(False)
+        self.snapshot_button.clicked.connect(self.snapshot)
+        self.allocations = QtWidgets.QPlainTextEdit()
+        self.allocations.setReadOnly(True)
+        self.allocations.setLineWrapMode(QtWidgets.QPlainTextEdit.NoWrap)
+        self.allocations.hide()
+        buttons = QtWidgets.QHBoxLayout()
+        buttons.addWidget(save_button)
+        buttons.addWidget(self.tracing_box)
+        buttons.addWidget(self.snapshot_button)
+        buttons.addStretch()
+        contents = QtWidgets.QWidget()
+        layout = QtWidgets.QVBoxLayout(contents)
+        layout.setContentsMargins(2, 2, 2, 2)
+        layout.addWidget(self.summary)
+        layout.addWidget(self.tree, stretch=2)
+        layout.addLayout(buttons)
+        layout.addWidget(self.allocations, stretch=1)
+        self.setWidget(contents)
+        self.timer = QtCore.QTimer(self)
+        self.timer.setInterval(1000)
+        self.timer.timeout.connect(self.refresh)
+        self.visibilityChanged.connect(self.on_visibility_changed)
+
+    @QtCore.pyqtSlot(bool)
+    def on_visibility_changed(self, visible: bool) -> None:
+        if visible:
+            self.refresh()
+            self.timer.start()
+        else:
+            self.timer.stop()
+
+    @QtCore.pyqtSlot()
+    def refresh(self) -> None:
+        data = memory_ledger.to_dict()
+        expanded = {
+            self.tree.topLevelItem(i).text(0)
+            for i in range(self.tree.topLevelItemCount())
+            if self.tree.topLevelItem(i).isExpanded()
+        }
+        self.tree.clear()
+        for category, totals in sorted(data["categories"].items()):
+            item = QtWidgets.QTreeWidgetItem(
+                (category, format_bytes(totals["cpu_bytes"]), format_bytes(totals["gpu_bytes"]))
+            )
+            for row in data["components"]:
+                if row["category"] != category:
+                    continue
+                columns = row["name"], format_bytes(row["cpu_bytes"]), format_bytes(row["gpu_bytes"])
+                item.addChild(QtWidgets.QTreeWidgetItem(columns))
+            self.tree.addTopLevelItem(item)
+            item.setExpanded(category in expanded)
+        cpu = sum(t["cpu_bytes"] for t in data["categories"].values())
+        gpu = sum(t["gpu_bytes"] for t in data["categories"].values())
+        text = (
+            f"Accounted: {format_bytes(cpu)} CPU, {format_bytes(gpu)} GPU."
+            f" Process resident: {format_bytes(data['process_resident_bytes'])}"
+        )
+        if data["python_traced_bytes"] is not None:
+            text += f". Python traced: {format_bytes(data['python_traced_bytes'])}"
+        self.summary.setText(text)
+        self.tree.resizeColumnToContents(0)
+
+    @QtCore.pyqtSlot()
+    def save(self) -> None:
+        file_name, _ = QtWidgets.QFileDialog.getSaveFileName(
+            parent=self,
+            caption="Save Memory Report",
+            directory="schmereo_memory.json",
+            filter="JSON (*.json)",
+        )
+        if file_name:
+            memory_ledger.write(file_name)
+
+    @QtCore.pyqtSlot(bool)
+    def set_tracing(self, checked: bool) -> None:
+        if checked:
+            memory_ledger.start_tracing()
+            memory_ledger.compare_allocations()  # the baseline
+            self.allocations.setPlainText("Baseline taken. Snapshot again to compare.")
+        else:
+            memory_ledger.stop_tracing()
+        self.snapshot_button.setEnabled(checked)
+        self.allocations.setVisible(checked)
+
+    @QtCore.pyqtSlot()
+    def snapshot(self) -> None:
+        lines = memory_ledger.compare_allocations()
+        self.allocations.setPlainText("\n".join(lines) or "No change since the previous snapshot")
@@ -0,0 +1,141 @@
+"""
+Live preview of the exported pair: both eyes cropped to the clip box, at the
+resolution of the preview widget, combined in one pass of composite.frag.
+
+The preview draws from the textures the eye views already uploaded, so it
+never uploads or reads back full resolution pixels. It is registered with
+the RenderScheduler as an observer, so it repaints, at most once per
+display refresh, whenever a transform, the clip box or an image changed.
+"""
+
+from OpenGL import GL
+from PyQt5 import QtCore, QtWidgets
+
+from schmereo.core.composite import CompositeMode
+from schmereo.image.texture_registry import texture_registry
+from schmereo.shader_program import shader_program
+
+
+class OutputPreviewWidget(QtWidgets.QOpenGLWidget):
+    def __init__(self, images, clip_box, parent=None):
+        """images are the left and right SingleImage of the eye views"""
+        super().__init__(parent=parent)
+        self.images = images
+        self.clip_box = clip_box
+        mode_name = QtCore.QSettings().value("output_preview/mode", "SIDE_BY_SIDE")
+        self.mode = CompositeMode.__members__.get(mode_name, CompositeMode.SIDE_BY_SIDE)
+        self.vao = None
+        self.textures = [None, None]  # SharedTexture per eye
+        self.painted_state = None
+        self.setMinimumSize(160, 90)
+
+    def set_mode(self, mode: CompositeMode) -> None:
+        self.mode = mode
+        QtCore.QSettings().setValue("output_preview/mode", mode.name)
+        self.update()
+
+    def _texture(self, eye: int):
+        """Resident texture of one eye, or None if it is not uploaded yet"""
+        image = self.images[eye]
+        entry = self.textures[eye]
+        if entry is not None and entry.key != image.texture_key:
+            texture_registry.release(entry)
+            entry = self.textures[eye] = None
+        if entry is None and image.texture_key is not None:
+            entry = self.textures[eye] = texture_registry.acquire(image.texture_key)
+        if entry is None or not entry.uploaded:
+            return None  # the eye view is still streaming it
+        return entry
+
+    def render_state(self) -> tuple:
+        """Everything paintGL() draws depends on; see RenderScheduler"""
+        cb = self.clip_box
+        state = [
+            self.width(),
+            self.height(),
+            self.isVisible(),
+            self.mode,
+            (cb.left, cb.right, cb.top, cb.bottom),
+        ]
+        for image in self.images:
+            entry = image.texture
+            state.extend(
+                (
+                    image.texture_key,
+                    entry is not None and entry.uploaded,
+                    image.transform.center.x,
+                    image.transform.center.y,
+                    image.transform.rotation,
+                    image.filter_mode,
+                    image.lut_version,
+                )
+            )
+        return tuple(state)
+
+    def initializeGL(self) -> None:
+        super().initializeGL()
+        self.vao = GL.glGenVertexArrays(1)
+
+    def paintGL(self) -> None:
+        self.painted_state = self.render_state()
+        GL.glClearColor(0.2, 0.2, 0.2, 1)
+        GL.glClear(GL.GL_COLOR_BUFFER_BIT)
+        cb = self.clip_box
+        box_width, box_height = cb.right - cb.left, cb.bottom - cb.top
+        if box_width <= 0 or box_height <= 0:
+            return
+        textures = [self._texture(eye) for eye in (0, 1)]
+        if None in textures:
+            return
+        ratio = self.devicePixelRatioF()
+        width, height = int(self.width() * ratio), int(self.height() * ratio)
+        if self.mode in (CompositeMode.SIDE_BY_SIDE, CompositeMode.CROSS_EYE):
+            box_width *= 2
+        # largest viewport with the aspect ratio of the output
+        view_width = min(width, int(height * box_width / box_height))
+        view_height = int(view_width * box_height / box_width)
+        if view_width < 1 or view_height < 1:
+            return
+        x0, y0 = (width - view_width) // 2, (height - view_height) // 2
+        GL.glViewport(x0, y0, view_width, view_height)
+        GL.glBindVertexArray(self.vao)
+        GL.glUseProgram(
+            shader_program(
+                "schmereo.image", "composite.vert", ("image_sampling.glsl", "composite.frag")
+            )
+        )
+        GL.glDisable(GL.GL_BLEND)
+        for unit, entry in enumerate(textures):
+            GL.glActiveTexture(GL.GL_TEXTURE0 + unit)
+            GL.glBindTexture(GL.GL_TEXTURE_2D, entry.texture)
+        GL.glActiveTexture(GL.GL_TEXTURE0)
+        for eye, image in enumerate(self.images):
+            image.bind_lut(unit=2 + eye)
+        GL.glUniform4f(0, cb.left, cb.top, cb.right, cb.bottom)
+        GL.glUniform1i(1, self.mode.value)
+        for eye, image in enumerate(self.images):
+            GL.glUniform2fv(2 + eye, 1, image.transform.center.bytes)
+            GL.glUniform1f(4 + eye, image.transform.rotation)
+            GL.glUniform1i(6 + eye, min(image.filter_mode.value, 2))
+        GL.glUniform1i(8, view_height)
+        GL.glDrawArrays(GL.GL_TRIANGLE_STRIP, 0, 4)
+
+
+class OutputPreviewDock(QtWidgets.QDockWidget):
+    def __init__(self, images, clip_box, parent=None):
+        super().__init__("Output Preview", parent)
+        self.setObjectName("outputPreviewDock")
+        self.preview = OutputPreviewWidget(images=images, clip_box=clip_box)
+        mode_box = QtWidgets.QComboBox()
+        for mode in CompositeMode:
+            mode_box.addItem(mode.label, mode)
+        mode_box.setCurrentIndex(list(CompositeMode).index(self.preview.mode))
+        mode_box.currentIndexChanged.connect(
+            lambda index: self.preview.set_mode(mode_box.itemData(index))
+        )
+        contents = QtWidgets.QWidget()
+        layout = QtWidgets.QVBoxLayout(contents)
+        layout.setContentsMargins(2, 2, 2, 2)
+        layout.addWidget(mode_box)
+        layout.addWidget(self.preview, stretch=1)
+        self.setWidget(contents)
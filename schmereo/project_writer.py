@@ -0,0 +1,45 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+
+from PyQt5 import QtCore
+
+from schmereo.core.project_file import write_project_file
+
+
+class ProjectWriter(QtCore.QObject):
+    """
+    Writes project snapshots on a background thread, one file at a time.
+    The snapshot must not share mutable state with the GUI objects.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent=parent)
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="schmereo-project-writer"
+        )
+        self._pending: Optional[Future] = None
+
+    failed = QtCore.pyqtSignal(str, str)  # file name, error message
+    saved = QtCore.pyqtSignal(str)  # file name
+
+    def save(self, file_name: str, data: dict) -> Future:
+        self._pending = self._executor.submit(self._write, file_name, data)
+        return self._pending
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+
+    def wait(self) -> bool:
+        """Block until queued writes have finished; False if the last one failed"""
+        if self._pending is None:
+            return True
+        return self._pending.result()
+
+    def _write(self, file_name: str, data: dict) -> bool:
+        try:
+            write_project_file(file_name, data)
+        except (OSError, TypeError, ValueError) as exc:
+            self.failed.emit(file_name, str(exc))
+            return False
+        self.saved.emit(file_name)
+        return True
@@ -0,0 +1,167 @@
+"""
+Coalesced repaints.
+
+Panning changes the camera, the clip box and the hover state, and each of
+those used to call update() on both eye views. The RenderScheduler collects
+those requests and repaints each dirty view at most once per display
+refresh, and not at all if nothing it draws has changed since last time.
+
+Input is paced the same way: a view can defer the handling of high rate
+events, like mouse motion, to the start of the next flush, so that however
+many events arrived in between, only the latest one is processed.
+"""
+
+import collections
+import time
+
+from PyQt5 import QtCore, QtGui
+
+
+class RenderScheduler(QtCore.QObject):
+    def __init__(self, parent=None):
+        super().__init__(parent=parent)
+        self.widgets = []
+        self.observers = []  # widgets showing state that the others change
+        self._dirty = {}  # widget -> set of source names
+        self._forced = set()  # widgets to repaint even if their state looks the same
+        self._input = {}  # widget -> callback handling its latest deferred input
+        self._last_flush = 0.0
+        self.frame_interval_ms = 1000.0 / 60.0
+        screen = QtGui.QGuiApplication.primaryScreen()
+        if screen is not None and screen.refreshRate() > 0:
+            self.frame_interval_ms = 1000.0 / screen.refreshRate()
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setTimerType(QtCore.Qt.PreciseTimer)
+        self._timer.timeout.connect(self.flush)
+        self.requests = 0
+        self.repaints = 0
+        self.skipped = 0
+
+    def add_widget(self, widget) -> None:
+        """
+        widget needs update() and render_state(), which returns a comparable
+        summary of everything it draws.
+        """
+        self.widgets.append(widget)
+        widget.painted_state = None
+
+    def add_observer(self, widget) -> None:
+        """
+        widget, e.g. a preview of the output, is checked whenever any other
+        widget repaints, and repaints too if its render_state() changed.
+        """
+        self.observers.append(widget)
+        widget.painted_state = None
+
+    def request(self, widget, source: str, force=False) -> None:
+        self.requests += 1
+        self._dirty.setdefault(widget, set()).add(source)
+        if force:
+            self._forced.add(widget)
+        self._schedule()
+
+    def defer_input(self, widget, callback) -> None:
+        """
+        Call callback() at the start of the next flush, before repainting.
+        A later call for the same widget replaces the pending callback.
+        """
+        self._input[widget] = callback
+        self._schedule()
+
+    def _schedule(self) -> None:
+        if not self._timer.isActive():
+            since_last = (time.perf_counter() - self._last_flush) * 1000.0
+            self._timer.start(int(max(0.0, self.frame_interval_ms - since_last)))
+
+    def request_all(self, source: str, force=False) -> None:
+        for w in self.widgets:
+            self.request(w, source, force)
+
+    @QtCore.pyqtSlot()
+    def flush(self) -> None:
+        self._last_flush = time.perf_counter()
+        pending_input, self._input = self._input, {}
+        for callback in pending_input.values():
+            callback()
+        self._timer.stop()  # input handlers' repaint requests are served now
+        dirty, self._dirty = self._dirty, {}
+        forced, self._forced = self._forced, set()
+        for widget in dirty:
+            if widget not in forced and widget.render_state() == widget.painted_state:
+                self.skipped += 1
+                continue
+            self.repaints += 1
+            widget.update()
+        for widget in self.observers:
+            if widget.render_state() != widget.painted_state:
+                self.repaints += 1
+                widget.update()
+
+
+class FrameStats(object):
+    """Paint timings of one view, for the frame statistics overlay"""
+
+    def __init__(self, window_seconds=1.0):
+        self.window_seconds = window_seconds
+        self.frame_ms = 0.0  # CPU time of the latest paintGL()
+        self.upload_ms = 0.0  # texture upload part of frame_ms
+        self.gpu_ms = None  # GPU time of a recent frame, if known
+        self.render_scale = 1.0  # of the window resolution
+        self.input_ms = 0.0  # delay from receiving the latest handled event to handling it
+        self._start = None
+        self._paint_times = collections.deque()
+        self._input_times = collections.deque()  # every received event
+        self._handled_times = collections.deque()  # events handled after coalescing
+
+    def begin_frame(self) -> None:
+        self._start = time.perf_counter()
+
+    def end_frame(self, upload_ms: float) -> None:
+        now = time.perf_counter()
+        self.frame_ms = (now - self._start) * 1000.0
+        self.upload_ms = upload_ms
+        self._record(self._paint_times, now)
+
+    def input_received(self) -> float:
+        """Count one raw input event; returns its arrival time for input_handled()"""
+        now = time.perf_counter()
+        self._record(self._input_times, now)
+        return now
+
+    def input_handled(self, received: float) -> None:
+        now = time.perf_counter()
+        self.input_ms = (now - received) * 1000.0
+        self._record(self._handled_times, now)
+
+    def _trim(self, times: collections.deque, now: float) -> None:
+        """Forget times older than the window, so that they cannot pile up"""
+        horizon = now - self.window_seconds
+        while times and times[0] < horizon:
+            times.popleft()
+
+    def _record(self, times: collections.deque, now: float) -> None:
+        times.append(now)
+        self._trim(times, now)
+
+    def _per_second(self, times: collections.deque) -> float:
+        self._trim(times, time.perf_counter())
+        return len(times) / self.window_seconds
+
+    @property
+    def repaints_per_second(self) -> float:
+        return self._per_second(self._paint_times)
+
+    def text(self) -> str:
+        lines = [f"frame {self.frame_ms:5.1f} ms", f"upload {self.upload_ms:5.1f} ms"]
+        if self.gpu_ms is not None:
+            lines.append(f"gpu {self.gpu_ms:5.1f} ms")
+        if self.render_scale < 1.0:
+            lines.append(f"scale {self.render_scale:5.2f}")
+        lines.append(f"{self.repaints_per_second:3.0f} repaints/s")
+        received = self._per_second(self._input_times)
+        if received > 0:
+            handled = self._per_second(self._handled_times)
+            lines.append(f"input {self.input_ms:5.1f} ms")
+            lines.append(f"{received:3.0f} -> {handled:3.0f} moves/s")
+        return "\n".join(lines)
@@ -0,0 +1,103 @@
+"""
+Package data access through importlib.resources.
+
+Decoded images are cached, so each cursor, icon and texture is only
+decoded once per process, however many widgets use it.
+"""
+
+import functools
+import hashlib
+import io
+import os
+from importlib import resources
+
+import numpy
+from PyQt5 import QtCore, QtGui, uic
+
+from schmereo.core.atomic_file import atomic_write
+
+
+def read_bytes(package: str, name: str) -> bytes:
+    return resources.files(package).joinpath(name).read_bytes()
+
+
+@functools.lru_cache(maxsize=None)
+def cursor(package: str, name: str) -> QtGui.QCursor:
+    return QtGui.QCursor(pixmap(package, name))
+
+
+@functools.lru_cache(maxsize=None)
+def icon(package: str, name: str, on_name: str = None) -> QtGui.QIcon:
+    result = QtGui.QIcon(pixmap(package, name))
+    if on_name is not None:
+        result.addPixmap(pixmap(package, on_name), state=QtGui.QIcon.On)
+    return result
+
+
+def _form_class(source: str, file_name: str, module_name: str):
+    namespace = {"__name__": module_name}
+    exec(compile(source, file_name, "exec"), namespace)
+    return [v for k, v in namespace.items() if k.startswith("Ui_")][0]
+
+
+def load_ui(package: str, name: str, baseinstance):
+    """
+    Build a Qt Designer form on baseinstance, and return the form object.
+
+    The .ui file is compiled to Python once and cached, so later starts skip
+    the XML parsing and code generation that uic.loadUi() does every time.
+    A cached file that cannot be used is deleted and compiled again.
+    """
+    data = read_bytes(package, name)
+    key = hashlib.sha1(data + QtCore.PYQT_VERSION_STR.encode()).hexdigest()[:16]
+    folder = QtCore.QStandardPaths.writableLocation(
+        QtCore.QStandardPaths.CacheLocation
+    )
+    module_name = f"{os.path.splitext(name)[0]}_ui_{key}"
+    cached_file = os.path.join(folder or ".", f"{module_name}.py")
+    form_class = None
+    if folder and os.path.exists(cached_file):
+        try:
+            with open(cached_file, "r") as fh:
+                form_class = _form_class(fh.read(), cached_file, module_name)
+        except Exception:  # truncated, edited or from an incompatible build
+            try:
+                os.remove(cached_file)
+            except OSError:
+                pass
+    if form_class is None:
+        with io.StringIO() as fh:
+            uic.compileUi(io.BytesIO(data), fh)
+            source = fh.getvalue()
+        try:
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+                atomic_write(cached_file, lambda fh: fh.write(source))
+        except OSError:
+            pass  # no cache this time; the compiled source still works
+        form_class = _form_class(source, cached_file, module_name)
+    form = form_class()
+    form.setupUi(baseinstance)
+    return form
+
+
+@functools.lru_cache(maxsize=None)
+def pixmap(package: str, name: str) -> QtGui.QPixmap:
+    result = QtGui.QPixmap()
+    if not result.loadFromData(read_bytes(package, name)):
+        raise ValueError(f"Could not decode image {package}/{name}")
+    return result
+
+
+@functools.lru_cache(maxsize=None)
+def rgba_pixels(package: str, name: str):
+    """Decoded image as (width, height, read-only uint8 RGBA array), e.g. for textures"""
+    image = QtGui.QImage.fromData(read_bytes(package, name))
+    if image.isNull():
+        raise ValueError(f"Could not decode image {package}/{name}")
+    image = image.convertToFormat(QtGui.QImage.Format_RGBA8888)
+    bits = image.constBits()
+    bits.setsize(image.sizeInBytes())
+    pixels = numpy.frombuffer(bits, dtype=numpy.ubyte).copy()
+    pixels.flags.writeable = False
+    return image.width(), image.height(), pixels
@@ -0,0 +1,147 @@
+"""
+Linked GLSL programs, shared by all widgets in one OpenGL share group.
+
+Program binaries are cached on disk with glGetProgramBinary(), keyed by
+the shader sources and the GL vendor, renderer and version strings, so
+later runs skip compiling. If there is no usable cached binary, or the
+driver rejects it, the program is compiled from source as usual; no
+failure of the cache is fatal.
+"""
+
+import hashlib
+import os
+import struct
+
+import numpy
+from OpenGL import GL
+from PyQt5 import QtCore, QtGui, sip
+
+from schmereo import resources
+from schmereo.core.atomic_file import atomic_write
+
+# (share group, package, vertex name, fragment name) -> program id
+_programs = {}
+
+
+def shader_program(package: str, vertex_name: str, fragment_name) -> int:
+    """
+    Linked program for the given shader resources. Call with an OpenGL
+    context current; contexts that share resources get the same program.
+
+    fragment_name can be a tuple of names, which are compiled as one source
+    in that order, so that shaders can share functions from a common file.
+    """
+    group = QtGui.QOpenGLContext.currentContext().shareGroup()
+    key = (sip.unwrapinstance(group), package, vertex_name, fragment_name)
+    if key not in _programs:
+        vertex_source = resources.read_bytes(package, vertex_name)
+        if isinstance(fragment_name, str):
+            fragment_name = (fragment_name,)
+        fragment_source = b"\n".join(
+            resources.read_bytes(package, name) for name in fragment_name
+        )
+        _programs[key] = _load_program(vertex_source, fragment_source)
+    return _programs[key]
+
+
+def _cache_file_name(vertex_source: bytes, fragment_source: bytes):
+    folder = QtCore.QStandardPaths.writableLocation(
+        QtCore.QStandardPaths.CacheLocation
+    )
+    if not folder:
+        return None
+    digest = hashlib.sha256()
+    for item in (
+        vertex_source,
+        fragment_source,
+        GL.glGetString(GL.GL_VENDOR),
+        GL.glGetString(GL.GL_RENDERER),
+        GL.glGetString(GL.GL_VERSION),
+    ):
+        digest.update(item or b"")
+        digest.update(b"\0")
+    return os.path.join(folder, "shaders", f"{digest.hexdigest()}.bin")
+
+
+def _load_program(vertex_source: bytes, fragment_source: bytes) -> int:
+    if GL.glGetIntegerv(GL.GL_NUM_PROGRAM_BINARY_FORMATS) < 1:
+        return _link_program(vertex_source, fragment_source)  # no binary support
+    try:
+        file_name = _cache_file_name(vertex_source, fragment_source)
+        program = None if file_name is None else _program_from_binary(file_name)
+    except Exception:  # the cache is only an optimization
+        file_name = program = None
+    if program is not None:
+        return program
+    program = _link_program(vertex_source, fragment_source)
+    if file_name is not None:
+        try:
+            _save_binary(program, file_name)
+        except Exception:  # e.g. OSError, or a GLError from glGetProgramBinary()
+            pass
+    return program
+
+
+def _link_program(vertex_source: bytes, fragment_source: bytes) -> int:
+    from OpenGL.GL.shaders import compileShader
+
+    shaders = [
+        compileShader(vertex_source, GL.GL_VERTEX_SHADER),
+        compileShader(fragment_source, GL.GL_FRAGMENT_SHADER),
+    ]
+    program = GL.glCreateProgram()
+    for shader in shaders:
+        GL.glAttachShader(program, shader)
+    GL.glProgramParameteri(program, GL.GL_PROGRAM_BINARY_RETRIEVABLE_HINT, GL.GL_TRUE)
+    GL.glLinkProgram(program)
+    for shader in shaders:
+        GL.glDetachShader(program, shader)
+        GL.glDeleteShader(shader)
+    if GL.glGetProgramiv(program, GL.GL_LINK_STATUS) != GL.GL_TRUE:
+        log = GL.glGetProgramInfoLog(program)
+        GL.glDeleteProgram(program)
+        raise RuntimeError(f"Shader program link failed: {log}")
+    return program
+
+
+def _program_from_binary(file_name: str):
+    """Program from a cached binary, or None if there is none the driver accepts"""
+    try:
+        with open(file_name, "rb") as fh:
+            data = fh.read()
+    except OSError:
+        return None  # not cached yet
+    program = GL.glCreateProgram()
+    try:
+        (binary_format,) = struct.unpack("<I", data[:4])
+        binary = numpy.frombuffer(data, dtype=numpy.ubyte, offset=4)
+        GL.glProgramBinary(program, binary_format, binary, len(binary))
+        linked = GL.glGetProgramiv(program, GL.GL_LINK_STATUS) == GL.GL_TRUE
+    except Exception:  # a truncated file, or a GLError for an unknown format
+        linked = False
+    if linked:
+        return program
+    # e.g. after a driver update that kept the version string
+    GL.glDeleteProgram(program)
+    try:
+        os.remove(file_name)
+    except OSError:
+        pass
+    return None
+
+
+def _save_binary(program: int, file_name: str) -> None:
+    length = GL.glGetProgramiv(program, GL.GL_PROGRAM_BINARY_LENGTH)
+    if length < 1:
+        return
+    binary = numpy.zeros(length, dtype=numpy.ubyte)
+    written = numpy.zeros(1, dtype=numpy.int32)
+    binary_format = numpy.zeros(1, dtype=numpy.uint32)
+    GL.glGetProgramBinary(program, length, written, binary_format, binary)
+    os.makedirs(os.path.dirname(file_name), exist_ok=True)
+
+    def write(fh):
+        fh.write(struct.pack("<I", int(binary_format[0])))
+        fh.write(binary[: int(written[0])].tobytes())
+
+    atomic_write(file_name, write, mode="wb")  # removes its temporary file on failure
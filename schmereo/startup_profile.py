@@ -0,0 +1,93 @@
+"""
+Wall-clock timings of application start up, enabled with the
+--startup-profile command line option.
+
+    schmereo --startup-profile              # print a report to stderr
+    schmereo --startup-profile=timings.json # also write the timings as JSON
+
+Spans are recorded relative to the moment this module is first imported,
+which is the very beginning of schmereo.__main__.
+"""
+
+import contextlib
+import json
+import sys
+import time
+
+_origin = time.perf_counter()
+
+
+class StartupProfile(object):
+    def __init__(self):
+        self.enabled = False
+        self.output_file = None
+        self.spans = []  # (name, depth, start_ms, duration_ms)
+        self._depth = 0
+        self._finished = False
+
+    def configure(self, argv) -> list:
+        """Consume the --startup-profile option; returns the remaining arguments"""
+        remaining = []
+        for arg in argv:
+            if arg == "--startup-profile":
+                self.enabled = True
+            elif arg.startswith("--startup-profile="):
+                self.enabled = True
+                self.output_file = arg.split("=", 1)[1]
+            else:
+                remaining.append(arg)
+        return remaining
+
+    @contextlib.contextmanager
+    def span(self, name: str):
+        if not self.enabled or self._finished:
+            yield
+            return
+        index = len(self.spans)
+        self.spans.append(None)  # keep spans in start order
+        depth = self._depth
+        self._depth += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self._depth -= 1
+            self.spans[index] = (
+                name, depth, (start - _origin) * 1000.0, (end - start) * 1000.0
+            )
+
+    def finish(self) -> None:
+        """Called once the main window is up and the event loop is idle"""
+        if not self.enabled or self._finished:
+            return
+        self._finished = True
+        total = (time.perf_counter() - _origin) * 1000.0
+        self.report(total)
+        if self.output_file is not None:
+            with open(self.output_file, "w") as fh:
+                json.dump(self.to_dict(total), fh, indent=2)
+
+    def report(self, total_ms: float, file=None) -> None:
+        if file is None:
+            file = sys.stderr
+        print("Schmereo startup profile (milliseconds):", file=file)
+        print(f"{'start':>9} {'duration':>9}  step", file=file)
+        for name, depth, start, duration in self._completed_spans():
+            print(f"{start:9.1f} {duration:9.1f}  {'  ' * depth}{name}", file=file)
+        print(f"{total_ms:9.1f} {'':>9}  ready", file=file)
+
+    def to_dict(self, total_ms: float) -> dict:
+        return {
+            "total_ms": total_ms,
+            "spans": [
+                {"name": n, "depth": d, "start_ms": s, "duration_ms": t}
+                for n, d, s, t in self._completed_spans()
+            ],
+        }
+
+    def _completed_spans(self):
+        return [s for s in self.spans if s is not None]
+
+
+profile = StartupProfile()
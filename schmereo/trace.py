@@ -0,0 +1,155 @@
+"""
+Tracing of where the time goes while working on a card: decoding, texture
+upload, painting, alignment and export.
+
+    SCHMEREO_TRACE=trace.json schmereo   # record everything, write on exit
+
+or View > Record Trace, which asks where to save when it is switched off.
+Open the file in chrome://tracing or https://ui.perfetto.dev to see the
+nested spans of each thread on a timeline, and the counters (bytes
+uploaded, frames drawn, markers processed) as graphs.
+
+While tracing is off, span() returns a shared do-nothing object and count()
+returns after one attribute test, so the instrumentation can stay in the
+code.
+"""
+
+import json
+import os
+import threading
+import time
+
+_origin = time.perf_counter()
+
+
+def _microseconds(seconds: float) -> float:
+    return (seconds - _origin) * 1e6
+
+
+class _NullSpan(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span(object):
+    __slots__ = ("tracer", "name", "args", "start")
+
+    def __init__(self, tracer: "Tracer", name: str, args: dict):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        end = time.perf_counter()
+        self.tracer.add_event(
+            {
+                "name": self.name,
+                "ph": "X",  # complete event: start and duration
+                "ts": _microseconds(self.start),
+                "dur": (end - self.start) * 1e6,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": self.args,
+            }
+        )
+        return False
+
+
+class Tracer(object):
+    def __init__(self):
+        self.enabled = False
+        self.output_file = None  # written by stop(), if set
+        self.events = []  # Chrome trace event dicts
+        self.counters = {}  # name -> total since start()
+        self._threads = set()  # ids of the threads named in events
+        self._lock = threading.Lock()
+
+    def configure(self, environ) -> None:
+        """Start tracing if SCHMEREO_TRACE names an output file"""
+        file_name = environ.get("SCHMEREO_TRACE")
+        if file_name:
+            self.start(file_name)
+
+    def start(self, output_file=None) -> None:
+        with self._lock:
+            self.events = []
+            self.counters = {}
+            self._threads = set()
+            self.output_file = output_file
+            self.enabled = True
+
+    def stop(self) -> None:
+        """Stop recording, and write the trace if start() was given a file"""
+        if not self.enabled:
+            return
+        self.enabled = False
+        if self.output_file is not None:
+            self.write(self.output_file)
+
+    def span(self, name: str, **args):
+        """Context manager timing a (possibly nested) step on this thread"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, args)
+
+    def count(self, name: str, value: int = 1) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            total = self.counters.get(name, 0) + value
+            self.counters[name] = total
+        self.add_event(
+            {
+                "name": name,
+                "ph": "C",
+                "ts": _microseconds(time.perf_counter()),
+                "pid": os.getpid(),
+                "args": {name: total},
+            }
+        )
+
+    def add_event(self, event: dict) -> None:
+        with self._lock:
+            if not self.enabled:
+                return
+            thread_id = event.get("tid")
+            if thread_id is not None and thread_id not in self._threads:
+                self._threads.add(thread_id)
+                self.events.append(
+                    {
+                        "name": "thread_name",
+                        "ph": "M",
+                        "pid": event["pid"],
+                        "tid": thread_id,
+                        "args": {"name": threading.current_thread().name},
+                    }
+                )
+            self.events.append(event)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "traceEvents": list(self.events),
+                "displayTimeUnit": "ms",
+                "otherData": {"counters": dict(self.counters)},
+            }
+
+    def write(self, file_name: str) -> None:
+        with open(file_name, "w") as fh:
+            json.dump(self.to_dict(), fh)
+
+
+tracer = Tracer()
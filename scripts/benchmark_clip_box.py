@@ -0,0 +1,81 @@
+"""
+Frame times of an eye view while panning, with the clip box overlay drawn by
+QPainter and by the shader pass.
+
+usage: python scripts/benchmark_clip_box.py [image_file] [frame_count]
+
+Set LIBGL_ALWAYS_SOFTWARE=1 to measure software OpenGL.
+"""
+
+import os
+import statistics
+import sys
+import time
+
+# The repository root, so that a checkout runs without installing schmereo
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from OpenGL import GL
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+
+def measure(widget, frame_count):
+    """Milliseconds per frame, including the GPU work (glFinish)"""
+    times = []
+    for frame in range(frame_count):
+        widget.camera.center = type(widget.camera.center)(
+            0.2 * ((frame % 40) / 40.0 - 0.5), 0
+        )
+        widget.camera.notify()
+        start = time.perf_counter()
+        widget.repaint()
+        widget.makeCurrent()
+        GL.glFinish()
+        widget.doneCurrent()
+        times.append((time.perf_counter() - start) * 1000.0)
+    return times
+
+
+def main():
+    file_name = sys.argv[1] if len(sys.argv) > 1 else None
+    frame_count = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    surface_format = QtGui.QSurfaceFormat()
+    surface_format.setVersion(4, 6)
+    surface_format.setProfile(QtGui.QSurfaceFormat.CoreProfile)
+    surface_format.setSwapInterval(0)  # do not wait for vertical sync
+    QtGui.QSurfaceFormat.setDefaultFormat(surface_format)
+    app = QtWidgets.QApplication(sys.argv)
+
+    from schmereo.camera import Camera
+    from schmereo.clip_box import ClipBox
+    from schmereo.image.image_widget import ImageWidget
+
+    camera = Camera()
+    widget = ImageWidget(camera=camera)
+    widget.camera = camera
+    widget.clip_box = ClipBox(camera=camera, images=[widget.image], width=1.5, height=1.0)
+    widget.resize(1024, 768)
+    widget.show()
+    app.processEvents()
+    if file_name is None:
+        from PIL import Image
+
+        file_name = QtCore.QDir.temp().filePath("schmereo_benchmark.png")
+        Image.new("RGB", (4000, 3000), (90, 120, 60)).save(file_name)
+    widget.load_image(file_name)
+    widget.image.upload_budget_ms = None  # upload during warm-up, not in the timings
+    measure(widget, 10)
+    for name, use_shader in (("QPainter", False), ("shader", True)):
+        widget.clip_box.use_shader = use_shader
+        measure(widget, 10)  # warm up
+        times = measure(widget, frame_count)
+        times.sort()
+        print(
+            f"{name:>8}: median {statistics.median(times):6.2f} ms, "
+            f"95th percentile {times[int(0.95 * len(times))]:6.2f} ms, "
+            f"max {times[-1]:6.2f} ms over {frame_count} frames"
+        )
+
+
+if __name__ == "__main__":
+    main()
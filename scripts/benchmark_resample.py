@@ -0,0 +1,42 @@
+"""
+Export resampling throughput of each filter mode, in output megapixels per
+second.
+
+usage: python scripts/benchmark_resample.py [megapixels] [workers]
+"""
+
+import math
+import os
+import sys
+import time
+
+# The repository root, so that a checkout runs without installing schmereo
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy
+
+from schmereo.coord_sys import FractionalImagePos, ImageTransform
+from schmereo.core.resample import FilterMode, resample_eye
+
+
+def main():
+    megapixels = float(sys.argv[1]) if len(sys.argv) > 1 else 12.0
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    width = int(math.sqrt(megapixels * 1e6 * 4 / 3))
+    height = width * 3 // 4
+    pixels = numpy.random.default_rng(0).integers(
+        0, 256, size=(height, width, 4), dtype=numpy.uint8
+    )
+    transform = ImageTransform()
+    transform.center = FractionalImagePos(0.01, -0.02)
+    transform.rotation = 0.02  # radians; a typical small alignment correction
+    print(f"{width} x {height} pixels")
+    for mode in FilterMode:
+        start = time.perf_counter()
+        resample_eye(pixels, transform, (width, height), mode=mode, workers=workers)
+        seconds = time.perf_counter() - start
+        print(f"{mode.name:>8}: {width * height * 1e-6 / seconds:6.1f} MP/s")
+
+
+if __name__ == "__main__":
+    main()
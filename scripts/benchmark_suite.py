@@ -0,0 +1,408 @@
+"""
+Headless benchmarks of schmereo's hot paths, with regression checks.
+
+Needs no display and no GPU: everything measured here is the CPU side of
+what the application does, through the Qt-free schmereo.core where there
+is one.
+
+usage: python scripts/benchmark_suite.py [options]
+
+    --output FILE           write the results as JSON (default: stdout)
+    --save-baseline FILE    also store the results as a baseline
+    --baseline FILE         compare against a stored baseline; exit status 1
+                            if any benchmark got slower by more than
+    --tolerance FRACTION    (default 0.25, i.e. 25%)
+    --filter TEXT           only run benchmarks whose name contains TEXT
+    --quick                 skip the largest problem sizes
+
+Each result is the best of several repeats of an automatically sized loop,
+in seconds per call. Baselines are only comparable on the same machine.
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import timeit
+
+# The repository root, so that a checkout runs without installing schmereo
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy
+
+from schmereo.coord_sys import (
+    CanvasPos,
+    FractionalImagePos,
+    ImagePixelCoordinate,
+    ImageTransform,
+    WindowPos,
+)
+from schmereo.core import transform as xf
+from schmereo.core.aligner import solve_alignment
+from schmereo.core.auto_crop import auto_crop
+from schmereo.core.camera import CameraModel
+from schmereo.core.composite import CompositeMode, composite
+from schmereo.core.eye import EyeModel
+from schmereo.core.image import ImageModel
+from schmereo.core.project import Project
+from schmereo.core.project_file import read_project_file, write_project_file
+from schmereo.core.resample import FilterMode, resample_eye
+
+BENCHMARKS = []  # (name, setup, large)
+
+
+def benchmark(name: str, large: bool = False):
+    """
+    Register a setup function, which prepares its data and returns the
+    function to time. large benchmarks are skipped by --quick.
+    """
+
+    def register(setup):
+        BENCHMARKS.append((name, setup, large))
+        return setup
+
+    return register
+
+
+def _transform(x=0.01, y=-0.02, rotation=0.02) -> ImageTransform:
+    result = ImageTransform()
+    result.center = FractionalImagePos(x, y)
+    result.rotation = rotation  # radians; a typical small alignment correction
+    return result
+
+
+def _test_image(width: int, height: int) -> numpy.ndarray:
+    """(H, W, 3) uint8 photo-like pixels: smooth gradients plus grain"""
+    rng = numpy.random.default_rng(0)
+    y, x = numpy.mgrid[0:height, 0:width].astype(numpy.float32)
+    base = numpy.stack(
+        (
+            128 + 100 * numpy.sin(x / 97.0),
+            128 + 100 * numpy.cos(y / 71.0),
+            128 + 60 * numpy.sin((x + y) / 151.0),
+        ),
+        axis=-1,
+    )
+    grain = rng.normal(0, 8, size=base.shape).astype(numpy.float32)
+    return numpy.clip(base + grain, 0, 255).astype(numpy.uint8)
+
+
+class _Folder(object):
+    """Temporary folder for files benchmarks read, removed at exit"""
+
+    _folder = None
+
+    @classmethod
+    def path(cls, name: str) -> str:
+        if cls._folder is None:
+            cls._folder = tempfile.TemporaryDirectory(prefix="schmereo_benchmark_")
+        return os.path.join(cls._folder.name, name)
+
+
+class _Size(object):
+    """Enough of QSize for the scalar window conversions"""
+
+    def __init__(self, width, height):
+        self._width, self._height = width, height
+
+    def width(self):
+        return self._width
+
+    def height(self):
+        return self._height
+
+
+# coord_sys conversions
+
+
+@benchmark("coord_sys.scalar.canvas_from_window")
+def _():
+    camera, size = CameraModel(), _Size(800, 600)
+    window = WindowPos(123.0, 456.0)
+    return lambda: CanvasPos.from_WindowPos(window, camera, size)
+
+
+@benchmark("coord_sys.scalar.image_from_canvas")
+def _():
+    transform, image_size = _transform(), (4000, 3000)
+    canvas = CanvasPos(0.1, -0.2)
+
+    def run():
+        fract = FractionalImagePos.from_CanvasPos(canvas, transform)
+        return ImagePixelCoordinate.from_FractionalImagePos(fract, image_size)
+
+    return run
+
+
+for _count in (1000, 1000000):
+
+    @benchmark(f"coord_sys.batched.image_from_canvas.{_count}", large=_count > 1000)
+    def _(count=_count):
+        points = numpy.random.default_rng(0).uniform(-1, 1, size=(count, 2))
+        transform = _transform()
+        return lambda: xf.image_from_canvas(points, transform, (4000, 3000))
+
+
+# alignment
+
+
+def _marker_pair(count: int):
+    """Left and right eyes with count noisy homologous markers"""
+    rng = numpy.random.default_rng(0)
+    size = (3000, 2000)
+    left_points = rng.uniform((0, 0), size, size=(count, 2))
+    c, s = math.cos(0.01), math.sin(0.01)
+    rotation = numpy.array(((c, -s), (s, c)))
+    right_points = (left_points - 1500) @ rotation.T + 1500 + (40, 7)
+    right_points += rng.normal(0, 0.5, size=right_points.shape)
+    eyes = []
+    for points in (left_points, right_points):
+        eye = EyeModel()
+        eye.image.width, eye.image.height = size
+        eye.markers.add_markers(points.astype(numpy.float32))
+        eyes.append(eye)
+    return eyes
+
+
+for _count in (10, 1000, 100000):
+
+    @benchmark(f"align.{_count}", large=_count > 1000)
+    def _(count=_count):
+        left, right = _marker_pair(count)
+        return lambda: solve_alignment(left, right)
+
+
+# markers
+
+
+@benchmark("markers.add_1000")
+def _():
+    from schmereo.marker import MarkerSet  # imports PyOpenGL, but draws nothing here
+
+    markers = MarkerSet(camera=None)
+    positions = [ImagePixelCoordinate(i, 2 * i) for i in range(1000)]
+
+    def run():
+        markers.clear()
+        for p in positions:
+            markers.add_marker(p)
+
+    return run
+
+
+@benchmark("markers.clear")
+def _():
+    from schmereo.marker import MarkerSet
+
+    markers = MarkerSet(camera=None)
+    points = numpy.zeros((1000, 2), dtype=numpy.float32)
+
+    def run():
+        markers.add_markers(points)
+        markers.clear()
+
+    return run
+
+
+@benchmark("markers.serialize_1000")
+def _():
+    from schmereo.marker import MarkerSet
+
+    markers = MarkerSet(camera=None)
+    points = numpy.random.default_rng(0).uniform(0, 1000, (1000, 2))
+    markers.add_markers(points.astype(numpy.float32))
+    legacy = [{"x": float(x), "y": float(y)} for x, y in markers.points]
+
+    def run():
+        markers.from_dict(legacy)  # the JSON list form of small marker sets
+        return markers.to_dict()
+
+    return run
+
+
+# projects
+
+
+def _project_files(marker_count: int):
+    """Project with real (small) image files, so that from_dict() can load them"""
+    from PIL import Image
+
+    project = Project()
+    left, right = _marker_pair(marker_count)
+    for eye, source, name in zip(project.eyes(), (left, right), ("left.png", "right.png")):
+        file_name = _Folder.path(name)
+        if not os.path.exists(file_name):
+            Image.fromarray(_test_image(300, 200)).save(file_name)
+        eye.image.load_image(file_name)
+        eye.markers.add_markers(source.markers.points)
+    return project
+
+
+for _count in (10, 10000):
+
+    @benchmark(f"project.dict_round_trip.{_count}")
+    def _(count=_count):
+        project = _project_files(count)
+
+        def run():
+            Project().from_dict(project.to_dict())
+
+        return run
+
+    @benchmark(f"project.file_round_trip.{_count}")
+    def _(count=_count):
+        project = _project_files(count)
+        file_name = _Folder.path(f"project{count}.json")
+
+        def run():
+            write_project_file(file_name, project.to_dict())
+            Project().from_dict(read_project_file(file_name))
+
+        return run
+
+
+# image loading
+
+IMAGE_SIZES = ((640, 480), (2048, 1536), (4032, 3024))
+IMAGE_FORMATS = (("jpeg", "jpg"), ("tiff", "tif"), ("png", "png"))
+
+for _width, _height in IMAGE_SIZES:
+    for _format, _suffix in IMAGE_FORMATS:
+
+        @benchmark(f"load.{_format}.{_width}x{_height}", large=_width > 2048)
+        def _(width=_width, height=_height, image_format=_format, suffix=_suffix):
+            from PIL import Image
+
+            file_name = _Folder.path(f"image{width}x{height}.{suffix}")
+            Image.fromarray(_test_image(width, height)).save(file_name, format=image_format)
+
+            def run():
+                # what SingleImage does: decode, then convert for the texture
+                image = ImageModel()
+                image.load_image(file_name)
+                with Image.open(file_name) as pil_image:
+                    rgba = pil_image.convert("RGBA").tobytes()
+                return numpy.frombuffer(rgba, dtype=numpy.ubyte)
+
+            return run
+
+
+# export
+
+
+@benchmark("export.auto_crop")
+def _():
+    images = []
+    for rotation in (0.03, -0.02):
+        image = ImageModel()
+        image.width, image.height = 4000, 3000
+        image.transform = _transform(rotation=rotation)
+        images.append(image)
+    return lambda: auto_crop(images)
+
+
+for _mode in FilterMode:
+
+    @benchmark(f"export.resample.{_mode.name.lower()}", large=_mode == FilterMode.LANCZOS)
+    def _(mode=_mode):
+        pixels = numpy.dstack(
+            (_test_image(2000, 1500), numpy.full((1500, 2000), 255, numpy.uint8))
+        )
+        transform = _transform()
+        return lambda: resample_eye(pixels, transform, (1000, 750), mode=mode)
+
+
+@benchmark("export.composite.anaglyph")
+def _():
+    alpha = numpy.full((750, 1000), 255, numpy.uint8)
+    left = numpy.dstack((_test_image(1000, 750), alpha))
+    right = left[:, ::-1].copy()
+    return lambda: composite(left, right, CompositeMode.ANAGLYPH)
+
+
+def measure(function, repeat: int = 5) -> dict:
+    timer = timeit.Timer(function)
+    loops, _ = timer.autorange()  # enough calls for at least 0.2 seconds
+    times = [t / loops for t in timer.repeat(repeat=repeat, number=loops)]
+    times.sort()
+    return {"seconds": times[0], "median_seconds": times[len(times) // 2], "loops": loops}
+
+
+def run(name_filter=None, quick=False, log=None) -> dict:
+    results = {}
+    for name, setup, large in BENCHMARKS:
+        if name_filter and name_filter not in name:
+            continue
+        if quick and large:
+            continue
+        results[name] = measure(setup())
+        if log is not None:
+            print(f"{results[name]['seconds'] * 1e3:12.4f} ms  {name}", file=log)
+    return {
+        "machine": {
+            "python": platform.python_version(),
+            "numpy": numpy.__version__,
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float, log) -> list:
+    """Names of the benchmarks slower than baseline by more than tolerance"""
+    regressions = []
+    print(f"{'baseline':>12} {'current':>12} {'ratio':>7}", file=log)
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            print(f"{'':>12} {result['seconds'] * 1e3:9.4f} ms {'new':>7}  {name}", file=log)
+            continue
+        ratio = result["seconds"] / base["seconds"]
+        flag = ""
+        if ratio > 1.0 + tolerance:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(
+            f"{base['seconds'] * 1e3:9.4f} ms {result['seconds'] * 1e3:9.4f} ms"
+            f" {ratio:7.2f}  {name}{flag}",
+            file=log,
+        )
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Headless schmereo benchmarks")
+    parser.add_argument("--output")
+    parser.add_argument("--save-baseline")
+    parser.add_argument("--baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--filter")
+    parser.add_argument("--quick", action="store_true")
+    args = parser.parse_args(argv)
+    results = run(args.filter, args.quick, log=sys.stderr)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as fh:
+            fh.write(text)
+    else:
+        print(text)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as fh:
+            fh.write(text)
+    if args.baseline:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+        regressions = compare(results, baseline, args.tolerance, log=sys.stderr)
+        if regressions:
+            print(f"{len(regressions)} regression(s): {', '.join(regressions)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
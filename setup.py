@@ -19,8 +19,9 @@ setup(
     # TODO: "PyQt5" in install_requires makes the schmereo entry_point fail at runtime
     install_requires=["numpy", "pillow", "PyOpenGL", ],  # "PyQt5"],
     license="GPL",
-    package_data={"": ["*.frag", "*.png", "*.ui", "*.vert"]},
+    package_data={"": ["*.frag", "*.glsl", "*.png", "*.ui", "*.vert"]},
     packages=find_packages(),
+    python_requires=">=3.9",
     scripts=["scripts/split_stereo.py"],
     url="https://github.com/cmbruns/schmereo",
     version=__version__,
@@ -0,0 +1,44 @@
+import numpy
+import pytest
+
+from schmereo.coord_sys import FractionalImagePos, ImageTransform
+from schmereo.core import transform as xf
+from schmereo.core.auto_crop import auto_crop
+from schmereo.core.image import ImageModel
+
+
+def _image(center=(0.0, 0.0), rotation=0.0, size=(200, 100)):
+    image = ImageModel()
+    image.width, image.height = size
+    image.transform.center = FractionalImagePos(*center)
+    image.transform.rotation = rotation
+    return image
+
+
+def test_whole_image():
+    assert auto_crop([_image()]) == pytest.approx((-1, -0.5, 1, 0.5), abs=1e-6)
+
+
+def test_overlap_of_shifted_eyes():
+    images = [_image(center=(0.1, 0)), _image(center=(-0.1, 0))]
+    assert auto_crop(images) == pytest.approx((-0.9, -0.5, 0.9, 0.5), abs=1e-6)
+
+
+def test_aspect_ratio():
+    left, top, right, bottom = auto_crop([_image()], aspect=1.0)
+    assert right - left == pytest.approx(bottom - top)
+    assert bottom - top == pytest.approx(1.0, abs=1e-6)
+
+
+def test_box_is_inside_rotated_eyes():
+    images = [_image(rotation=0.05), _image(center=(0.05, 0.02), rotation=-0.03)]
+    left, top, right, bottom = auto_crop(images)
+    corners = [(left, top), (right, top), (right, bottom), (left, bottom)]
+    for image in images:
+        pixels = xf.image_from_canvas(corners, image.transform, image.size())
+        assert numpy.all(pixels >= -1e-6)
+        assert numpy.all(pixels <= numpy.array(image.size()) + 1e-6)
+
+
+def test_eyes_that_do_not_overlap():
+    assert auto_crop([_image(center=(1.5, 0)), _image(center=(-1.5, 0))]) is None
@@ -0,0 +1,25 @@
+import numpy
+
+from schmereo.coord_sys import FractionalImagePos, ImageTransform
+from schmereo.core.color_match import ColorMatch, histogram, shown_region
+
+
+def test_each_eye_of_a_card_is_measured_on_its_own_half():
+    rng = numpy.random.default_rng(0)
+    card = rng.integers(40, 220, (300, 800, 3)).astype(numpy.uint8)
+    card[:, :400] = card[:, :400] // 2  # a darker left eye
+    box = (-0.5, -0.375, 0.5, 0.375)  # half of the card's width, all of its height
+    regions = []
+    for center in (-0.5, 0.5):
+        transform = ImageTransform()
+        transform.center = FractionalImagePos(center, 0)
+        regions.append(shown_region((800, 300), transform, box))
+    assert regions == [(0, 0, 400, 300), (400, 0, 800, 300)]
+    color_match = ColorMatch()
+    color_match.eye = "right"
+    _, lut = color_match.luts([histogram(card, region=r) for r in regions])
+    assert numpy.abs(lut[0].astype(int) - numpy.arange(256)).max() > 50
+
+
+def test_region_outside_the_image():
+    assert shown_region((800, 300), ImageTransform(), (5, 5, 6, 6)) is None
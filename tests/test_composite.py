@@ -0,0 +1,43 @@
+import numpy
+import pytest
+
+from schmereo.core.composite import CompositeMode, composite
+
+
+@pytest.fixture
+def eyes():
+    left = numpy.zeros((4, 3, 4), numpy.uint8)
+    right = numpy.zeros((4, 3, 4), numpy.uint8)
+    left[..., 0], right[..., 2] = 200, 100
+    left[..., 3] = right[..., 3] = 255
+    return left, right
+
+
+def test_side_by_side_puts_the_left_eye_first(eyes):
+    result = composite(*eyes, CompositeMode.SIDE_BY_SIDE)
+    assert result.shape == (4, 6, 4)
+    assert (result[:, :3] == eyes[0]).all() and (result[:, 3:] == eyes[1]).all()
+
+
+def test_cross_eye_puts_the_right_eye_first(eyes):
+    result = composite(*eyes, CompositeMode.CROSS_EYE)
+    assert (result[:, :3] == eyes[1]).all() and (result[:, 3:] == eyes[0]).all()
+
+
+def test_interlaced_starts_with_the_left_eye(eyes):
+    result = composite(*eyes, CompositeMode.INTERLACED)
+    assert (result[0::2] == eyes[0][0::2]).all()
+    assert (result[1::2] == eyes[1][1::2]).all()
+
+
+def test_anaglyph_is_red_for_the_left_eye_and_cyan_for_the_right(eyes):
+    result = composite(*eyes, CompositeMode.ANAGLYPH)
+    assert result.shape == eyes[0].shape
+    assert (result[..., 3] == 255).all()
+    only_left = composite(eyes[0], numpy.zeros_like(eyes[1]), CompositeMode.ANAGLYPH)
+    assert only_left[0, 0, 0] > 0 and only_left[0, 0, 2] == 0
+
+
+def test_eyes_must_match_in_shape(eyes):
+    with pytest.raises(ValueError):
+        composite(eyes[0], eyes[1][:, :2], CompositeMode.SIDE_BY_SIDE)
@@ -0,0 +1,58 @@
+import numpy
+import pytest
+from PIL import Image
+
+from schmereo.coord_sys import ImageTransform
+from schmereo.core import transform as xf
+from schmereo.core.correspondence import ImagePyramid
+from schmereo.core.disparity import disparity_map, window_transforms
+
+WIDTH, HEIGHT = 400, 300
+
+
+def _pair(background, near):
+    """Eyes of a textured scene with a nearer square; disparities in pixels, right minus left"""
+    rng = numpy.random.default_rng(0)
+    noise = (rng.random((HEIGHT // 8, (WIDTH + 200) // 8)) * 255).astype(numpy.uint8)
+    scene = numpy.asarray(Image.fromarray(noise).resize((WIDTH + 200, HEIGHT), Image.BICUBIC))
+    left = scene[:, 100 : 100 + WIDTH].copy()
+    right = scene[:, 100 - background : 100 - background + WIDTH].copy()
+    square = numpy.asarray(
+        Image.fromarray((rng.random((10, 10)) * 255).astype(numpy.uint8)).resize(
+            (100, 100), Image.BICUBIC
+        )
+    )
+    left[100:200, 150:250] = square
+    right[100:200, 150 + near : 250 + near] = square
+    return ImagePyramid(left), ImagePyramid(right)
+
+
+def test_near_content_has_the_smallest_disparity():
+    pyramids = _pair(background=-4, near=-16)
+    aspect = HEIGHT / WIDTH
+    result = disparity_map(
+        *pyramids,
+        ImageTransform(),
+        ImageTransform(),
+        [(WIDTH, HEIGHT)] * 2,
+        (-1, -aspect, 1, aspect),
+        max_size=200,
+        workers=1,
+    )
+    summary = result.to_dict()
+    assert summary["near_pixels"] == pytest.approx(-16, abs=1.5)
+    assert summary["far_pixels"] == pytest.approx(-4, abs=1.5)
+
+
+def test_window_transforms_bring_the_given_disparity_to_the_window():
+    disparity = -0.08  # canvas units; a point this much further left in the right eye
+    left_point = numpy.array([(120.0, 150.0)])
+    canvas = xf.canvas_from_image(left_point, ImageTransform(), (WIDTH, HEIGHT))
+    right_point = xf.image_from_canvas(canvas + (disparity, 0), ImageTransform(), (WIDTH, HEIGHT))
+    lt, rt = window_transforms(ImageTransform(), ImageTransform(), disparity)
+    assert numpy.allclose(
+        xf.canvas_from_image(left_point, lt, (WIDTH, HEIGHT)),
+        xf.canvas_from_image(right_point, rt, (WIDTH, HEIGHT)),
+    )
+    # each eye moves half way, in opposite directions
+    assert lt.center.x == pytest.approx(-rt.center.x)
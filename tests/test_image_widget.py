@@ -0,0 +1,32 @@
+import os
+
+import numpy
+import pytest
+from PIL import Image
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+from PyQt5 import QtWidgets  # noqa: E402
+
+from schmereo.coord_sys import CanvasPos, FractionalImagePos, ImagePixelCoordinate  # noqa: E402
+from schmereo.image.image_widget import ImageWidget  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+def test_marker_round_trip_in_half_of_side_by_side_file(app, tmp_path):
+    file_name = str(tmp_path / "card.pns")
+    Image.fromarray(numpy.zeros((100, 400, 3), numpy.uint8)).save(file_name, "png")
+    widget = ImageWidget()
+    assert widget.load_image(file_name, half="left")
+    assert widget.eye.image_size() == (200, 100)
+    widget.image.transform.center = FractionalImagePos(0.1, -0.05)
+    widget.image.transform.rotation = 0.2
+    point = (150.0, 30.0)
+    canvas = widget.eye.canvas_from_image([point])[0]
+    pos = widget.image_from_canvas(CanvasPos(*canvas))
+    assert numpy.allclose((pos.x, pos.y), point, atol=1e-3)
+    fract = widget.fract_from_image(ImagePixelCoordinate(*point))
+    assert numpy.allclose((fract.x, fract.y), (0.5, -0.2), atol=1e-6)
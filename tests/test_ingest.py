@@ -0,0 +1,174 @@
+import concurrent.futures
+import os
+
+import numpy
+import pytest
+from PIL import Image
+
+from schmereo.ingest.job_queue import JobQueue
+from schmereo.ingest.manifest import Manifest
+from schmereo.ingest.pipeline import IngestScheduler, make_cards, run_ingest, scan_bytes
+from schmereo.ingest.stages import STAGES, card_files
+
+OPTIONS = {
+    "aspect": None,
+    "max_points": 200,
+    "max_disparity": 2.0,
+    "stereo_window": False,
+    "filter": "LINEAR",
+}
+
+
+def _card_scan(file_name, width=320, height=200, parallax=8):
+    """A side by side card of one textured scene, the right eye shifted by parallax"""
+    rng = numpy.random.default_rng(1)
+    coarse = rng.integers(0, 256, (height // 8, (width + parallax) // 8 + 1, 3), numpy.uint8)
+    scene = numpy.asarray(
+        Image.fromarray(coarse).resize((coarse.shape[1] * 8, height), Image.BICUBIC)
+    )
+    left, right = scene[:, :width], scene[:, parallax : parallax + width]
+    Image.fromarray(numpy.concatenate((left, right), axis=1)).save(file_name)
+    return file_name
+
+
+@pytest.fixture
+def scan(tmp_path):
+    return _card_scan(str(tmp_path / "card.png"))
+
+
+def _stage_files_exist(card):
+    return all(os.path.exists(f) for f in card_files(card).values())
+
+
+def test_manifest_resumes_skips_and_retries(tmp_path, scan):
+    manifest = Manifest(str(tmp_path / "manifest.json"))
+    manifest.add_card("card", scan)
+    assert manifest.next_stage("card") == STAGES[0]
+    output = str(tmp_path / "split.jpg")
+    open(output, "w").close()
+    manifest.record("card", STAGES[0], 0.1, {"outputs": [output]})
+    assert manifest.next_stage("card") == STAGES[1]
+    manifest.record("card", STAGES[1], None, error="ValueError: no matches")
+    assert manifest.status("card") == "failed"
+    assert manifest.next_stage("card") is None
+    assert manifest.next_stage("card", retry_failed=True) == STAGES[1]
+    manifest.save()
+    reloaded = Manifest(manifest.file_name)
+    assert reloaded.cards == manifest.cards
+    # A stage whose outputs are gone runs again, and later stages are dropped
+    os.remove(output)
+    assert reloaded.next_stage("card", retry_failed=True) == STAGES[0]
+    reloaded.record("card", STAGES[0], 0.1, {"outputs": []})
+    assert list(reloaded.cards["card"]["stages"]) == [STAGES[0]]
+    assert reloaded.cards["card"]["stages"][STAGES[0]]["attempts"] == 2
+
+
+def test_manifest_forgets_a_changed_scan(tmp_path, scan):
+    manifest = Manifest(str(tmp_path / "manifest.json"))
+    manifest.add_card("card", scan)
+    manifest.record("card", STAGES[0], 0.1, {})
+    manifest.add_card("card", scan)
+    assert STAGES[0] in manifest.cards["card"]["stages"]
+    _card_scan(scan, width=300)
+    manifest.add_card("card", scan)
+    assert manifest.cards["card"]["stages"] == {}
+
+
+class _PendingExecutor(object):
+    """Accepts stages without running them"""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, fn, *args):
+        self.submitted.append(args)
+        return concurrent.futures.Future()
+
+
+def test_scheduler_bounds_the_memory_in_flight(tmp_path):
+    scans = [_card_scan(str(tmp_path / f"card{i}.png")) for i in range(3)]
+    cost = scan_bytes(scans[0])
+    cards = make_cards(scans, str(tmp_path / "out"), OPTIONS)
+    executor = _PendingExecutor()
+    manifest = Manifest(str(tmp_path / "manifest.json"))
+    scheduler = IngestScheduler(
+        manifest, executor, max_in_flight=3, memory_budget=2 * cost, log=lambda _: None
+    )
+    for card in cards:
+        scheduler.add(card)
+    scheduler.step(timeout=0)
+    assert len(executor.submitted) == 2
+    assert scheduler.in_flight_bytes == 2 * cost
+    # One stage always fits, however small the budget
+    scheduler = IngestScheduler(
+        manifest, _PendingExecutor(), max_in_flight=3, memory_budget=1, log=lambda _: None
+    )
+    scheduler.add(cards[0])
+    scheduler.step(timeout=0)
+    assert len(scheduler.in_flight) == 1
+
+
+def test_run_ingest_resumes_after_lost_outputs_and_retries_on_request(tmp_path, scan):
+    output = str(tmp_path / "out")
+    os.makedirs(output)
+    bad = str(tmp_path / "bad.png")
+    with open(bad, "w") as fh:
+        fh.write("not an image")
+    cards = make_cards([scan, bad], output, OPTIONS)
+    manifest = Manifest(os.path.join(output, "manifest.json"))
+    logged = []
+
+    def ingest(**kwargs):
+        return run_ingest(
+            cards,
+            manifest,
+            workers=0,
+            max_in_flight=1,
+            memory_budget=1 << 30,
+            log=logged.append,
+            **kwargs,
+        )
+
+    assert not ingest()
+    assert manifest.status("card") == "done"
+    assert manifest.status("bad") == "failed"
+    assert _stage_files_exist(cards[0])
+    # Nothing left to do, and the failure is not retried
+    logged.clear()
+    ingest()
+    assert "0 of 2 cards to process" in logged
+    # A lost export is made again, without redoing earlier stages
+    os.remove(card_files(cards[0])["export"])
+    finished = {s: r["finished"] for s, r in manifest.cards["card"]["stages"].items()}
+    ingest()
+    stages = manifest.cards["card"]["stages"]
+    assert os.path.exists(card_files(cards[0])["export"])
+    assert stages["export"]["finished"] > finished["export"]
+    assert all(stages[s]["finished"] == finished[s] for s in STAGES if s != "export")
+    ingest(retry_failed=True)
+    assert manifest.cards["bad"]["stages"][STAGES[0]]["attempts"] == 2
+
+
+def test_job_queue_recovers_running_jobs(tmp_path, scan):
+    queue = JobQueue(str(tmp_path / "queue.sqlite"))
+    assert queue.enqueue(scan) == "card"
+    assert queue.enqueue(scan) is None  # already known
+    os.makedirs(str(tmp_path / "other"))
+    other = _card_scan(str(tmp_path / "other" / "card.png"))
+    assert queue.enqueue(other) == "card-2"  # names are unique
+    assert queue.claim(1) == [(scan, "card")]
+    queue.close()
+    # A restart requeues the job that was running
+    queue = JobQueue(str(tmp_path / "queue.sqlite"))
+    assert queue.depth()["running"] == 1
+    assert queue.recover() == 1
+    assert queue.depth() == {"queued": 2, "running": 0, "done": 0, "failed": 0}
+    assert len(queue.claim(2)) == 2
+    queue.finish("card", "done")
+    queue.finish("card-2", "failed")
+    assert queue.recover() == 0
+    assert queue.recover(retry_failed=True) == 1
+    # A changed scan is queued again under its old name
+    _card_scan(scan, width=300)
+    assert queue.enqueue(scan) == "card"
+    queue.close()
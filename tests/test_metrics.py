@@ -0,0 +1,64 @@
+import math
+
+import numpy
+import pytest
+
+from schmereo.core.aligner import solve_alignment
+from schmereo.core.eye import EyeModel
+from schmereo.core.image import ImageModel
+from schmereo.core.marker import MarkerArray
+from schmereo.core.metrics import alignment_metrics, converged
+
+
+def _eye(points, size=(400, 300)):
+    image = ImageModel()
+    image.width, image.height = size
+    markers = MarkerArray()
+    markers.add_markers(numpy.asarray(points, dtype=numpy.float32))
+    return EyeModel(image=image, markers=markers)
+
+
+@pytest.fixture
+def points():
+    return numpy.random.default_rng(0).uniform(20, 280, (30, 2))
+
+
+def test_disparities_in_left_eye_pixels(points):
+    metrics = alignment_metrics(_eye(points), _eye(points + (5.0, 3.0)))
+    assert metrics["pairs"] == 30
+    assert metrics["rms_vertical_pixels"] == pytest.approx(3.0, abs=1e-3)
+    assert metrics["max_vertical_pixels"] == pytest.approx(3.0, abs=1e-3)
+    assert metrics["horizontal_range_pixels"] == pytest.approx([5.0, 5.0], abs=1e-3)
+    assert metrics["residual_rotation_degrees"] == pytest.approx(0.0, abs=1e-3)
+
+
+def test_rotation_is_of_the_right_eye_relative_to_the_left(points):
+    left, right = _eye(points), _eye(points)
+    right.image.transform.rotation = math.radians(2.0)
+    assert alignment_metrics(left, right)["rotation_degrees"] == pytest.approx(2.0)
+
+
+def test_residual_rotation_vanishes_after_alignment(points):
+    angle = math.radians(1.5)
+    center = numpy.array((200.0, 150.0))
+    cos, sin = math.cos(angle), math.sin(angle)
+    rotation = numpy.array(((cos, -sin), (sin, cos)))
+    left, right = _eye(points), _eye((points - center) @ rotation.T + center + (10.0, 4.0))
+    before = alignment_metrics(left, right)
+    assert abs(before["residual_rotation_degrees"]) == pytest.approx(1.5, abs=0.05)
+    assert not converged(before)
+    solution = solve_alignment(left, right)
+    left.image.transform = solution.left_transform
+    right.image.transform = solution.right_transform
+    after = alignment_metrics(left, right)
+    assert converged(after)
+    assert after["rms_vertical_pixels"] < 0.05
+    # the right eye was turned back by the rotation of its markers
+    residual = before["residual_rotation_degrees"]
+    assert after["rotation_degrees"] == pytest.approx(-residual, abs=0.05)
+
+
+def test_no_pairs():
+    metrics = alignment_metrics(_eye([]), _eye([]))
+    assert metrics["pairs"] == 0 and metrics["rms_vertical_pixels"] is None
+    assert converged(metrics)
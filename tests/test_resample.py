@@ -0,0 +1,17 @@
+import numpy
+
+from schmereo.coord_sys import ImageTransform
+from schmereo.core.resample import FilterMode, resample_eye, sample
+
+
+def test_nearest_samples_on_pixel_boundaries():
+    pixels = numpy.arange(16, dtype=numpy.uint8).reshape(4, 4, 1) * 10
+    values = sample(pixels, x=[1.0, 1.5, 2.0], y=[1.5, 1.5, 1.5], mode=FilterMode.NEAREST)
+    # boundaries belong to the pixel on their right
+    assert values[:, 0].tolist() == [50, 50, 60]
+
+
+def test_nearest_export_with_odd_crop_width():
+    pixels = numpy.full((6, 8, 4), 200, numpy.uint8)
+    eye = resample_eye(pixels, ImageTransform(), (7, 6), mode=FilterMode.NEAREST, workers=1)
+    assert (eye == 200).all()